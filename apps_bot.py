@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
-import os, random, markdown as md
+import os, markdown as md
 from datetime import datetime
 import requests
 import backoff
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google_play_scraper import search as play_search, app as play_app
+import blogger_client
+import gemini_models
+from rate_limiter import get_limiter
+from package_index import get_package_index
+from play_queue import CandidateQueue
+from article_cache import generate_cached, publish_tracked, publish_pending
 
 # =================== إعدادات المستخدم ===================
 MONETAG_DIRECT_LINK = "https://otieu.com/4/10464710"
@@ -17,8 +20,8 @@ BLOG_URL = os.environ["BLOG_URL"]
 CLIENT_ID = os.environ["CLIENT_ID"]
 CLIENT_SECRET = os.environ["CLIENT_SECRET"]
 REFRESH_TOKEN = os.environ["REFRESH_TOKEN"]
-HISTORY_APPS_FILE = "history_apps.txt"
-GEMINI_API_ROOT = "https://generativelanguage.googleapis.com"
+HISTORY_BOT = "apps"  # history.db (history_store.py)
+GEMINI_API_ROOT = os.getenv("GEMINI_API_ROOT", "https://generativelanguage.googleapis.com")
 
 # قائمة بحث شاملة
 SEARCH_QUERIES = [
@@ -29,54 +32,27 @@ SEARCH_QUERIES = [
     "Browser", "File Manager", "Backup", "Zip", "Calculator", "Notes"
 ]
 
-def load_used_apps():
-    if not os.path.exists(HISTORY_APPS_FILE): return set()
-    with open(HISTORY_APPS_FILE, "r", encoding="utf-8") as f:
-        return set(line.strip() for line in f if line.strip())
+def is_used_app(package_name):
+    return get_package_index(HISTORY_BOT).contains(package_name)
 
 def save_used_app(package_name):
-    with open(HISTORY_APPS_FILE, "a", encoding="utf-8") as f:
-        f.write(f"{package_name}\n")
+    get_package_index(HISTORY_BOT).add(package_name)
+
+# طابور مرشحين جاهزين (يُعبأ بالتوازي عند الحاجة فقط)
+APP_QUEUE = CandidateQueue("apps", SEARCH_QUERIES, lang="en", country="us",
+                           n_hits=50, min_score=4.0, is_used=is_used_app,
+                           allow_unscored=True)
 
 def get_fresh_app():
-    used_apps = load_used_apps()
-    queries = SEARCH_QUERIES[:]
-    random.shuffle(queries)
     print(f"🔍 Scanning for apps...")
-    
-    for query in queries:
-        try:
-            results = play_search(query, lang="en", country="us", n_hits=50)
-            for app_summary in results:
-                pkg = app_summary['appId']
-                if pkg in used_apps: continue
-                
-                score = app_summary.get('score', 0)
-                if score and score < 4.0: continue 
-
-                try: details = play_app(pkg, lang='en', country='us')
-                except: continue
-                
-                if not details.get('icon'): continue
-                
-                print(f"✅ Found App: {details['title']}")
-                return details
-        except: continue  
-    return None
+    details = APP_QUEUE.next_candidate()
+    if details: print(f"✅ Found App: {details['title']}")
+    return details
 
 # =================== اكتشاف الموديل ===================
 def get_working_model():
-    url = f"{GEMINI_API_ROOT}/v1beta/models?key={GEMINI_API_KEY}"
-    try:
-        r = requests.get(url, timeout=30)
-        if r.status_code != 200: return "gemini-pro"
-        data = r.json()
-        for model in data.get('models', []):
-            name = model['name'].replace('models/', '')
-            if 'generateContent' in model.get('supportedGenerationMethods', []):
-                return name
-        return "gemini-1.5-flash"
-    except: return "gemini-pro"
+    # الموديل المحفوظ في الكاش المشترك، دون سرد /models في كل توليد
+    return gemini_models.get_working_model(fallback="gemini-pro")
 
 def _rest_generate(prompt):
     model_name = get_working_model()
@@ -88,7 +64,11 @@ def _rest_generate(prompt):
         {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
     ]
     try:
+        limiter = get_limiter("gemini")
+        limiter.acquire()
         r = requests.post(url, json={"contents": [{"parts": [{"text": prompt}]}], "safetySettings": safety_settings}, timeout=60)
+        limiter.observe(r)
+        gemini_models.report_status("v1beta", model_name, r.status_code)
         if r.status_code == 200: return r.json()["candidates"][0]["content"]["parts"][0]["text"]
         return None
     except: return None
@@ -109,7 +89,9 @@ def ask_gemini_app_review(app_details):
     6. **الخاتمة**: نصيحة.
     لا تضع روابط.
     """
-    return _rest_generate(prompt)
+    # (المقال، مفتاح كاش المقالات)
+    return generate_cached(prompt, lambda: _rest_generate(prompt), HISTORY_BOT,
+                           model=get_working_model(), meta={"appId": app_details['appId']})
 
 # =================== تعديل الزر الذكي ===================
 def build_app_post_html(app_details, article_html):
@@ -144,27 +126,37 @@ def build_app_post_html(app_details, article_html):
     return header + md.markdown(article_html, extensions=['extra']) + button
 
 def post_to_blogger(title, content):
-    creds = Credentials(None, refresh_token=REFRESH_TOKEN, client_id=CLIENT_ID, client_secret=CLIENT_SECRET, token_uri="https://oauth2.googleapis.com/token")
-    service = build("blogger", "v3", credentials=creds)
-    blog_id = service.blogs().getByUrl(url=BLOG_URL).execute()["id"]
+    service = blogger_client.get_service()
+    blog_id = blogger_client.get_blog_id(BLOG_URL, service=service)
     body = {"kind": "blogger#post", "title": title, "content": content, "labels": APP_LABELS}
     return service.posts().insert(blogId=blog_id, body=body, isDraft=False).execute()
 
-if __name__ == "__main__":
+def _pending_published(art, res):
+    if art["meta"].get("appId"): save_used_app(art["meta"]["appId"])
+
+def run():
     print("🚀 Starting App Bot v7 (Smart Button)...")
+    # فحص رخيص مرة لكل مهمة: history.db قد يتغير بين مهام المجدول
+    get_package_index(HISTORY_BOT).refresh()
+    # مقال مولّد فشل نشره في تشغيل سابق يُنشر أولًا بلا توليد جديد
+    if publish_pending(HISTORY_BOT, post_to_blogger, _pending_published): return
     app_data = get_fresh_app()
     if app_data:
         print(f"📝 Generating content for: {app_data['title']}...")
-        article = ask_gemini_app_review(app_data)
+        article, key = ask_gemini_app_review(app_data)
         if article:
             lines = article.strip().split('\n')
             title = lines[0].replace('#', '').replace('*', '').strip()
             if len(title) < 5: title = f"تحميل تطبيق {app_data['title']}"
             final_html = build_app_post_html(app_data, article)
             try:
-                res = post_to_blogger(title, final_html)
+                res = publish_tracked(key, title, final_html, lambda: post_to_blogger(title, final_html))
                 save_used_app(app_data['appId'])
                 print(f"🎉 PUBLISHED! URL: {res.get('url')}")
             except Exception as e: print(f"❌ Publish Error: {e}")
         else: print("❌ Content generation failed.")
     else: print("❌ No app found.")
+
+
+if __name__ == "__main__":
+    run()
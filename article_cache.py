@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import os, json, time, sqlite3, hashlib, threading
+
+from local_cache import cache_path
+
+# =================== كاش المقالات المولدة ===================
+# مقال دفعنا ثمنه لا يضيع إن فشل النشر: التشغيل التالي ينشره بدل توليد جديد
+ARTICLES_DB = os.getenv("ARTICLES_DB") or cache_path("articles.db")
+MAX_PUBLISH_ATTEMPTS = int(os.getenv("ARTICLE_MAX_PUBLISH_ATTEMPTS", "3"))
+KEEP_PUBLISHED_S = 14 * 24 * 3600
+KEEP_PENDING_S = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    prompt_hash TEXT NOT NULL,
+    model TEXT NOT NULL DEFAULT '',
+    bot TEXT NOT NULL,
+    markdown TEXT NOT NULL,
+    html TEXT,
+    title TEXT,
+    meta TEXT NOT NULL DEFAULT '{}',
+    state TEXT NOT NULL,
+    url TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (prompt_hash, model)
+);
+CREATE INDEX IF NOT EXISTS idx_articles_bot_state ON articles(bot, state, created);
+"""
+
+# الحالات: generated -> rendered (HTML جاهز) -> published | failed (بعد MAX_PUBLISH_ATTEMPTS)
+
+
+def prompt_hash(prompt):
+    return hashlib.blake2b((prompt or "").strip().encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ArticleCache:
+    """
+    مخزن بعنوان المحتوى: (هاش الـ prompt، الموديل) -> Markdown الخام وHTML وحالة النشر.
+    إعادة نفس الـ prompt تعيد المقال غير المنشور، والبوتات تنشر المعلّق أولًا.
+    """
+
+    def __init__(self, path=ARTICLES_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as c:
+            c.executescript(SCHEMA)
+        self.prune()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(r):
+        if r is None: return None
+        d = dict(r)
+        d["meta"] = json.loads(d.get("meta") or "{}")
+        return d
+
+    def lookup(self, prompt):
+        """آخر توليد غير منشور لهذا الـ prompt (أي موديل)، أو None."""
+        r = self._conn().execute(
+            "SELECT * FROM articles WHERE prompt_hash=? AND state IN ('generated','rendered') "
+            "ORDER BY updated DESC LIMIT 1", (prompt_hash(prompt), )).fetchone()
+        return self._row(r)
+
+    def store(self, prompt, markdown, bot, model="", meta=None):
+        now = time.time()
+        with self._conn() as c:
+            c.execute(
+                """INSERT INTO articles(prompt_hash, model, bot, markdown, meta, state, created, updated)
+                   VALUES (?,?,?,?,?,'generated',?,?)
+                   ON CONFLICT(prompt_hash, model) DO UPDATE SET markdown=excluded.markdown,
+                       meta=excluded.meta, state='generated', html=NULL, url=NULL, attempts=0,
+                       error=NULL, updated=excluded.updated""",
+                (prompt_hash(prompt), model or "", bot, markdown,
+                 json.dumps(meta or {}, ensure_ascii=False), now, now))
+        return prompt_hash(prompt)
+
+    def _update_pending(self, key, sql, args):
+        with self._conn() as c:
+            c.execute(f"UPDATE articles SET {sql}, updated=? WHERE prompt_hash=? "
+                      "AND state IN ('generated','rendered')", (*args, time.time(), key))
+
+    def rendered(self, key, title, html, meta=None):
+        """meta: حقول نشر تُدمج في meta المحفوظ (مثل published لمنشورات الدفعة المؤرخة)."""
+        if meta:
+            r = self._conn().execute("SELECT meta FROM articles WHERE prompt_hash=? "
+                                     "ORDER BY updated DESC LIMIT 1", (key, )).fetchone()
+            merged = {**json.loads((r and r[0]) or "{}"), **meta}
+            self._update_pending(key, "title=?, html=?, meta=?, state='rendered'",
+                                 (title, html, json.dumps(merged, ensure_ascii=False)))
+            return
+        self._update_pending(key, "title=?, html=?, state='rendered'", (title, html))
+
+    def published(self, key, url):
+        self._update_pending(key, "url=?, state='published'", (url or "", ))
+
+    def failed(self, key, error):
+        # محاولة نشر فاشلة: يبقى معلّقًا حتى MAX_PUBLISH_ATTEMPTS ثم يُترك
+        self._update_pending(
+            key, "attempts=attempts+1, error=?, "
+            "state=CASE WHEN attempts+1>=? THEN 'failed' ELSE state END",
+            (str(error)[:500], MAX_PUBLISH_ATTEMPTS))
+
+    def pending(self, bot):
+        """أقدم مقال جاهز HTML لم يُنشر بعد لهذا البوت."""
+        r = self._conn().execute(
+            "SELECT * FROM articles WHERE bot=? AND state='rendered' AND created>? "
+            "ORDER BY created LIMIT 1", (bot, time.time() - KEEP_PENDING_S)).fetchone()
+        return self._row(r)
+
+    def prune(self):
+        now = time.time()
+        with self._conn() as c:
+            c.execute("DELETE FROM articles WHERE (state='published' AND updated<?) "
+                      "OR (state!='published' AND created<?)",
+                      (now - KEEP_PUBLISHED_S, now - KEEP_PENDING_S))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_article_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ArticleCache()
+    return _cache
+
+
+def _safe(fn, *args):
+    # الكاش مساعد فقط: أي خطأ فيه لا يوقف التوليد أو النشر
+    try:
+        return fn(*args)
+    except Exception as e:
+        print(f"⚠️ Article cache: {e}")
+        return None
+
+
+def generate_cached(prompt, generate, bot, model="", meta=None):
+    """
+    يعيد (النص، المفتاح): توليد سابق غير منشور لنفس الـ prompt إن وُجد، وإلا
+    يستدعي generate() (نص، أو (نص، موديل)) ويحفظ الناتج.
+    """
+    hit = _safe(lambda: get_article_cache().lookup(prompt))
+    if hit:
+        print(f"♻️ Reusing cached article ({hit['model'] or '?'}, {hit['state']})")
+        return hit["markdown"], hit["prompt_hash"]
+    result = generate()
+    text, model = result if isinstance(result, tuple) else (result, model)
+    if not text: return text, None
+    return text, _safe(lambda: get_article_cache().store(prompt, text, bot, model=model, meta=meta))
+
+
+def track(event, key, *args):
+    """rendered / published / failed لمقال في الكاش (key=None يعني لا شيء)."""
+    if key is None: return
+    _safe(lambda: getattr(get_article_cache(), event)(key, *args))
+
+
+def publish_tracked(key, title, html, publish):
+    """يحفظ HTML قبل النشر ثم حالة النتيجة؛ publish() يعيد رد Blogger."""
+    track("rendered", key, title, html)
+    try:
+        res = publish()
+    except Exception as e:
+        track("failed", key, e)
+        raise
+    track("published", key, (res or {}).get("url"))
+    return res
+
+
+def publish_pending(bot, publish, on_published=None):
+    """
+    ينشر أقدم مقال معلّق للبوت (مولّد وجاهز HTML لكن فشل نشره سابقًا) بلا طلب Gemini.
+    يعيد True إن وُجد مقال وحاول نشره.
+    """
+    art = _safe(lambda: get_article_cache().pending(bot))
+    if not art: return False
+    print(f"♻️ Publishing pending article from an earlier run: {art['title']}")
+    try:
+        res = publish_tracked(art["prompt_hash"], art["title"], art["html"],
+                              lambda: publish(art["title"], art["html"]))
+    except Exception as e:
+        print(f"❌ Publish Error: {e}")
+        return True
+    if on_published: on_published(art, res)
+    print(f"🎉 PUBLISHED! URL: {res.get('url')}")
+    return True
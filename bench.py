@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+قياس شامل للبوتات على الخادم المحلي البديل (fake_services.py) بلا أي طلب خارجي.
+كل تشغيل عملية مستقلة (مثل كرون GitHub) مع كاش وسجل مؤقتين، ثم تقرير بزمن كل
+تشغيل وعدد الطلبات والزمن لكل خدمة ومراحل main.py (StageTimer) والمنشورات/الدقيقة.
+
+    python bench.py --bots main,apps --runs 3 --scale 0.2 --json bench.json
+"""
+import os, sys, json, time, runpy, shutil, tempfile, argparse, statistics, subprocess
+import urllib.request
+
+from fake_services import FakeServer, parse_kv
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BOTS = {
+    "main": "main.py",
+    "apps": "apps_bot.py",
+    "gaming": "gaming_bot.py",
+    "tech": "tech_solutions_bot.py",
+    "store": "store_bot.py",
+}
+
+
+# =================== العملية الفرعية ===================
+def _child(script):
+    # google_play_scraper يتصل بـ play.google.com مباشرة؛ نوجّهه للخادم البديل
+    import requests
+    import play_queue
+    root = os.environ["FAKE_PLAY_ROOT"]
+
+    def search(query, lang="en", country="us", n_hits=30):
+        return requests.get(f"{root}/search", params={"q": query, "n_hits": n_hits}, timeout=30).json()
+
+    def app(pkg, lang="en", country="us"):
+        r = requests.get(f"{root}/app/{pkg}", timeout=30)
+        r.raise_for_status()
+        return r.json()
+
+    play_queue.play_search, play_queue.play_app = search, app
+    sys.argv = [script]
+    runpy.run_path(os.path.join(ROOT, script), run_name="__main__")
+
+
+# =================== الأداة ===================
+def bench_env(server, workdir, keep_limits=False):
+    env = dict(os.environ)
+    env.update(server.env())
+    env.update({
+        "GEMINI_API_KEY": "fake-key",
+        "BLOG_URL": "http://fake.blog/",
+        "CLIENT_ID": "fake-client",
+        "CLIENT_SECRET": "fake-secret",
+        "REFRESH_TOKEN": "fake-refresh",
+        "PEXELS_API_KEY": "fake",
+        "PIXABAY_API_KEY": "fake",
+        "UNSPLASH_ACCESS_KEY": "fake",
+        "BOT_CACHE_DIR": os.path.join(workdir, "cache"),
+        "HISTORY_DB": os.path.join(workdir, "history.db"),
+        "PRODUCTS_DB": os.path.join(workdir, "products.db"),
+        "RUN_ONCE": "1",
+        "USE_EXTERNAL_CRON": "0",
+        "PYTHONUNBUFFERED": "1",
+    })
+    if not keep_limits:
+        # نقيس زمن العمل لا فترات الانتظار المقصودة لحدود الحصة
+        for name in ("GEMINI", "PEXELS", "PIXABAY", "UNSPLASH", "WIKIPEDIA"):
+            env[f"RATE_LIMIT_{name}"] = "100000"
+    return env
+
+
+def _stats(server):
+    with urllib.request.urlopen(f"{server.root}/__stats", timeout=10) as r:
+        return json.loads(r.read().decode("utf-8"))
+
+
+def _stage_records(path, offset):
+    if not os.path.exists(path): return [], offset
+    with open(path, "r", encoding="utf-8") as f:
+        f.seek(offset)
+        recs = [json.loads(l) for l in f if l.strip()]
+        return recs, f.tell()
+
+
+def run_bot(name, runs, server, env, verbose=False):
+    script = BOTS[name]
+    timings_file = os.path.join(env["BOT_CACHE_DIR"], "stage_timings.jsonl")
+    offset = os.path.getsize(timings_file) if os.path.exists(timings_file) else 0
+    walls, failures, groups, stages = [], 0, {}, {}
+    posts_before = _stats(server)["posts"]
+    for i in range(runs):
+        server.state.reset_stats()
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", script],
+                              cwd=ROOT, env=env, capture_output=True, text=True)
+        walls.append(time.perf_counter() - t0)
+        out = proc.stdout + proc.stderr
+        if proc.returncode != 0 or "❌" in out: failures += 1
+        if verbose: print(out)
+        for g, st in _stats(server)["groups"].items():
+            agg = groups.setdefault(g, {"count": 0, "errors": 0, "seconds": 0.0})
+            for k in agg: agg[k] += st[k]
+        recs, offset = _stage_records(timings_file, offset)
+        for rec in recs:
+            for stage, v in (rec.get("stages") or {}).items():
+                stages.setdefault(stage, []).append(v["dur_s"] if isinstance(v, dict) else v)
+    posts = _stats(server)["posts"] - posts_before
+    total = sum(walls)
+    return {
+        "bot": name,
+        "runs": runs,
+        "failures": failures,
+        "wall_mean_s": round(statistics.mean(walls), 3),
+        "wall_p50_s": round(statistics.median(walls), 3),
+        "wall_max_s": round(max(walls), 3),
+        "posts": posts,
+        "posts_per_min": round(posts / total * 60, 2) if total else 0,
+        "requests": {g: {"count": v["count"], "errors": v["errors"],
+                         "per_run": round(v["count"] / runs, 1),
+                         "server_s_per_run": round(v["seconds"] / runs, 3)}
+                     for g, v in sorted(groups.items())},
+        "stages": {s: {"mean_s": round(statistics.mean(v), 3), "n": len(v)}
+                   for s, v in stages.items()},
+    }
+
+
+def print_report(results):
+    for r in results:
+        print(f"\n🤖 {r['bot']}: {r['runs']} run(s), {r['failures']} with errors | "
+              f"wall mean {r['wall_mean_s']}s p50 {r['wall_p50_s']}s max {r['wall_max_s']}s | "
+              f"{r['posts']} post(s), {r['posts_per_min']}/min")
+        for g, v in r["requests"].items():
+            print(f"   {g:<14} {v['per_run']:>6}/run  {v['server_s_per_run']:>7}s/run  errors={v['errors']}")
+        for s, v in r["stages"].items():
+            print(f"   stage {s:<16} {v['mean_s']:>7}s (n={v['n']})")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="End-to-end bot benchmark on local fake services")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--bots", default=",".join(BOTS), help="comma list: " + ",".join(BOTS))
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--latency", action="append", help="group=seconds (e.g. gemini=1.5)")
+    ap.add_argument("--errors", action="append", help="group=rate (e.g. gemini=0.1)")
+    ap.add_argument("--scale", type=float, default=1.0, help="multiply all latencies")
+    ap.add_argument("--keep-limits", action="store_true", help="keep real rate limits")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    args = ap.parse_args()
+    if args.child:
+        return _child(args.child)
+
+    server = FakeServer(latency=parse_kv(args.latency), errors=parse_kv(args.errors),
+                        scale=args.scale).start()
+    workdir = tempfile.mkdtemp(prefix="bot-bench-")
+    print(f"🧪 Fake services on {server.root} | workdir {workdir}")
+    try:
+        env = bench_env(server, workdir, keep_limits=args.keep_limits)
+        results = [run_bot(b.strip(), args.runs, server, env, args.verbose)
+                   for b in args.bots.split(",") if b.strip()]
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import os, json, threading
+
+import httplib2
+import requests
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+
+from local_cache import cache_path, load_json, save_json
+
+# =================== إعدادات النظام ===================
+BLOG_URL = os.environ["BLOG_URL"]
+CLIENT_ID = os.environ["CLIENT_ID"]
+CLIENT_SECRET = os.environ["CLIENT_SECRET"]
+REFRESH_TOKEN = os.environ["REFRESH_TOKEN"]
+
+TOKEN_URI = os.getenv("GOOGLE_TOKEN_URI", "https://oauth2.googleapis.com/token")
+# بديل لجذر Blogger API (مثل الخادم المحلي في fake_services.py)
+BLOGGER_API_ROOT = os.getenv("BLOGGER_API_ROOT", "")
+SCOPES = ["https://www.googleapis.com/auth/blogger"]
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/blogger/v3/rest"
+HTTP_TIMEOUT = int(os.getenv("BLOGGER_HTTP_TIMEOUT", "60"))
+
+DISCOVERY_FILE = cache_path("blogger_v3_discovery.json")
+BLOG_IDS_FILE = cache_path("blog_ids.json")
+
+# حالة مشتركة على مستوى العملية
+_lock = threading.Lock()
+_creds = None
+_discovery_doc = None
+_blog_ids = {}
+_local = threading.local()  # httplib2 غير آمن بين الخيوط: خدمة لكل خيط
+
+
+# =================== الاكتشاف (Discovery) ===================
+def _load_discovery_doc():
+    global _discovery_doc
+    if _discovery_doc: return _discovery_doc
+    with _lock:
+        if _discovery_doc: return _discovery_doc
+        doc = None
+        if os.path.exists(DISCOVERY_FILE):
+            with open(DISCOVERY_FILE, "r", encoding="utf-8") as f:
+                doc = f.read()
+        if not doc:
+            # النسخة المضمّنة مع المكتبة، وإلا نجلبها مرة واحدة ونحفظها
+            doc = discovery_cache.get_static_doc("blogger", "v3")
+            if not doc:
+                r = requests.get(DISCOVERY_URL, timeout=30)
+                r.raise_for_status()
+                doc = r.text
+            with open(DISCOVERY_FILE, "w", encoding="utf-8") as f:
+                f.write(doc)
+        if BLOGGER_API_ROOT:
+            # rootUrl يحدد مسار الطلبات ومسار batch معًا
+            d = json.loads(doc)
+            d["rootUrl"] = d["baseUrl"] = BLOGGER_API_ROOT.rstrip("/") + "/"
+            doc = json.dumps(d)
+        _discovery_doc = doc
+        return doc
+
+
+# =================== التوثيق (OAuth) ===================
+def get_credentials():
+    """يجدد التوكن مرة واحدة لكل عملية، ثم يُعاد استخدامه لكل الخدمات."""
+    global _creds
+    if _creds and _creds.valid: return _creds
+    with _lock:
+        if _creds and _creds.valid: return _creds
+        creds = Credentials(
+            None,
+            refresh_token=REFRESH_TOKEN,
+            client_id=CLIENT_ID,
+            client_secret=CLIENT_SECRET,
+            token_uri=TOKEN_URI,
+            scopes=SCOPES,
+        )
+        creds.refresh(Request())
+        _creds = creds
+        return creds
+
+
+# =================== الخدمة ===================
+def get_service():
+    svc = getattr(_local, "service", None)
+    if svc is not None: return svc
+    # اتصال httplib2 واحد لكل خيط يبقى مفتوحًا (keep-alive) بين الطلبات
+    http = AuthorizedHttp(get_credentials(),
+                          http=httplib2.Http(timeout=HTTP_TIMEOUT))
+    svc = build_from_document(_load_discovery_doc(), http=http)
+    _local.service = svc
+    return svc
+
+
+def get_blog_id(blog_url=BLOG_URL, service=None):
+    if blog_url in _blog_ids: return _blog_ids[blog_url]
+    ids = load_json(BLOG_IDS_FILE, {}) or {}
+    if ids.get(blog_url):
+        _blog_ids[blog_url] = ids[blog_url]
+        return ids[blog_url]
+    service = service or get_service()
+    blog_id = service.blogs().getByUrl(url=blog_url,
+                                       fields="id").execute()["id"]
+    with _lock:
+        ids = load_json(BLOG_IDS_FILE, {}) or {}
+        ids[blog_url] = blog_id
+        save_json(BLOG_IDS_FILE, ids)
+        _blog_ids[blog_url] = blog_id
+    return blog_id
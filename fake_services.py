@@ -0,0 +1,565 @@
+# -*- coding: utf-8 -*-
+"""
+خادم محلي بديل لخدمات Google والصور (للقياس والتجربة بلا شبكة):
+Blogger v3 (posts/pages/blogs + batch)، OAuth token، Gemini (models/generateContent/SSE)،
+Unsplash/Pexels/Pixabay/Wikipedia، Trends/News RSS، ومتجر Play مبسّط.
+لكل مجموعة زمن استجابة ونسبة أخطاء قابلة للضبط، وإحصاءات على /__stats.
+
+    python fake_services.py --port 8765 --latency gemini=1.5 --errors gemini=0.1
+"""
+import os, re, sys, json, time, random, hashlib, threading, argparse
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from xml.sax.saxutils import escape
+
+# =================== الإعدادات الافتراضية ===================
+# زمن الاستجابة (ثوانٍ) لكل مجموعة، قريب من المرصود على GitHub Actions
+DEFAULT_LATENCY = {
+    "token": 0.15,
+    "blogger": 0.25,
+    "batch": 0.4,
+    "gemini": 2.0,
+    "gemini_models": 0.2,
+    "images": 0.3,
+    "wiki": 0.2,
+    "rss": 0.3,
+    "play": 0.4,
+}
+# في البث: أول دفعة بعد gemini_ttfb ثم gemini_chunk لكل دفعة
+STREAM_TTFB = 0.6
+STREAM_CHUNK = 0.05
+STREAM_CHUNK_WORDS = 40
+ARTICLE_WORDS = 1600
+JITTER = 0.3
+
+# الخطأ المحقون لكل مجموعة (رمز الحالة + جسم الرد)
+ERROR_RESPONSES = {
+    "gemini": (429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED",
+                               "details": [{"retryDelay": "1s"}]}}),
+    "blogger": (503, {"error": {"code": 503, "message": "Backend Error"}}),
+    "images": (500, {"error": "upstream"}),
+    "play": (503, {"error": "unavailable"}),
+}
+
+GEMINI_MODELS = ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-1.5-flash", "gemini-pro"]
+WORDS = ("التقنية الهاتف الحاسوب الشبكة التطبيق البيانات الأمان الأداء التحديث الإعدادات "
+         "الخطوات الحل المشكلة النظام الذاكرة البطارية السرعة الجهاز المستخدم الخدمة").split()
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _seed(*parts):
+    return int(hashlib.md5("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:8], 16)
+
+
+def fake_article(prompt, words=ARTICLE_WORDS):
+    rnd = random.Random(_seed(prompt, time.time_ns()))
+    tag = rnd.randrange(10**6)
+    lines = [f"# دليل {rnd.choice(WORDS)} {rnd.choice(WORDS)} رقم {tag}", ""]
+    n = 0
+    while n < words:
+        if n % 300 == 0:
+            lines += [f"## {rnd.choice(WORDS)} {rnd.choice(WORDS)}", ""]
+        para = " ".join(rnd.choice(WORDS) for _ in range(60))
+        lines += [para + ".", ""]
+        n += 60
+    return "\n".join(lines)
+
+
+def fake_reply(prompt):
+    # مطالبات "العنوان فقط" (مثل invent_topic) تأخذ سطرًا واحدًا
+    if "العنوان فقط" in prompt or "title only" in prompt.lower():
+        rnd = random.Random(_seed(prompt, time.time_ns()))
+        return f"طريقة حل مشكلة {rnd.choice(WORDS)} في {rnd.choice(WORDS)} رقم {rnd.randrange(10**6)}"
+    return fake_article(prompt)
+
+
+class FakeState:
+    """حالة المدونة المزيفة + الإحصاءات (آمنة بين الخيوط)."""
+
+    def __init__(self, latency=None, errors=None, scale=1.0, seed=0):
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.errors = dict(errors or {})
+        self.scale = scale
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.blog_id = "7000000000000000001"
+        self.posts = {}
+        # صفحة المتجر موجودة مسبقًا كما في المدونة الحقيقية (store_bot يحدّثها فقط)
+        self.pages = {"900": {"kind": "blogger#page", "id": "900", "title": "المتجر", "content": "",
+                              "status": "LIVE", "published": _now_iso(), "updated": _now_iso(),
+                              "url": "http://fake.blog/p/store.html"}}
+        self._next_id = 1000
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {}
+
+    def record(self, group, seconds, status):
+        with self.lock:
+            st = self.stats.setdefault(group, {"count": 0, "errors": 0, "seconds": 0.0})
+            st["count"] += 1
+            st["seconds"] += seconds
+            if status >= 400: st["errors"] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "groups": json.loads(json.dumps(self.stats)),
+                "posts": len(self.posts),
+                "pages": len(self.pages),
+            }
+
+    def delay(self, group, base=None):
+        base = self.latency.get(group, 0.1) if base is None else base
+        with self.lock:
+            j = 1 + self.rnd.uniform(-JITTER, JITTER)
+        time.sleep(max(0.0, base * j * self.scale))
+
+    def should_fail(self, group):
+        rate = self.errors.get(group, 0)
+        if not rate: return False
+        with self.lock:
+            return self.rnd.random() < rate
+
+    def new_id(self):
+        with self.lock:
+            self._next_id += 1
+            return str(self._next_id)
+
+
+# =================== Blogger v3 ===================
+def _blogger(state, method, parts, q, body):
+    """parts: المسار بعد /blogger/v3/ مقسومًا. يعيد (status, obj)."""
+    if parts[:2] == ["blogs", "byurl"]:
+        return 200, {"kind": "blogger#blog", "id": state.blog_id, "url": q.get("url", [""])[0]}
+    if len(parts) < 3 or parts[0] != "blogs" or parts[1] != state.blog_id:
+        return 404, {"error": {"code": 404, "message": "Not Found"}}
+    kind, rest = parts[2], parts[3:]
+    store = state.posts if kind == "posts" else state.pages if kind == "pages" else None
+    if store is None:
+        return 404, {"error": {"code": 404, "message": "Not Found"}}
+    now = _now_iso()
+
+    if not rest and method == "GET":
+        statuses = {s.lower() for s in q.get("status", [])} or {"live"}
+        items = [p for p in store.values() if p["status"].lower() in statuses]
+        start = q.get("startDate", [None])[0]
+        if start: items = [p for p in items if p["published"] >= start]
+        key = "updated" if q.get("orderBy", [""])[0].upper() == "UPDATED" else "published"
+        items.sort(key=lambda p: p[key], reverse=True)
+        size = int(q.get("maxResults", ["20"])[0])
+        off = int(q.get("pageToken", ["0"])[0] or 0)
+        out = {"kind": f"blogger#{kind[:-1]}List", "items": items[off:off + size]}
+        if off + size < len(items): out["nextPageToken"] = str(off + size)
+        return 200, out
+
+    if not rest and method == "POST":
+        pid = state.new_id()
+        draft = q.get("isDraft", ["false"])[0].lower() == "true"
+        slug = re.sub(r"\W+", "-", (body.get("title") or pid).lower()).strip("-")[:40] or pid
+        item = {
+            "kind": f"blogger#{kind[:-1]}", "id": pid,
+            "title": body.get("title", ""), "content": body.get("content", ""),
+            "labels": body.get("labels", []),
+            "status": "DRAFT" if draft else ("SCHEDULED" if body.get("published", "") > now else "LIVE"),
+            "published": body.get("published") or now, "updated": now,
+            "url": f"http://fake.blog/{'p/' if kind == 'pages' else '2026/'}{slug}-{pid}.html",
+        }
+        with state.lock:
+            store[pid] = item
+        return 200, item
+
+    pid = rest[0] if rest else ""
+    item = store.get(pid)
+    if item is None:
+        return 404, {"error": {"code": 404, "message": "Not Found"}}
+    if method == "GET":
+        return 200, item
+    if method == "DELETE":
+        with state.lock:
+            store.pop(pid, None)
+        return 204, None
+    if method in ("PUT", "PATCH"):
+        with state.lock:
+            item.update({k: v for k, v in body.items() if k in ("title", "content", "labels", "published")})
+            item["updated"] = now
+        return 200, item
+    return 405, {"error": {"code": 405}}
+
+
+def _split_head(blob):
+    for sep in (b"\r\n\r\n", b"\n\n"):
+        if sep in blob:
+            head, body = blob.split(sep, 1)
+            return head.decode("utf-8", "replace"), body
+    return blob.decode("utf-8", "replace"), b""
+
+
+def _batch_parts(raw, content_type):
+    # تقسيم multipart/mixed يدويًا على البايتات (المحتوى العربي يبقى UTF-8 سليمًا)
+    m = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not m: return
+    for chunk in raw.split(b"--" + m.group(1).encode()):
+        chunk = chunk.strip(b"\r\n")
+        if not chunk or chunk == b"--": continue
+        head, inner = _split_head(chunk)
+        cid = re.search(r"(?im)^content-id:\s*<?([^>\r\n]+)>?", head)
+        yield (cid.group(1) if cid else ""), inner
+
+
+def _blogger_batch(state, raw, content_type):
+    boundary = "batch_" + hashlib.md5(raw[:64]).hexdigest()[:12]
+    out = []
+    for cid, inner in _batch_parts(raw, content_type):
+        head, body = _split_head(inner)
+        lines = head.splitlines()
+        method, target = lines[0].split(" ")[:2]
+        u = urlsplit(target)
+        path = u.path.split("/blogger/v3/", 1)[-1].split("/")
+        try:
+            payload = json.loads(body.decode("utf-8")) if body.strip() else {}
+        except ValueError:
+            payload = {}
+        status, obj = _blogger(state, method, path, parse_qs(u.query), payload)
+        data = json.dumps(obj or {}, ensure_ascii=False)
+        out.append(
+            f"--{boundary}\r\nContent-Type: application/http\r\n"
+            f"Content-ID: <response-{cid}>\r\n\r\n"
+            f"HTTP/1.1 {status} OK\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{data}\r\n")
+    out.append(f"--{boundary}--\r\n")
+    return "".join(out).encode("utf-8"), f"multipart/mixed; boundary={boundary}"
+
+
+# =================== Gemini ===================
+def _gemini_payload(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                            "finishReason": "STOP"}]}
+
+
+# =================== الصور / RSS / Play ===================
+def _image_items(state, provider, query, n=10):
+    base = f"http://{state.host}/img"
+    rnd = random.Random(_seed(provider, query))
+    ids = [rnd.randrange(10**9) for _ in range(n)]
+    if provider == "unsplash":
+        return {"results": [{"urls": {"regular": f"{base}/u{i}.jpg"},
+                             "user": {"name": "Fake", "links": {"html": "http://fake.unsplash"}}} for i in ids]}
+    if provider == "pexels":
+        return {"photos": [{"url": f"http://fake.pexels/{i}", "src": {"large2x": f"{base}/p{i}.jpg"}} for i in ids]}
+    return {"hits": [{"pageURL": f"http://fake.pixabay/{i}", "largeImageURL": f"{base}/x{i}.jpg"} for i in ids]}
+
+
+def _rss(title, items):
+    body = "".join(f"<item><title>{escape(t)}</title><link>{escape(l)}</link></item>" for t, l in items)
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>{escape(title)}</title>{body}</channel></rss>").encode("utf-8")
+
+
+def _play_search(query, n):
+    rnd = random.Random(_seed("search", query))
+    out = []
+    for i in range(n):
+        pkg = f"com.fake.{re.sub(r'[^a-z]', '', query.lower())[:10] or 'app'}{rnd.randrange(10**6)}"
+        out.append({"appId": pkg, "title": f"{query} {i}", "score": round(rnd.uniform(3.0, 5.0), 1),
+                    "icon": f"http://fake.play/icon/{pkg}.png"})
+    return out
+
+
+def _play_app(state, pkg):
+    rnd = random.Random(_seed("app", pkg))
+    return {
+        "appId": pkg, "title": f"Fake App {pkg[-6:]}",
+        "description": " ".join(rnd.choice(WORDS) for _ in range(300)),
+        "icon": None if rnd.random() < 0.05 else f"http://{state.host}/img/icon-{pkg}.png",
+        "headerImage": f"http://{state.host}/img/header-{pkg}.jpg",
+        "score": round(rnd.uniform(3.0, 5.0), 2), "genre": "Tools",
+        "installs": f"{rnd.randrange(1, 100)},000,000+", "developer": "Fake Studio",
+    }
+
+
+# =================== الخادم ===================
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeGoogle/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _send(self, status, obj=None, ctype="application/json; charset=UTF-8", raw=None):
+        data = raw if raw is not None else (b"" if obj is None else
+                                            json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429: self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_feed(self, raw):
+        # ETag مثل خوادم Google: If-None-Match المطابق -> 304 بلا جسم
+        etag = '"%s"' % hashlib.md5(raw).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return 304
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml")
+        self.send_header("Content-Length", str(len(raw)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(raw)
+        return 200
+
+    def _route(self, method):
+        t0 = time.monotonic()
+        u = urlsplit(self.path)
+        q = parse_qs(u.query)
+        parts = [p for p in u.path.split("/") if p]
+        raw = self._body()
+        group, status = "other", 200
+        try:
+            group, status = self._dispatch(method, parts, q, raw)
+        except Exception as e:
+            status = 500
+            self._send(500, {"error": str(e)})
+        finally:
+            self.state.record(group, time.monotonic() - t0, status)
+
+    def _fail(self, group):
+        if not self.state.should_fail(group): return False
+        status, obj = ERROR_RESPONSES.get(group, (500, {"error": "injected"}))
+        self.state.delay(group)
+        self._send(status, obj)
+        return status
+
+    def _dispatch(self, method, parts, q, raw):
+        st = self.state
+        head = parts[0] if parts else ""
+
+        if head == "__stats":
+            self._send(200, st.snapshot())
+            return "admin", 200
+        if head == "__reset" and method == "POST":
+            st.reset_stats()
+            self._send(200, {"ok": True})
+            return "admin", 200
+
+        if head == "token":
+            st.delay("token")
+            self._send(200, {"access_token": "fake-" + st.new_id(), "expires_in": 3600,
+                             "token_type": "Bearer", "scope": "https://www.googleapis.com/auth/blogger"})
+            return "token", 200
+
+        if head == "blogger" and parts[1:2] == ["batch"]:
+            code = self._fail("blogger")
+            if code: return "batch", code
+            st.delay("batch")
+            data, ctype = _blogger_batch(st, raw, self.headers.get("Content-Type", ""))
+            self._send(200, raw=data, ctype=ctype)
+            return "batch", 200
+
+        if head == "blogger" and parts[1:2] == ["v3"]:
+            code = self._fail("blogger")
+            if code: return "blogger", code
+            st.delay("blogger")
+            body = json.loads(raw.decode("utf-8")) if raw.strip() else {}
+            status, obj = _blogger(st, method, parts[2:], q, body)
+            self._send(status, obj)
+            return "blogger", status
+
+        if head == "gemini" and len(parts) >= 3:
+            ver, rest = parts[1], parts[2:]
+            if rest == ["models"]:
+                st.delay("gemini_models")
+                self._send(200, {"models": [{"name": f"models/{m}",
+                                             "supportedGenerationMethods": ["generateContent"]}
+                                            for m in GEMINI_MODELS]})
+                return "gemini_models", 200
+            model, _, action = rest[-1].partition(":")
+            if model not in GEMINI_MODELS:
+                st.delay("gemini_models")
+                self._send(404, {"error": {"code": 404, "message": f"models/{model} is not found"}})
+                return "gemini", 404
+            code = self._fail("gemini")
+            if code: return "gemini", code
+            body = json.loads(raw.decode("utf-8")) if raw.strip() else {}
+            prompt = "".join(p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", []))
+            text = fake_reply(prompt)
+            if action == "streamGenerateContent":
+                self._stream(text)
+            else:
+                st.delay("gemini")
+                self._send(200, _gemini_payload(text))
+            return "gemini", 200
+
+        if head in ("unsplash", "pexels", "pixabay"):
+            code = self._fail("images")
+            if code: return "images", code
+            st.delay("images")
+            query = (q.get("query") or q.get("q") or [""])[0]
+            self._send(200, _image_items(st, head, query))
+            return "images", 200
+
+        if head == "wiki":
+            st.delay("wiki")
+            title = q.get("titles", [""])[0]
+            src = f"http://{st.host}/img/wiki-{_seed(title)}.jpg"
+            self._send(200, {"query": {"pages": {"1": {"title": title, "original": {"source": src}}}}})
+            return "wiki", 200
+
+        if head == "img":
+            self._send(200, raw=b"\xff\xd8\xff\xe0fakejpeg", ctype="image/jpeg")
+            return "img", 200
+
+        if head == "trends":
+            st.delay("rss")
+            geo = q.get("geo", ["IQ"])[0]
+            rnd = random.Random(_seed("trends", geo, int(time.time() // 3600)))
+            items = [(f"ترند {geo} {rnd.choice(WORDS)} {rnd.randrange(10**4)}", "http://fake.trends/")
+                     for _ in range(10)]
+            return "rss", self._send_feed(_rss("Daily Search Trends", items))
+
+        if head == "news":
+            st.delay("rss")
+            items = [(f"خبر {i} {WORDS[i % len(WORDS)]}", f"http://fake.news/{i}") for i in range(10)]
+            return "rss", self._send_feed(_rss("Google News", items))
+
+        if head == "play":
+            code = self._fail("play")
+            if code: return "play", code
+            st.delay("play")
+            if parts[1:2] == ["search"]:
+                n = int(q.get("n_hits", ["30"])[0])
+                self._send(200, _play_search(q.get("q", [""])[0], n))
+            else:
+                self._send(200, _play_app(st, parts[-1]))
+            return "play", 200
+
+        self._send(404, {"error": "no route", "path": self.path})
+        return "other", 404
+
+    def _stream(self, text):
+        st = self.state
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        st.delay("gemini", STREAM_TTFB)
+        words = text.split(" ")
+        try:
+            for i in range(0, len(words), STREAM_CHUNK_WORDS):
+                chunk = " ".join(words[i:i + STREAM_CHUNK_WORDS]) + " "
+                data = json.dumps(_gemini_payload(chunk), ensure_ascii=False)
+                self.wfile.write(f"data: {data}\r\n\r\n".encode("utf-8"))
+                self.wfile.flush()
+                st.delay("gemini", STREAM_CHUNK)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # العميل أغلق الاتصال بعد حد الكلمات
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # العمليات الفرعية تغلق اتصالات keep-alive عند خروجها
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class FakeServer:
+    """يشغّل الخادم في خيط خلفي؛ env() يعيد متغيرات البيئة التي توجّه البوتات إليه."""
+
+    def __init__(self, host="127.0.0.1", port=0, **state_kw):
+        self.httpd = _QuietHTTPServer((host, port), _Handler)
+        self.state = self.httpd.state = FakeState(**state_kw)
+        self.host, self.port = self.httpd.server_address[:2]
+        self.state.host = f"{self.host}:{self.port}"
+        self.thread = None
+
+    @property
+    def root(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def env(self):
+        r = self.root
+        return {
+            "GOOGLE_TOKEN_URI": f"{r}/token",
+            "BLOGGER_API_ROOT": f"{r}/blogger/",
+            "GEMINI_API_ROOT": f"{r}/gemini",
+            "UNSPLASH_API_URL": f"{r}/unsplash/search/photos",
+            "PEXELS_API_URL": f"{r}/pexels/v1/search",
+            "PIXABAY_API_URL": f"{r}/pixabay/api/",
+            "WIKIPEDIA_API_URL": r + "/wiki/{lang}/w/api.php",
+            "TRENDS_RSS_URL": r + "/trends/rss?geo={geo}",
+            "NEWS_RSS_URL": f"{r}/news/rss",
+            "FAKE_PLAY_ROOT": f"{r}/play",
+        }
+
+
+def parse_kv(items):
+    """["gemini=1.5", "blogger=0.2,play=0.1"] -> {"gemini": 1.5, ...}"""
+    out = {}
+    for item in items or []:
+        for kv in item.split(","):
+            if "=" in kv:
+                k, v = kv.split("=", 1)
+                out[k.strip()] = float(v)
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local fake Google/Blogger/Gemini services")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", action="append", help="group=seconds (e.g. gemini=1.5)")
+    ap.add_argument("--errors", action="append", help="group=rate (e.g. gemini=0.1)")
+    ap.add_argument("--scale", type=float, default=float(os.getenv("FAKE_LATENCY_SCALE", "1")))
+    args = ap.parse_args()
+    srv = FakeServer(args.host, args.port, latency=parse_kv(args.latency),
+                     errors=parse_kv(args.errors), scale=args.scale)
+    print(f"🧪 Fake services on {srv.root}")
+    for k, v in srv.env().items():
+        print(f"export {k}='{v}'")
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
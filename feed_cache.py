@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import os, time, threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import feedparser
+
+import tracing
+from local_cache import cache_path, load_zjson, save_zjson
+
+# =================== كاش خلاصات RSS ===================
+CACHE_FILE = cache_path("feeds.json.z")
+# خلاصة جُلبت قبل أقل من هذا لا تُطلب أصلًا؛ بعده طلب مشروط (ETag / Last-Modified)
+FEED_FRESH_S = int(os.getenv("FEED_FRESH_S", "900"))
+FEED_TIMEOUT_S = float(os.getenv("FEED_TIMEOUT_S", "15"))
+FEED_WORKERS = int(os.getenv("FEED_WORKERS", "8"))
+# خلاصات لم تُستخدم منذ أسبوع تُحذف من الكاش
+FEED_KEEP_S = 7 * 24 * 3600
+USER_AGENT = "Mozilla/5.0 (compatible; feed-cache/1.0)"
+
+
+class FeedCache:
+    """
+    عناصر الخلاصات المحللة (العنوان والرابط فقط) مع ETag وLast-Modified لكل رابط،
+    وقيم مشتقة (مثل ترتيب الترندات المدمج) بمدة صلاحية.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        data = load_zjson(path, {}) or {}
+        self._feeds = data.get("feeds", {})
+        self._values = data.get("values", {})
+        self._dirty = False
+
+    # ---------- خلاصات ----------
+    def fetch(self, url):
+        """[(العنوان، الرابط)]؛ عند فشل الشبكة تُعاد آخر نسخة محفوظة."""
+        with self._lock:
+            e = dict(self._feeds.get(url) or {})
+        if e and time.time() - e.get("t", 0) < FEED_FRESH_S:
+            return [tuple(x) for x in e["items"]]
+        headers = {"User-Agent": USER_AGENT}
+        if e.get("etag"): headers["If-None-Match"] = e["etag"]
+        if e.get("modified"): headers["If-Modified-Since"] = e["modified"]
+        try:
+            r = requests.get(url, headers=headers, timeout=FEED_TIMEOUT_S)
+            if r.status_code == 304 and e:
+                items = e["items"]
+            else:
+                r.raise_for_status()
+                feed = feedparser.parse(r.content)
+                items = [[x.get("title", ""), x.get("link", "")] for x in feed.entries
+                         if x.get("title")]
+                e = {"etag": r.headers.get("ETag"), "modified": r.headers.get("Last-Modified")}
+        except Exception as ex:
+            print(f"⚠️ Feed fetch failed ({url}): {ex}")
+            return [tuple(x) for x in e.get("items", [])]
+        with self._lock:
+            self._feeds[url] = {**e, "items": items, "t": time.time()}
+            self._dirty = True
+        return [tuple(x) for x in items]
+
+    def fetch_many(self, urls):
+        """يجلب كل الروابط معًا؛ يعيد {الرابط: العناصر}."""
+        urls = list(dict.fromkeys(urls))
+        if len(urls) <= 1:
+            return {u: self.fetch(u) for u in urls}
+        with ThreadPoolExecutor(max_workers=min(FEED_WORKERS, len(urls))) as pool:
+            futs = [pool.submit(tracing.bind(self.fetch), u) for u in urls]
+            return {u: f.result() for u, f in zip(urls, futs)}
+
+    # ---------- قيم مشتقة ----------
+    def get_value(self, key, ttl):
+        with self._lock:
+            v = self._values.get(key)
+        if v and time.time() - v["t"] < ttl:
+            return v["value"]
+        return None
+
+    def put_value(self, key, value):
+        with self._lock:
+            self._values[key] = {"value": value, "t": time.time()}
+            self._dirty = True
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty: return
+            now = time.time()
+            self._feeds = {u: e for u, e in self._feeds.items() if now - e.get("t", 0) < FEED_KEEP_S}
+            self._values = {k: v for k, v in self._values.items() if now - v["t"] < FEED_KEEP_S}
+            try:
+                save_zjson(self.path, {"feeds": self._feeds, "values": self._values})
+            except OSError as ex:
+                print(f"⚠️ Could not save feed cache: {ex}")
+            self._dirty = False
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_feed_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FeedCache()
+    return _cache
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
-import os, random, markdown as md
+import os, markdown as md
 import requests
 import backoff
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google_play_scraper import search as play_search, app as play_app
+import blogger_client
+import gemini_models
+from rate_limiter import get_limiter
+from package_index import get_package_index
+from play_queue import CandidateQueue
+from article_cache import generate_cached, publish_tracked, publish_pending
 
 # =================== إعدادات المستخدم ===================
 MONETAG_DIRECT_LINK = "https://otieu.com/4/10485502"
@@ -16,8 +19,8 @@ BLOG_URL = os.environ["BLOG_URL"]
 CLIENT_ID = os.environ["CLIENT_ID"]
 CLIENT_SECRET = os.environ["CLIENT_SECRET"]
 REFRESH_TOKEN = os.environ["REFRESH_TOKEN"]
-HISTORY_GAMES_FILE = "history_gaming.txt"
-GEMINI_API_ROOT = "https://generativelanguage.googleapis.com"
+HISTORY_BOT = "gaming"  # history.db (history_store.py)
+GEMINI_API_ROOT = os.getenv("GEMINI_API_ROOT", "https://generativelanguage.googleapis.com")
 
 SEARCH_QUERIES = [
     "Battle Royale", "FPS Shooting", "Action RPG", "Racing Car", 
@@ -25,59 +28,27 @@ SEARCH_QUERIES = [
 ]
 
 # =================== 1. دوال التاريخ والجلب ===================
-def load_used_games():
-    if not os.path.exists(HISTORY_GAMES_FILE): return set()
-    with open(HISTORY_GAMES_FILE, "r", encoding="utf-8") as f:
-        return set(line.strip() for line in f if line.strip())
+def is_used_game(package_name):
+    return get_package_index(HISTORY_BOT).contains(package_name)
 
 def save_used_game(package_name):
-    with open(HISTORY_GAMES_FILE, "a", encoding="utf-8") as f:
-        f.write(f"{package_name}\n")
+    get_package_index(HISTORY_BOT).add(package_name)
+
+# طابور مرشحين جاهزين (يُعبأ بالتوازي عند الحاجة فقط)
+GAME_QUEUE = CandidateQueue("gaming", SEARCH_QUERIES, lang="ar", country="sa",
+                            n_hits=30, min_score=3.8, is_used=is_used_game)
 
 def get_fresh_game():
-    used_games = load_used_games()
-    queries = SEARCH_QUERIES[:]
-    random.shuffle(queries)
     print(f"🎮 Scanning Google Play...")
-    
-    for query in queries:
-        try:
-            results = play_search(query, lang="ar", country="sa", n_hits=30)
-            for game in results:
-                pkg = game['appId']
-                if pkg in used_games: continue
-                if game.get('score', 0) < 3.8: continue 
-
-                try: details = play_app(pkg, lang='ar', country='sa')
-                except: continue
-                
-                if not details.get('icon'): continue
-                print(f"✅ Found Game: {details['title']}")
-                return details
-        except: continue
-    return None
+    details = GAME_QUEUE.next_candidate()
+    if details: print(f"✅ Found Game: {details['title']}")
+    return details
 
 # =================== 2. المحرك الذكي (Auto-Detect Model) ===================
 # هذه الدالة هي السر: تبحث عن الموديل الشغال في حسابك بدلاً من التخمين
+# (النتيجة محفوظة في الكاش المشترك، فلا نسرد /models قبل كل توليد)
 def get_working_model():
-    url = f"{GEMINI_API_ROOT}/v1beta/models?key={GEMINI_API_KEY}"
-    try:
-        r = requests.get(url, timeout=30)
-        if r.status_code != 200: 
-            print("⚠️ List models failed, using default fallback.")
-            return "gemini-1.5-flash" # خطة بديلة
-            
-        data = r.json()
-        # نبحث عن أول موديل يدعم الكتابة (generateContent)
-        for model in data.get('models', []):
-            name = model['name'].replace('models/', '')
-            if 'generateContent' in model.get('supportedGenerationMethods', []):
-                print(f"🤖 Auto-detected Model: {name}")
-                return name
-        return "gemini-1.5-flash"
-    except Exception as e:
-        print(f"⚠️ Model detection error: {e}")
-        return "gemini-1.5-flash"
+    return gemini_models.get_working_model(fallback="gemini-1.5-flash")
 
 @backoff.on_exception(backoff.expo, Exception, max_tries=3)
 def ask_gemini_game_review(game_details):
@@ -102,11 +73,20 @@ def ask_gemini_game_review(game_details):
     استخدم الايموجي 🎮🔥. بدون روابط.
     """
     
+    # (المقال، مفتاح كاش المقالات): مراجعة لم تُنشر بعد لنفس اللعبة لا تُولّد مجددًا
+    return generate_cached(prompt, lambda: _rest_generate(model_name, prompt), HISTORY_BOT,
+                           model=model_name, meta={"appId": game_details['appId']})
+
+def _rest_generate(model_name, prompt):
     url = f"{GEMINI_API_ROOT}/v1beta/models/{model_name}:generateContent?key={GEMINI_API_KEY}"
     safety = [{"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"}]
     
     try:
+        limiter = get_limiter("gemini")
+        limiter.acquire()
         r = requests.post(url, json={"contents": [{"parts": [{"text": prompt}]}], "safetySettings": safety}, timeout=60)
+        limiter.observe(r)
+        gemini_models.report_status("v1beta", model_name, r.status_code)
         if r.status_code == 200:
             return r.json()["candidates"][0]["content"]["parts"][0]["text"]
         else:
@@ -160,18 +140,24 @@ def build_game_post_html(game_details, article_html):
     return header + md.markdown(article_html, extensions=['extra']) + buttons_html
 
 def post_to_blogger(title, content):
-    creds = Credentials(None, refresh_token=REFRESH_TOKEN, client_id=CLIENT_ID, client_secret=CLIENT_SECRET, token_uri="https://oauth2.googleapis.com/token")
-    service = build("blogger", "v3", credentials=creds)
-    blog_id = service.blogs().getByUrl(url=BLOG_URL).execute()["id"]
+    service = blogger_client.get_service()
+    blog_id = blogger_client.get_blog_id(BLOG_URL, service=service)
     body = {"kind": "blogger#post", "title": title, "content": content, "labels": GAME_LABELS}
     return service.posts().insert(blogId=blog_id, body=body, isDraft=False).execute()
 
-if __name__ == "__main__":
+def _pending_published(art, res):
+    if art["meta"].get("appId"): save_used_game(art["meta"]["appId"])
+
+def run():
     print("🎮 Starting Gaming Bot (Free Auto-Model)...")
+    # فحص رخيص مرة لكل مهمة: history.db قد يتغير بين مهام المجدول
+    get_package_index(HISTORY_BOT).refresh()
+    # مراجعة مولّدة فشل نشرها في تشغيل سابق تُنشر أولًا بلا توليد جديد
+    if publish_pending(HISTORY_BOT, post_to_blogger, _pending_published): return
     game_data = get_fresh_game()
     if game_data:
         print(f"📝 Generating review for: {game_data['title']}...")
-        article = ask_gemini_game_review(game_data)
+        article, key = ask_gemini_game_review(game_data)
         if article:
             lines = article.strip().split('\n')
             title = lines[0].replace('#', '').replace('*', '').strip()
@@ -179,9 +165,13 @@ if __name__ == "__main__":
             
             final_html = build_game_post_html(game_data, article)
             try:
-                res = post_to_blogger(title, final_html)
+                res = publish_tracked(key, title, final_html, lambda: post_to_blogger(title, final_html))
                 save_used_game(game_data['appId'])
                 print(f"🎉 PUBLISHED! URL: {res.get('url')}")
             except Exception as e: print(f"❌ Publish Error: {e}")
         else: print("❌ Content generation failed.")
     else: print("❌ No game found.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import os, time, threading
+
+import requests
+
+from local_cache import cache_path, load_json, save_json
+
+# =================== إعدادات النظام ===================
+GEMINI_API_KEY = os.environ["GEMINI_API_KEY"]
+GEMINI_API_ROOT = os.getenv("GEMINI_API_ROOT", "https://generativelanguage.googleapis.com")
+
+MODELS_FILE = cache_path("gemini_models.json")
+# كم نثق بالموديل الناجح قبل إعادة سرد الموديلات
+MODEL_TTL_S = int(os.getenv("GEMINI_MODEL_TTL_S", str(24 * 3600)))
+# الموديل الذي فشل يُتجاوز لهذه المدة
+FAILED_TTL_S = int(os.getenv("GEMINI_FAILED_TTL_S", str(6 * 3600)))
+
+# ترتيب التجربة إن لم يكن هناك موديل معروف (نفس ترتيب main.py القديم)
+DEFAULT_ATTEMPTS = [
+    ("v1beta", "gemini-2.5-flash"),
+    ("v1", "gemini-2.5-flash"),
+    ("v1beta", "gemini-2.0-flash"),
+    ("v1", "gemini-2.0-flash"),
+    ("v1beta", "gemini-pro"),
+    ("v1", "gemini-pro"),
+]
+
+# رموز تعني أن الموديل غير متاح لهذا المفتاح/الإصدار (وليس ضغطًا مؤقتًا مثل 429)
+# 400 ليس منها: رفض على مستوى الـ prompt أو الأمان لا يعني أن الموديل معطل
+DEAD_STATUSES = (403, 404)
+
+_lock = threading.Lock()
+
+
+def _load():
+    return load_json(MODELS_FILE, {}) or {}
+
+
+def _key(ver, model):
+    return f"{ver}/{model}"
+
+
+def list_models(ver="v1beta"):
+    """يسرد الموديلات الداعمة لـ generateContent (طلب واحد، يُستخدم عند انتهاء الكاش)."""
+    url = f"{GEMINI_API_ROOT}/{ver}/models?key={GEMINI_API_KEY}"
+    r = requests.get(url, timeout=30)
+    if r.status_code != 200: return []
+    out = []
+    for model in r.json().get("models", []):
+        if "generateContent" in model.get("supportedGenerationMethods", []):
+            out.append(model["name"].replace("models/", ""))
+    return out
+
+
+def recently_failed(ver, model, state=None):
+    state = state if state is not None else _load()
+    t = (state.get("failed") or {}).get(_key(ver, model), 0)
+    return time.time() - t < FAILED_TTL_S
+
+
+def candidates(attempts=None):
+    """
+    قائمة (الإصدار، الموديل) للتجربة بترتيب المستدعي نفسه مع تجاوز ما فشل مؤخرًا.
+    الموديل "الناجح" المحفوظ لا يتقدم هنا: قد يكون ما اكتشفه بوت آخر عبر /models.
+    إن تجاوزنا كل شيء نرجع للقائمة كاملة.
+    """
+    attempts = list(attempts or DEFAULT_ATTEMPTS)
+    state = _load()
+    out = [(ver, model) for ver, model in attempts
+           if not recently_failed(ver, model, state)]
+    return out or attempts
+
+
+def mark_good(ver, model):
+    with _lock:
+        state = _load()
+        # موديل ناجح واحد لكل إصدار API (v1 / v1beta)
+        state.setdefault("good", {})[ver] = {"model": model, "time": time.time()}
+        (state.get("failed") or {}).pop(_key(ver, model), None)
+        save_json(MODELS_FILE, state)
+
+
+def mark_failed(ver, model):
+    with _lock:
+        state = _load()
+        state.setdefault("failed", {})[_key(ver, model)] = time.time()
+        if (state.get("good") or {}).get(ver, {}).get("model") == model:
+            state["good"].pop(ver, None)
+        save_json(MODELS_FILE, state)
+
+
+def report_status(ver, model, status_code):
+    """يسجل نتيجة طلب توليد: النجاح يثبت الموديل، والرفض الدائم يستبعده مؤقتًا."""
+    if status_code == 200:
+        good = (_load().get("good") or {}).get(ver) or {}
+        fresh = time.time() - good.get("time", 0) < MODEL_TTL_S / 2
+        if not (good.get("model") == model and fresh):
+            mark_good(ver, model)
+    elif status_code in DEAD_STATUSES:
+        mark_failed(ver, model)
+
+
+def get_working_model(fallback="gemini-1.5-flash", ver="v1beta"):
+    """
+    للبوتات المفردة: يعيد الموديل المحفوظ مباشرة، ولا يسرد الموديلات
+    (/models) إلا عند انتهاء الكاش أو فشل الموديل المحفوظ.
+    """
+    good = (_load().get("good") or {}).get(ver) or {}
+    if good.get("model") and time.time() - good.get("time", 0) < MODEL_TTL_S:
+        return good["model"]
+    try:
+        names = list_models(ver)
+    except Exception as e:
+        print(f"⚠️ Model detection error: {e}")
+        names = []
+    state = _load()
+    for name in names:
+        if not recently_failed(ver, name, state):
+            print(f"🤖 Auto-detected Model: {name}")
+            mark_good(ver, name)
+            return name
+    return fallback
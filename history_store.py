@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+import os, re, json, sqlite3, threading
+from datetime import datetime, timezone
+
+# =================== إعدادات السجل ===================
+# قاعدة واحدة لكل البوتات (تُحفظ في المستودع مثل ملفات السجل القديمة)
+HISTORY_DB = os.getenv("HISTORY_DB", "history.db")
+
+# الملفات القديمة تُستورد مرة واحدة فقط: (المسار، البوت، النوع)
+LEGACY_FILES = [
+    ("posted_titles.jsonl", "main", "titles_jsonl"),
+    ("used_topics.jsonl", "main", "topics_jsonl"),
+    ("history_apps.txt", "apps", "packages_txt"),
+    ("history_gaming.txt", "gaming", "packages_txt"),
+    ("history_gaming.json", "gaming", "titles_json"),
+    ("history_tech_solutions.json", "tech_solutions", "topics_json"),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bot TEXT NOT NULL,
+    title TEXT NOT NULL,
+    norm TEXT NOT NULL,
+    time TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_titles_bot_norm ON titles(bot, norm);
+CREATE INDEX IF NOT EXISTS idx_titles_bot_time ON titles(bot, time);
+
+CREATE TABLE IF NOT EXISTS topics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bot TEXT NOT NULL,
+    topic_key TEXT NOT NULL,
+    topic TEXT NOT NULL DEFAULT '',
+    time TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_topics_bot_key_time ON topics(bot, topic_key, time);
+CREATE INDEX IF NOT EXISTS idx_topics_bot_time ON topics(bot, time);
+
+CREATE TABLE IF NOT EXISTS packages (
+    bot TEXT NOT NULL,
+    package_id TEXT NOT NULL,
+    time TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (bot, package_id)
+);
+CREATE INDEX IF NOT EXISTS idx_packages_time ON packages(time);
+
+CREATE TABLE IF NOT EXISTS imports (
+    path TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    time TEXT NOT NULL
+);
+"""
+
+
+def norm_key(s: str) -> str:
+    s = s or ""
+    s = s.lower()
+    s = re.sub(r"[^\w\u0600-\u06FF]+", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def _utc_iso(when=None) -> str:
+    # نخزن الأوقات بتوقيت UTC حتى تصلح المقارنة النصية في الفهارس
+    if when is None:
+        when = datetime.now(timezone.utc)
+    elif isinstance(when, str):
+        try:
+            when = datetime.fromisoformat(when)
+        except ValueError:
+            return ""
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+
+class HistoryStore:
+    """سجل موحّد (عناوين، مواضيع، حزم) على SQLite مع فهارس لكل استعلام."""
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as c:
+            c.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- كتابة (O(1) + تحديث الفهرس) ----------
+    def add_title(self, bot, title, when=None):
+        with self._conn() as c:
+            c.execute("INSERT INTO titles(bot, title, norm, time) VALUES (?,?,?,?)",
+                      (bot, title or "", norm_key(title), _utc_iso(when)))
+
+    def add_topic(self, bot, topic_key, topic="", when=None):
+        with self._conn() as c:
+            c.execute("INSERT INTO topics(bot, topic_key, topic, time) VALUES (?,?,?,?)",
+                      (bot, topic_key or norm_key(topic), topic or "", _utc_iso(when)))
+
+    def add_package(self, bot, package_id, when=None):
+        with self._conn() as c:
+            c.execute("INSERT OR IGNORE INTO packages(bot, package_id, time) VALUES (?,?,?)",
+                      (bot, package_id, _utc_iso(when)))
+
+    # ---------- قراءة ----------
+    def has_package(self, bot, package_id) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM packages WHERE bot=? AND package_id=?",
+            (bot, package_id)).fetchone()
+        return row is not None
+
+    def packages(self, bot):
+        rows = self._conn().execute(
+            "SELECT package_id FROM packages WHERE bot=?", (bot, ))
+        return {r[0] for r in rows}
+
+    def max_package_rowid(self) -> int:
+        # آخر rowid (عملية O(1) على B-tree) لمزامنة الفهارس الخارجية تزايديًا
+        row = self._conn().execute("SELECT MAX(rowid) FROM packages").fetchone()
+        return row[0] or 0
+
+    def package_count(self, bot, max_rowid):
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM packages WHERE bot=? AND rowid<=?", (bot, max_rowid)).fetchone()
+        return row[0] or 0
+
+    def package_at(self, rowid):
+        row = self._conn().execute(
+            "SELECT package_id FROM packages WHERE rowid=?", (rowid, )).fetchone()
+        return row[0] if row else None
+
+    def packages_since(self, bot, rowid):
+        return self._conn().execute(
+            "SELECT rowid, package_id FROM packages WHERE rowid>? AND bot=? ORDER BY rowid",
+            (rowid, bot)).fetchall()
+
+    # النص الذي تعيده titles_since/topics_since (للتحقق من آخر صف في فهرس التكرار)
+    _TEXT_COLUMN = {"titles": "title",
+                    "topics": "CASE WHEN topic!='' THEN topic ELSE topic_key END"}
+
+    def history_count(self, table, bot, max_id):
+        row = self._conn().execute(
+            f"SELECT COUNT(*) FROM {table} WHERE bot=? AND id<=?", (bot, max_id)).fetchone()
+        return row[0] or 0
+
+    def history_at(self, table, rowid):
+        row = self._conn().execute(
+            f"SELECT {self._TEXT_COLUMN[table]} FROM {table} WHERE id=?", (rowid, )).fetchone()
+        return row[0] if row else None
+
+    def titles_since(self, bot, rowid):
+        # (id، العنوان، الوقت) بعد id معيّن لمزامنة فهرس التكرار التقريبي
+        return self._conn().execute(
+            "SELECT id, title, time FROM titles WHERE id>? AND bot=? ORDER BY id",
+            (rowid, bot)).fetchall()
+
+    def topics_since(self, bot, rowid):
+        return self._conn().execute(
+            "SELECT id, CASE WHEN topic!='' THEN topic ELSE topic_key END, time "
+            "FROM topics WHERE id>? AND bot=? ORDER BY id", (rowid, bot)).fetchall()
+
+    def has_title(self, bot, title) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM titles WHERE bot=? AND norm=? LIMIT 1",
+            (bot, norm_key(title))).fetchone()
+        return row is not None
+
+    def recent_titles(self, bot, limit):
+        rows = self._conn().execute(
+            "SELECT title FROM titles WHERE bot=? ORDER BY id DESC LIMIT ?",
+            (bot, limit)).fetchall()
+        return [r[0] for r in reversed(rows)]
+
+    def topic_used_since(self, bot, topic_key, since) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM topics WHERE bot=? AND topic_key=? AND time>? LIMIT 1",
+            (bot, topic_key, _utc_iso(since))).fetchone()
+        return row is not None
+
+    def recent_topic_keys(self, bot, since):
+        rows = self._conn().execute(
+            "SELECT DISTINCT topic_key FROM topics WHERE bot=? AND time>=?",
+            (bot, _utc_iso(since)))
+        return {r[0] for r in rows}
+
+    def topics_stamp(self):
+        """(mtime الملف، آخر id للمواضيع): يتغير إن كتبت عملية أخرى في السجل."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = 0
+        row = self._conn().execute("SELECT MAX(id) FROM topics").fetchone()
+        return mtime, row[0] or 0
+
+    def topic_last_used(self, bot):
+        """{مفتاح الموضوع: آخر وقت استخدام} باستعلام واحد على الفهرس."""
+        rows = self._conn().execute(
+            "SELECT topic_key, MAX(time) FROM topics WHERE bot=? GROUP BY topic_key", (bot, ))
+        return {k: t for k, t in rows}
+
+    def recent_topics(self, bot, limit):
+        rows = self._conn().execute(
+            "SELECT topic FROM topics WHERE bot=? ORDER BY id DESC LIMIT ?",
+            (bot, limit)).fetchall()
+        return [r[0] for r in reversed(rows)]
+
+    # ---------- استيراد الملفات القديمة (مرة واحدة) ----------
+    def import_legacy(self, files=LEGACY_FILES):
+        imported = {}
+        for path, bot, kind in files:
+            if not os.path.exists(path): continue
+            c = self._conn()
+            if c.execute("SELECT 1 FROM imports WHERE path=?",
+                         (path, )).fetchone():
+                continue
+            n = 0
+            with c:
+                for rec in _read_legacy(path, kind):
+                    if kind == "packages_txt":
+                        c.execute("INSERT OR IGNORE INTO packages(bot, package_id, time) VALUES (?,?,'')",
+                                  (bot, rec))
+                    elif kind.startswith("titles"):
+                        title, when = rec
+                        c.execute("INSERT INTO titles(bot, title, norm, time) VALUES (?,?,?,?)",
+                                  (bot, title, norm_key(title), _utc_iso(when) if when else ""))
+                    else:
+                        key, topic, when = rec
+                        c.execute("INSERT INTO topics(bot, topic_key, topic, time) VALUES (?,?,?,?)",
+                                  (bot, key, topic, _utc_iso(when) if when else ""))
+                    n += 1
+                c.execute("INSERT INTO imports(path, rows, time) VALUES (?,?,?)",
+                          (path, n, _utc_iso()))
+            imported[path] = n
+        return imported
+
+
+def _read_legacy(path, kind):
+    with open(path, "r", encoding="utf-8") as f:
+        if kind == "packages_txt":
+            for line in f:
+                if line.strip(): yield line.strip()
+        elif kind.endswith("_jsonl"):
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except Exception:
+                    continue
+                if kind == "titles_jsonl":
+                    if r.get("title"): yield (r["title"], r.get("time"))
+                elif r.get("topic_key"):
+                    yield (r["topic_key"], "", r.get("time"))
+        else:
+            try:
+                items = json.load(f)
+            except Exception:
+                items = []
+            for t in items:
+                if not isinstance(t, str) or not t.strip(): continue
+                if kind == "titles_json": yield (t, None)
+                else: yield (norm_key(t), t, None)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = HistoryStore()
+                store.import_legacy()
+                _store = store
+    return _store
+
+
+if __name__ == "__main__":
+    res = get_store().import_legacy()
+    print(f"📦 History DB: {HISTORY_DB} | imported: {res or 'nothing new'}")
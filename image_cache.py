@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import os, time, threading
+
+from local_cache import cache_path, load_json, save_json
+from history_store import norm_key
+
+# =================== كاش نتائج البحث عن الصور ===================
+CACHE_FILE = cache_path("image_search.json")
+MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "500"))
+
+# مدة صلاحية كل مزود (ثوانٍ). Pixabay يشترط ألا تتجاوز 24 ساعة.
+DAY = 24 * 3600
+PROVIDER_TTL = {
+    "wiki_ar": 30 * DAY,
+    "wiki_en": 30 * DAY,
+    "pexels": 7 * DAY,
+    "pixabay": 1 * DAY,
+    "unsplash": 7 * DAY,
+}
+DEFAULT_TTL = 3 * DAY
+
+
+class ImageSearchCache:
+    """
+    قائمة المرشحين الكاملة لكل (مزود، موضوع مطبّع) على القرص، مع TTL لكل مزود
+    وطرد الأقدم استخدامًا (LRU) عند تجاوز MAX_ENTRIES.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = load_json(path, {}) or {}
+
+    @staticmethod
+    def key(provider, topic):
+        return f"{provider}|{norm_key(topic)}"
+
+    def get(self, provider, topic):
+        k = self.key(provider, topic)
+        with self._lock:
+            e = self._entries.get(k)
+            if not e: return None
+            ttl = PROVIDER_TTL.get(provider, DEFAULT_TTL)
+            if time.time() - e.get("t", 0) > ttl:
+                self._entries.pop(k, None)
+                return None
+            e["a"] = time.time()
+            return list(e.get("items") or [])
+
+    def put(self, provider, topic, items):
+        now = time.time()
+        with self._lock:
+            self._entries[self.key(provider, topic)] = {
+                "t": now,
+                "a": now,
+                "items": list(items or []),
+            }
+            if len(self._entries) > self.max_entries:
+                by_age = sorted(self._entries.items(),
+                                key=lambda kv: kv[1].get("a", 0))
+                for k, _ in by_age[:len(self._entries) - self.max_entries]:
+                    self._entries.pop(k, None)
+            save_json(self.path, self._entries)
+
+    def flush(self):
+        # يحفظ أوقات الاستخدام (LRU) التي تغيّرت عبر get
+        with self._lock:
+            save_json(self.path, self._entries)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ImageSearchCache()
+    return _cache
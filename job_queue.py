@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import os, time, uuid, threading, contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from local_cache import cache_path, load_json, save_json
+
+# =================== طابور مهام الـ Webhook ===================
+JOBS_FILE = cache_path("trigger_jobs.json")
+JOB_WORKERS = int(os.getenv("TRIGGER_WORKERS", "1"))
+JOB_KEEP_S = int(os.getenv("TRIGGER_JOB_KEEP_S", str(3 * 24 * 3600)))
+
+ACTIVE = ("queued", "running")
+
+# مهام /trigger ومهام المجدول في نفس العملية تكتب في history.db والفهارس نفسها:
+# قفل تشغيل واحد يجعلها تتتابع (نفس ضمان SCHEDULER_WORKERS=1 وconcurrency في الـ workflows)
+RUN_LOCK = threading.RLock()
+
+_current = contextvars.ContextVar("job_current", default=None)
+
+
+class JobQueue:
+    """
+    مهام في الخلفية بعدد عمال محدود ومفتاح منع تكرار (مثل slot0:2025-01-31):
+    طلب ثانٍ بنفس المفتاح يعيد المهمة نفسها ما لم تفشل. السجل محفوظ على القرص
+    فلا يعيد إعادة تشغيل العملية نشر فتحة نُشرت.
+    """
+
+    def __init__(self, path=JOBS_FILE, workers=JOB_WORKERS):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers),
+                                        thread_name_prefix="job")
+        self._jobs = load_json(path, {}) or {}
+        for job in self._jobs.values():
+            if job["status"] in ACTIVE:  # انقطعت بإعادة التشغيل
+                job.update(status="failed", error="interrupted", finished=time.time())
+
+    def submit(self, key, fn, *args):
+        """يعيد (المهمة، هل هي جديدة)."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job["key"] == key and job["status"] != "failed":
+                    return dict(job), False
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "key": key,
+                "status": "queued",
+                "stage": None,
+                "stages": [],
+                "created": time.time(),
+                "started": None,
+                "finished": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job["id"]] = job
+            self._save()
+        self._pool.submit(self._run, job["id"], fn, args)
+        return dict(job), True
+
+    def _run(self, job_id, fn, args):
+        # تبقى queued حتى تنتهي أي مهمة مجدولة جارية
+        with RUN_LOCK:
+            self._update(job_id, status="running", started=time.time())
+            _current.set(job_id)
+            try:
+                result = fn(*args)
+                self._update(job_id, status="done", result=result, finished=time.time())
+            except Exception as e:
+                print(f"❌ Job {job_id} failed: {e}")
+                self._update(job_id, status="failed", error=str(e), finished=time.time())
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None: return
+            job.update(fields)
+            self._save()
+
+    def report_stage(self, stage):
+        """تُستدعى من داخل المهمة (مثل StageTimer) لعرض التقدم."""
+        job_id = _current.get()
+        if job_id is None: return
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None: return
+            job["stage"] = stage
+            job["stages"].append(stage)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _save(self):
+        now = time.time()
+        self._jobs = {k: j for k, j in self._jobs.items()
+                      if j["status"] in ACTIVE or now - j["created"] < JOB_KEEP_S}
+        try:
+            save_json(self.path, self._jobs)
+        except OSError as e:
+            print(f"⚠️ Could not save jobs: {e}")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+def report_stage(stage):
+    # لا شيء خارج مهام الطابور (الجدولة/الدفعة)
+    if _queue is not None and _current.get() is not None:
+        _queue.report_stage(stage)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import os, json, zlib, tempfile
+
+# =================== مجلد الكاش المحلي ===================
+# كل البوتات تشارك نفس المجلد (يمكن حفظه بين تشغيلات GitHub عبر actions/cache)
+CACHE_DIR = os.getenv("BOT_CACHE_DIR", ".cache")
+
+
+def cache_path(name: str) -> str:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+
+def load_json(path, default=None):
+    if not os.path.exists(path): return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return default
+
+
+def load_zjson(path, default=None):
+    # نسخة مضغوطة (zlib) لكاشات كبيرة مثل تفاصيل المتجر
+    if not os.path.exists(path): return default
+    try:
+        with open(path, "rb") as f:
+            return json.loads(zlib.decompress(f.read()).decode("utf-8"))
+    except Exception:
+        return default
+
+
+def _write_atomic(path, data: bytes):
+    # كتابة ذرّية: ملف مؤقت ثم rename حتى لا يبقى ملف نصف مكتوب
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def save_json(path, obj):
+    _write_atomic(path, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+
+def save_zjson(path, obj, level=6):
+    raw = json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    _write_atomic(path, zlib.compress(raw.encode("utf-8"), level))
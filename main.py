@@ -1,15 +1,27 @@
 # -*- coding: utf-8 -*-
-import os, re, time, random, json, html, hashlib
+import os, re, time, random, json, html, hashlib, asyncio, threading
 from datetime import datetime, date, timedelta
 from zoneinfo import ZoneInfo
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 
 import requests
 import backoff
-import feedparser
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+import blogger_client
+import tracing
+import job_queue
+import gemini_models
+from rate_limiter import get_limiter
+from post_index import get_post_index, image_hash as _img_hash
+from history_store import get_store, norm_key as norm_topic_key
+from near_dup import get_near_dup_index
+from topic_pool import TopicPool
+from image_cache import get_image_cache
+from local_cache import cache_path
+from feed_cache import get_feed_cache
+from article_cache import get_article_cache, generate_cached, publish_tracked, track as track_article
 
 import markdown as md
 import bleach
@@ -20,7 +32,6 @@ from flask import Flask, request, jsonify
 TZ = ZoneInfo("Asia/Baghdad")
 POST_TIMES_LOCAL = ["10:00", "18:00"]  # يوميًا بتوقيت بغداد (صباح / مساء)
 
-SAFE_CALLS_PER_MIN = int(os.getenv("SAFE_CALLS_PER_MIN", "3"))
 AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
 AI_BACKOFF_BASE = int(os.getenv("AI_BACKOFF_BASE", "4"))
 
@@ -36,15 +47,35 @@ PEXELS_API_KEY = os.getenv("PEXELS_API_KEY", "")
 PIXABAY_API_KEY = os.getenv("PIXABAY_API_KEY", "")
 UNSPLASH_ACCESS_KEY = os.getenv("UNSPLASH_ACCESS_KEY", "")
 FORCED_IMAGE = os.getenv("FEATURED_IMAGE_URL", "").strip()
+# parallel: كل مزودي الصور معًا مع مهلة كلية | serial: واحدًا تلو الآخر
+IMAGE_FETCH_MODE = os.getenv("IMAGE_FETCH_MODE", "parallel").lower()
+IMAGE_DEADLINE_S = float(os.getenv("IMAGE_DEADLINE_S", "12"))
+# عناوين المزودين قابلة للتغيير (خادم محلي بديل في bench.py)
+UNSPLASH_API_URL = os.getenv("UNSPLASH_API_URL", "https://api.unsplash.com/search/photos")
+PEXELS_API_URL = os.getenv("PEXELS_API_URL", "https://api.pexels.com/v1/search")
+PIXABAY_API_URL = os.getenv("PIXABAY_API_URL", "https://pixabay.com/api/")
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://{lang}.wikipedia.org/w/api.php")
 
 # ترند: دولة واحدة أو قائمة دول
 TREND_GEO = os.getenv("TREND_GEO", "IQ")
 TREND_GEO_LIST = [
     g.strip() for g in os.getenv("TREND_GEO_LIST", "").split(",") if g.strip()
 ]
+TRENDS_RSS_URL = os.getenv(
+    "TRENDS_RSS_URL",
+    "https://trends.google.com/trends/trendingsearches/daily/rss?geo={geo}")
+NEWS_RSS_URL = os.getenv("NEWS_RSS_URL",
+                         "https://news.google.com/rss?hl=ar&gl=IQ&ceid=IQ:ar")
+# الفتحتان 10:00 و18:00 تفصلهما 8 ساعات: ترتيب واحد يكفي اليوم كله
+TRENDS_TTL_S = int(os.getenv("TRENDS_TTL_S", str(9 * 3600)))
 
 # منع التكرار موضوعيًا عبر عدد أيام
 TOPIC_WINDOW_D = int(os.getenv("TOPIC_WINDOW_DAYS", "14"))
+# مجمعات المواضيع الجاهزة لكل فئة (topic_pool.py) تُبنى عند أول استخدام
+_topic_pools = {}
+_topic_pools_lock = threading.Lock()
+# آخر استخدام لكل موضوع من history.db، وبصمة السجل عند تحميله
+_topic_usage = {"stamp": None, "usage": {}}
 
 # =================== سياسة اختيار المواضيع (اختياري) ===================
 _TOPIC_POLICY = os.getenv("TOPIC_POLICY", "")
@@ -67,16 +98,12 @@ POLICY = {
 def should_skip_topic(topic_key: str) -> bool:
     if not POLICY["avoid_repeat"]:
         return False
+    _refresh_topic_usage()
+    for pool in _topic_pools.values():
+        if topic_key in pool.keys: return pool.is_cooling(topic_key)
     cutoff = datetime.now(TZ) - timedelta(
         days=POLICY["allow_old_topics_after_days"])
-    for rec in load_jsonl(HISTORY_TOPICS_FILE):
-        try:
-            if rec.get("topic_key") == topic_key and datetime.fromisoformat(
-                    rec["time"]) > cutoff:
-                return True
-        except:
-            pass
-    return False
+    return get_store().topic_used_since(HISTORY_BOT, topic_key, cutoff)
 
 
 def diversify_topic_request(category: str) -> str:
@@ -91,6 +118,17 @@ def diversify_topic_request(category: str) -> str:
 # وضع التشغيل
 PUBLISH_MODE = os.getenv("PUBLISH_MODE", "live").lower()  # draft | live
 RUN_ONCE = os.getenv("RUN_ONCE", "0") == "1"
+# وضع الدفعة (RUN_ONCE): كل الفتحات لعدة أيام بسياق واحد مشترك
+BATCH_MODE = os.getenv("BATCH_MODE", "0") == "1"
+BATCH_DAYS = int(os.getenv("BATCH_DAYS", "1"))
+BATCH_START = os.getenv("BATCH_START", "")  # YYYY-MM-DD (افتراضي اليوم)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+BATCH_CHUNK = 50  # حد طلبات Blogger في batch واحد
+# خط نشر متوازٍ: الصورة وبيانات منع التكرار وGemini معًا بعد اختيار الموضوع
+ASYNC_PIPELINE = os.getenv("ASYNC_PIPELINE", "1") == "1"
+STAGE_TIMINGS_FILE = cache_path("stage_timings.jsonl")
+# زمن وعدد طلبات HTTP لكل مرحلة ومضيف (TRACING=0 للتعطيل)
+tracing.install()
 
 # هل نُحدّث المنشور إذا تكرر العنوان
 UPDATE_IF_TITLE_EXISTS = (os.getenv("UPDATE_IF_TITLE_EXISTS", "0") == "1")
@@ -100,13 +138,19 @@ USE_EXTERNAL_CRON = os.getenv("USE_EXTERNAL_CRON", "0") == "1"
 TRIGGER_TOKEN = os.getenv("TRIGGER_TOKEN", "")  # اختر كلمة سر قوية
 
 # REST (Gemini)
-GEMINI_API_ROOT = "https://generativelanguage.googleapis.com"
+GEMINI_API_ROOT = os.getenv("GEMINI_API_ROOT",
+                            "https://generativelanguage.googleapis.com")
 GEN_CONFIG = {"temperature": 0.7, "topP": 0.9, "maxOutputTokens": 4096}
+# streamGenerateContent: نوقف التوليد فور بلوغ حد الكلمات (يوفر التوكنات والوقت)
+GEMINI_STREAM = os.getenv("GEMINI_STREAM", "1") == "1"
+ARTICLE_MAX_WORDS = 1400
 
-# سجلات محلية
-HISTORY_TITLES_FILE = "posted_titles.jsonl"
-HISTORY_TOPICS_FILE = "used_topics.jsonl"
+# سجلات محلية (SQLite مشترك، انظر history_store.py)
+HISTORY_BOT = "main"
 TITLE_WINDOW = int(os.getenv("TITLE_WINDOW", "40"))
+# مرشحو الموضوع المفحوصون قبل التوليد؛ التوقع: topic (مجاني) أو gemini (طلب قصير)
+TOPIC_CANDIDATES = int(os.getenv("TOPIC_CANDIDATES", "6"))
+TITLE_PREDICTION = os.getenv("TITLE_PREDICTION", "topic").lower()
 
 # Flask (لخيار الكرون الخارجي)
 app = Flask(__name__)
@@ -399,132 +443,156 @@ def linkify_urls_md(text: str) -> str:
 
 
 # =================== تاريخ ومنع تكرار (محلي + Blogger) ===================
-def norm_topic_key(s: str) -> str:
-    s = s or ""
-    s = s.lower()
-    s = re.sub(r"[^\w\u0600-\u06FF]+", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
-
-
-def load_jsonl(path):
-    if not os.path.exists(path): return []
-    out = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                out.append(json.loads(line))
-            except:
-                pass
-    return out
-
-
-def append_jsonl(path, obj):
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
-
-
 def get_blogger_service():
-    creds = Credentials(
-        None,
-        refresh_token=REFRESH_TOKEN,
-        client_id=CLIENT_ID,
-        client_secret=CLIENT_SECRET,
-        token_uri="https://oauth2.googleapis.com/token",
-        scopes=["https://www.googleapis.com/auth/blogger"],
-    )
-    return build("blogger", "v3", credentials=creds, cache_discovery=False)
+    # خدمة مشتركة: discovery من الكاش، توكن واحد، اتصالات مفتوحة
+    return blogger_client.get_service()
 
 
 def get_blog_id(service, blog_url):
-    return service.blogs().getByUrl(url=blog_url).execute()["id"]
+    # معرف المدونة محفوظ على القرص بعد أول استعلام
+    return blogger_client.get_blog_id(blog_url, service=service)
 
 
 def recent_titles(limit=TITLE_WINDOW):
     titles = []
     try:
-        service = get_blogger_service()
-        blog_id = get_blog_id(service, BLOG_URL)
-        res = service.posts().list(
-            blogId=blog_id,
-            fetchBodies=False,
-            maxResults=limit,
-            orderBy="PUBLISHED",
-        ).execute()
-        for it in (res.get("items") or []):
-            t = (it.get("title", "") or "").strip()
-            if t: titles.append(t)
+        idx = get_post_index()
+        idx.sync()
+        titles += [t.strip() for t in idx.recent_titles(limit) if t.strip()]
     except Exception:
         pass
-    titles += [r.get("title", "")
-               for r in load_jsonl(HISTORY_TITLES_FILE)][-limit:]
+    titles += get_store().recent_titles(HISTORY_BOT, limit)
     return set(titles)
 
 
 def recent_topics(days=TOPIC_WINDOW_D):
     cutoff = datetime.now(TZ) - timedelta(days=days)
-    used = []
-    for r in load_jsonl(HISTORY_TOPICS_FILE):
-        try:
-            t = datetime.fromisoformat(r.get("time"))
-            if t >= cutoff: used.append(r.get("topic_key", ""))
-        except:
-            pass
-    return set(used)
+    return get_store().recent_topic_keys(HISTORY_BOT, cutoff)
 
 
-def record_publish(title, topic_key):
-    append_jsonl(HISTORY_TITLES_FILE, {
-        "title": title,
-        "time": datetime.now(TZ).isoformat()
-    })
-    append_jsonl(HISTORY_TOPICS_FILE, {
-        "topic_key": topic_key,
-        "time": datetime.now(TZ).isoformat()
-    })
-
-
-# -------- منع تكرار الصور من خلال أول <img> في أحدث المنشورات --------
-_IMG_RE = re.compile(r'<img[^>]+src=["\']([^"\']+)["\']', re.I)
-
-
-def _url_for_hash(u: str) -> str:
-    u = u or ""
-    u = u.split("#", 1)[0]
-    u = u.split("?", 1)[0]
-    if u.startswith("//"): u = "https:" + u
-    if u.startswith("http://"): u = "https://" + u[7:]
-    return u
+def is_near_duplicate(text, days=TOPIC_WINDOW_D):
+    """تشابه تقريبي (MinHash) مع عنوان أو موضوع حديث، قبل صرف أي توليد."""
+    try:
+        hit = get_near_dup_index(HISTORY_BOT).find(
+            text, since=datetime.now(TZ) - timedelta(days=days))
+    except Exception:
+        return False
+    if hit: print(f"♻️ Near-duplicate ({hit[0]:.2f}): {text} ≈ {hit[1]}")
+    return hit is not None
 
 
-def _img_hash(u: str) -> str:
-    return hashlib.sha1((_url_for_hash(u)).encode("utf-8")).hexdigest()[:12]
+def record_publish(title, topic_key):
+    store = get_store()
+    now = datetime.now(TZ)
+    store.add_title(HISTORY_BOT, title, when=now)
+    store.add_topic(HISTORY_BOT, topic_key, when=now)
+    for pool in _topic_pools.values():
+        pool.mark_used(topic_key, now.timestamp())
 
 
+# -------- منع تكرار الصور من خلال أول <img> في أحدث المنشورات --------
 def recent_image_hashes(limit=60):
-    hashes = set()
+    # hash أول صورة محفوظ في فهرس المنشورات، فلا حاجة لجلب المحتوى كاملًا
     try:
-        svc = get_blogger_service()
-        bid = get_blog_id(svc, BLOG_URL)
-        res = svc.posts().list(blogId=bid,
-                               fetchBodies=True,
-                               maxResults=limit,
-                               orderBy="PUBLISHED").execute()
-        for it in (res.get("items") or []):
-            content = it.get("content", "") or ""
-            m = _IMG_RE.search(content)
-            if m:
-                hashes.add(_img_hash(m.group(1)))
+        idx = get_post_index()
+        idx.sync()
+        return idx.recent_image_hashes(limit)
     except Exception:
-        pass
-    return hashes
+        return set()
 
 
 # =================== Gemini REST ===================
-def _rest_generate(ver: str, model: str, prompt: str):
+class StreamingArticle:
+    """
+    خط معالجة تزايدي لأجزاء البث: يحذف كتل ``` و<script>/<style> سطرًا بسطر
+    ويعدّ الكلمات المقبولة، فيعرف المستدعي متى يقطع البث عند max_words.
+    """
+
+    def __init__(self, max_words=ARTICLE_MAX_WORDS):
+        self.max_words = max_words
+        self.lines = []
+        self.words = 0
+        self._buf = ""
+        self._skip_until = None  # نهاية الكتلة المحذوفة الحالية
+        self._held = []  # أسطر الكتلة المفتوحة: تُحذف إن أُغلقت فقط
+
+    def _append(self, line):
+        self.lines.append(line)
+        self.words += len(line.split())
+
+    def _take_line(self, line):
+        s = line.strip()
+        if self._skip_until:
+            self._held.append(line)
+            if self._skip_until.search(s):
+                self._skip_until = None
+                self._held = []
+            return
+        if s.startswith("```"):
+            if not (s != "```" and s.endswith("```") and len(s) > 3):
+                self._skip_until = re.compile(r"```")  # وإلا سطر ``` مفتوح ومغلق معًا
+                self._held = [line]
+            return
+        m = re.match(r"<(script|style)\b", s, re.I)
+        if m:
+            end = re.compile(rf"</{m.group(1)}\s*>", re.I)
+            if not end.search(s):
+                self._skip_until = end
+                self._held = [line]
+            return
+        self._append(line)
+
+    def feed(self, chunk):
+        """يعيد True عندما يكفي النص (بلغ max_words)."""
+        self._buf += chunk or ""
+        *complete, self._buf = self._buf.split("\n")
+        for line in complete:
+            self._take_line(line)
+        return self.words > self.max_words
+
+    def text(self):
+        if self._buf and self.words <= self.max_words:
+            self._take_line(self._buf)
+        self._buf = ""
+        if self._skip_until:
+            # كتلة لم تُغلق: تبقى كما هي، مثل strip_code_fences
+            for line in self._held:
+                self._append(line)
+            self._skip_until, self._held = None, []
+        # نقطع عند آخر سطر كامل ضمن الحد، وإلا دمج clamp_words_ar الأسطر في سطر واحد
+        while self.words > self.max_words and len(self.lines) > 1:
+            self.words -= len(self.lines.pop().split())
+        return "\n".join(self.lines)
+
+
+def _rest_generate_stream(url, body, ver, model, max_words):
+    limiter = get_limiter("gemini")
+    limiter.acquire()
+    with requests.post(url, json=body, stream=True, timeout=(15, 120)) as r:
+        limiter.observe(r)
+        gemini_models.report_status(ver, model, r.status_code)
+        if not r.ok: return None
+        pipe = StreamingArticle(max_words)
+        # سطور بايت ثم UTF-8: text/event-stream بلا charset يُفك كـ latin-1 في requests
+        for raw in r.iter_lines():
+            line = raw.decode("utf-8", "replace")
+            if not line.startswith("data:"): continue
+            try:
+                data = json.loads(line[5:].strip())
+                parts = data["candidates"][0]["content"]["parts"]
+            except Exception:
+                continue
+            if pipe.feed("".join(p.get("text", "") for p in parts)):
+                break  # إغلاق الاتصال يوقف التوليد على الخادم
+        return pipe.text() or None
+
+
+def _rest_generate(ver: str, model: str, prompt: str, max_words=None):
     if model.startswith("models/"):
         model = model.split("/", 1)[1]
-    url = f"{GEMINI_API_ROOT}/{ver}/models/{model}:generateContent?key={GEMINI_API_KEY}"
+    method = "streamGenerateContent" if GEMINI_STREAM else "generateContent"
+    url = f"{GEMINI_API_ROOT}/{ver}/models/{model}:{method}?key={GEMINI_API_KEY}"
+    if GEMINI_STREAM: url += "&alt=sse"
     body = {
         "contents": [{
             "parts": [{
@@ -534,7 +602,14 @@ def _rest_generate(ver: str, model: str, prompt: str):
         "generationConfig": GEN_CONFIG,
     }
     try:
+        if GEMINI_STREAM:
+            return _rest_generate_stream(url, body, ver, model, max_words
+                                         or ARTICLE_MAX_WORDS)
+        limiter = get_limiter("gemini")
+        limiter.acquire()
         r = requests.post(url, json=body, timeout=120)
+        limiter.observe(r)
+        gemini_models.report_status(ver, model, r.status_code)
         data = r.json()
         if r.ok and data.get("candidates"):
             return data["candidates"][0]["content"]["parts"][0]["text"]
@@ -547,24 +622,27 @@ def _rest_generate(ver: str, model: str, prompt: str):
                       Exception,
                       base=AI_BACKOFF_BASE,
                       max_tries=AI_MAX_RETRIES)
-def ask_gemini(prompt: str) -> str:
-    attempts = [
-        ("v1beta", "gemini-2.5-flash"),
-        ("v1", "gemini-2.5-flash"),
-        ("v1beta", "gemini-2.0-flash"),
-        ("v1", "gemini-2.0-flash"),
-        ("v1beta", "gemini-pro"),
-        ("v1", "gemini-pro"),
-    ]
+def _ask_gemini_models(prompt):
+    # ترتيب الموديلات المفضل، مع تجاوز ما فشل مؤخرًا
     last = None
-    for ver, model in attempts:
-        txt = _rest_generate(ver, model, prompt)
+    for ver, model in gemini_models.candidates():
+        txt = _rest_generate(ver, model, prompt, max_words=ARTICLE_MAX_WORDS)
         if txt:
-            return clamp_words_ar(strip_code_fences(txt.strip()), 1000, 1400)
+            return clamp_words_ar(strip_code_fences(txt.strip()), 1000,
+                                  ARTICLE_MAX_WORDS), f"{ver}/{model}"
         last = f"{ver}/{model}"
     raise RuntimeError(f"Gemini REST error (last tried {last})")
 
 
+def ask_gemini(prompt: str, meta=None):
+    """
+    (المقال، مفتاح الكاش): نفس الـ prompt بمقال مولّد لم يُنشر بعد (فشل النشر أو
+    انقطع التشغيل) يُعاد من كاش المقالات بدل طلب Gemini جديد.
+    """
+    return generate_cached(prompt, lambda: _ask_gemini_models(prompt), HISTORY_BOT,
+                           meta=meta)
+
+
 def build_prompt_ar(topic, kind="general", news_link=None):
     base = """
 - اكتب مقالة عربية واضحة للقراء العامين.
@@ -633,113 +711,155 @@ def ensure_references_clickable(article_md, category, topic, news_link=None):
 
 # =================== الصور ===================
 def wiki_lead_image(title, lang="ar"):
-    s = requests.get(
-        f"https://{lang}.wikipedia.org/w/api.php",
-        params={
-            "action": "query",
-            "format": "json",
-            "prop": "pageimages",
-            "piprop": "original|thumbnail",
-            "pithumbsize": "1200",
-            "titles": title,
-        },
-        timeout=20,
-    )
+    """
+    رابط الصورة الرئيسية للصفحة، أو "" إن لم تكن لها صورة.
+    None = فشل (مهلة الحصة أو حالة غير 200) فلا يُخزَّن كـ"لا صورة".
+    """
+    try:
+        s = _limited_get(
+            "wikipedia",
+            WIKIPEDIA_API_URL.format(lang=lang),
+            params={
+                "action": "query",
+                "format": "json",
+                "prop": "pageimages",
+                "piprop": "original|thumbnail",
+                "pithumbsize": "1200",
+                "titles": title,
+            },
+            timeout=20,
+        )
+    except TimeoutError:
+        return None
     if s.status_code != 200: return None
     pages = s.json().get("query", {}).get("pages", {})
     for _, p in pages.items():
         if "original" in p: return p["original"]["source"]
         if "thumbnail" in p: return p["thumbnail"]["source"]
-    return None
+    return ""
 
 
-def fetch_unsplash(topic):
-    if not UNSPLASH_ACCESS_KEY: return None
+def _cached_search(provider, topic, search_fn):
+    """
+    كل نتائج البحث (وليس نتيجة عشوائية واحدة) تُحفظ في كاش الصور، فالمقال التالي
+    عن موضوع مشابه يأخذ المرشح غير المستخدم التالي دون طلب جديد.
+    """
+    cache = get_image_cache()
+    items = cache.get(provider, topic)
+    if items is not None: return items
     try:
-        r = requests.get(
-            "https://api.unsplash.com/search/photos",
-            headers={"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"},
-            params={
-                "query": topic,
-                "per_page": 10,
-                "orientation": "landscape"
-            },
-            timeout=30,
-        )
-        if not r.ok: return None
-        results = (r.json().get("results") or [])
-        if not results: return None
-        p = random.choice(results)
+        items = search_fn(topic)
+    except Exception:
+        return []  # لا نخزن الأخطاء المؤقتة
+    if items is None: return []
+    random.shuffle(items)
+    cache.put(provider, topic, items)
+    return items
+
+
+def _limited_get(provider, url, **kw):
+    # كل مزود صور له حصته الخاصة؛ إن لم يتوفر رمز ضمن المهلة نتجاوز المزود
+    limiter = get_limiter(provider)
+    if not limiter.acquire(timeout=IMAGE_DEADLINE_S):
+        raise TimeoutError(f"{provider} rate limit budget exhausted")
+    r = requests.get(url, **kw)
+    limiter.observe(r)
+    return r
+
+
+def _search_unsplash(topic):
+    r = _limited_get(
+        "unsplash",
+        UNSPLASH_API_URL,
+        headers={"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"},
+        params={
+            "query": topic,
+            "per_page": 10,
+            "orientation": "landscape"
+        },
+        timeout=30,
+    )
+    if not r.ok: return None
+    out = []
+    for p in (r.json().get("results") or []):
         url = (p.get("urls") or {}).get("regular") or (p.get("urls")
                                                        or {}).get("full")
-        if not url: return None
+        if not url: continue
         user = p.get("user") or {}
         credit = (
             f'صورة من Unsplash — <a href="{html.escape(user.get("links",{}).get("html","https://unsplash.com"))}" '
             f'target="_blank" rel="noopener">{html.escape(user.get("name","Unsplash"))}</a>'
         )
-        return {"url": url, "credit": credit}
-    except Exception:
-        return None
+        out.append({"url": url, "credit": credit})
+    return out
 
 
-def fetch_image_general(topic):
-    for lang in ("ar", "en"):
-        try:
-            url = wiki_lead_image(topic, lang=lang)
-            if url:
-                return {"url": url, "credit": f"Image via Wikipedia ({lang})"}
-        except Exception:
-            pass
-    return None
+def fetch_unsplash(topic):
+    if not UNSPLASH_ACCESS_KEY: return []
+    return _cached_search("unsplash", topic, _search_unsplash)
+
+
+def fetch_wiki_image(topic, lang):
+
+    def search(t):
+        url = wiki_lead_image(t, lang=lang)
+        if url is None: return None  # فشل مؤقت: لا يُخزَّن
+        return [{"url": url, "credit": f"Image via Wikipedia ({lang})"}
+                ] if url else []
+
+    return _cached_search(f"wiki_{lang}", topic, search)
+
+
+def _search_pexels(topic):
+    r = _limited_get(
+        "pexels",
+        PEXELS_API_URL,
+        headers={"Authorization": PEXELS_API_KEY},
+        params={
+            "query": topic,
+            "per_page": 10,
+            "orientation": "landscape"
+        },
+        timeout=30,
+    )
+    if not r.ok: return None
+    out = []
+    for p in r.json().get("photos", []):
+        credit = f'صورة من Pexels — <a href="{html.escape(p["url"])}" target="_blank" rel="noopener">المصدر</a>'
+        out.append({"url": p["src"]["large2x"], "credit": credit})
+    return out
 
 
 def fetch_pexels(topic):
-    if not PEXELS_API_KEY: return None
-    try:
-        r = requests.get(
-            "https://api.pexels.com/v1/search",
-            headers={"Authorization": PEXELS_API_KEY},
-            params={
-                "query": topic,
-                "per_page": 10,
-                "orientation": "landscape"
-            },
-            timeout=30,
-        )
-        photos = r.json().get("photos", [])
-        if photos:
-            p = random.choice(photos)
-            url = p["src"]["large2x"]
-            credit = f'صورة من Pexels — <a href="{html.escape(p["url"])}" target="_blank" rel="noopener">المصدر</a>'
-            return {"url": url, "credit": credit}
-    except Exception:
-        return None
+    if not PEXELS_API_KEY: return []
+    return _cached_search("pexels", topic, _search_pexels)
+
+
+def _search_pixabay(topic):
+    r = _limited_get(
+        "pixabay",
+        PIXABAY_API_URL,
+        params={
+            "key": PIXABAY_API_KEY,
+            "q": topic,
+            "image_type": "photo",
+            "per_page": 10,
+            "safesearch": "true",
+            "orientation": "horizontal",
+        },
+        timeout=30,
+    )
+    if not r.ok: return None
+    out = []
+    for p in r.json().get("hits", []):
+        credit = f'صورة من Pixabay — <a href="{html.escape(p["pageURL"])}" target="_blank" rel="noopener">المصدر</a>'
+        out.append({"url": p["largeImageURL"], "credit": credit})
+    return out
 
 
 def fetch_pixabay(topic):
-    if not PIXABAY_API_KEY: return None
-    try:
-        r = requests.get(
-            "https://pixabay.com/api/",
-            params={
-                "key": PIXABAY_API_KEY,
-                "q": topic,
-                "image_type": "photo",
-                "per_page": 10,
-                "safesearch": "true",
-                "orientation": "horizontal",
-            },
-            timeout=30,
-        )
-        hits = r.json().get("hits", [])
-        if hits:
-            p = random.choice(hits)
-            url = p["largeImageURL"]
-            credit = f'صورة من Pixabay — <a href="{html.escape(p["pageURL"])}" target="_blank" rel="noopener">المصدر</a>'
-            return {"url": url, "credit": credit}
-    except Exception:
-        return None
+    if not PIXABAY_API_KEY: return []
+    return _cached_search("pixabay", topic, _search_pixabay)
 
 
 def _ensure_https(url: str) -> str:
@@ -749,23 +869,103 @@ def _ensure_https(url: str) -> str:
     return url
 
 
-def fetch_image(query):
+# مزودو الصور بترتيب الأفضلية (الأول المقبول يفوز)
+IMAGE_PROVIDERS = [
+    ("wiki_ar", lambda t: fetch_wiki_image(t, "ar")),
+    ("wiki_en", lambda t: fetch_wiki_image(t, "en")),
+    ("pexels", fetch_pexels),
+    ("pixabay", fetch_pixabay),
+    ("unsplash", fetch_unsplash),
+]
+
+
+def _accept_image(candidates, used_hashes):
+    # أول مرشح غير مستخدم من قائمة المزود (المخزنة في الكاش)
+    for c in (candidates or []):
+        u = _ensure_https((c or {}).get("url", ""))
+        if u and _img_hash(u) not in used_hashes:
+            return {"url": u, "credit": c.get("credit", "")}
+    return None
+
+
+def _provider_images_serial(topic, used_hashes):
+    for _, fn in IMAGE_PROVIDERS:
+        try:
+            img = _accept_image(fn(topic), used_hashes)
+        except Exception:
+            img = None
+        if img: return img
+    return None
+
+
+def _provider_images_parallel(topic, used_hashes_fn):
+    """
+    يسأل كل المزودين معًا. يُقبل مرشح مزود ما فور انتهاء كل المزودين الأعلى
+    أفضلية منه، ثم تُلغى البقية. بعد IMAGE_DEADLINE_S نأخذ أفضل ما وصل.
+    """
+    n = len(IMAGE_PROVIDERS)
+    results, finished = [None] * n, [False] * n
+    pool = ThreadPoolExecutor(max_workers=n + 1)
+    hashes_fut = pool.submit(tracing.bind(used_hashes_fn))
+    futs = {
+        pool.submit(tracing.bind(fn), topic): i
+        for i, (_, fn) in enumerate(IMAGE_PROVIDERS)
+    }
+    deadline = time.monotonic() + IMAGE_DEADLINE_S
+    used_hashes = None
+
+    def pick(wait_for_higher):
+        for i in range(n):
+            if not finished[i]:
+                if wait_for_higher: return None
+                continue
+            img = _accept_image(results[i], used_hashes)
+            if img: return img
+        return None
+
+    try:
+        try:
+            used_hashes = hashes_fut.result(
+                timeout=max(0.0, deadline - time.monotonic()))
+        except Exception:
+            used_hashes = set()
+        for fut in as_completed(futs,
+                                timeout=max(0.0, deadline - time.monotonic())):
+            i = futs[fut]
+            finished[i] = True
+            try:
+                results[i] = fut.result()
+            except Exception:
+                results[i] = None
+            img = pick(wait_for_higher=True)
+            if img: return img, used_hashes
+    except FuturesTimeout:
+        print(f"⏱️ Image providers deadline ({IMAGE_DEADLINE_S}s) reached")
+    finally:
+        # لا ننتظر المزودين البطيئين: الطلبات الجارية تنتهي بمهلتها في الخلفية
+        pool.shutdown(wait=False, cancel_futures=True)
+    return pick(wait_for_higher=False), used_hashes
+
+
+def fetch_image(query, exclude_hashes=None):
     if FORCED_IMAGE:
         return {"url": _ensure_https(FORCED_IMAGE), "credit": "Featured image"}
 
     topic = (query
              or "Research").split("،")[0].split(":")[0].strip() or "Research"
-    used_hashes = recent_image_hashes(limit=60)
-
-    candidates = []
-
-    g = fetch_image_general(topic)
-    if g: candidates.append(g)
 
-    for fn in (fetch_pexels, fetch_pixabay, fetch_unsplash):
-        img = fn(topic)
-        if img: candidates.append(img)
+    # exclude_hashes: صور محجوزة لمقالات أخرى في نفس الدفعة لم تُنشر بعد
+    extra = set(exclude_hashes or ())
+    if IMAGE_FETCH_MODE == "serial":
+        used_hashes = recent_image_hashes(limit=60) | extra
+        img = _provider_images_serial(topic, used_hashes)
+    else:
+        img, used_hashes = _provider_images_parallel(
+            topic, lambda: recent_image_hashes(limit=60) | extra)
+    get_image_cache().flush()
+    if img: return img
 
+    candidates = []
     seed = hashlib.sha1((topic + datetime.now(TZ).strftime("%Y%m%d%H") +
                          str(random.random())).encode("utf-8")).hexdigest()[:8]
     free_candidates = [
@@ -822,86 +1022,72 @@ def build_post_html(title, img, article_md):
 
 
 # =================== Google Trends + Google News ===================
+def _search_link(t):
+    return f"https://www.google.com/search?q={requests.utils.quote(t)}"
+
+
 def fetch_trends_list(geo: str, max_items=10):
-    url = f"https://trends.google.com/trends/trendingsearches/daily/rss?geo={geo}"
-    feed = feedparser.parse(url)
-    out = []
-    for e in feed.entries[:max_items]:
-        t = e.title
-        link = f"https://www.google.com/search?q={requests.utils.quote(t)}"
-        out.append((t, link))
-    return out
+    items = get_feed_cache().fetch(TRENDS_RSS_URL.format(geo=geo))
+    return [(t, _search_link(t)) for t, _ in items[:max_items]]
 
 
 def fetch_trends_region(geos, per_geo=10):
+    # كل الدول معًا بدل طلب تسلسلي لكل دولة
+    feeds = get_feed_cache().fetch_many(TRENDS_RSS_URL.format(geo=g) for g in geos)
     bucket = {}
     for geo in geos:
-        items = fetch_trends_list(geo, max_items=per_geo)
-        for title, link in items:
+        for title, _ in feeds[TRENDS_RSS_URL.format(geo=geo)][:per_geo]:
             k = norm_topic_key(title)
             if not k: continue
-            bucket.setdefault(k, {"count": 0, "title": title, "link": link})
+            bucket.setdefault(k, {"count": 0, "title": title, "link": _search_link(title)})
             bucket[k]["count"] += 1
     ranked = sorted(bucket.values(), key=lambda x: (-x["count"], x["title"]))
     return [(r["title"], r["link"]) for r in ranked]
 
 
+def trending_topics(per_geo=10):
+    """ترتيب الترندات المدمج، محفوظ TRENDS_TTL_S لتتشاركه فتحتا اليوم."""
+    geos = TREND_GEO_LIST or [TREND_GEO]
+    key = f"trends|{','.join(geos)}|{per_geo}"
+    cache = get_feed_cache()
+    ranked = cache.get_value(key, TRENDS_TTL_S)
+    if ranked is None:
+        if TREND_GEO_LIST:
+            ranked = fetch_trends_region(TREND_GEO_LIST, per_geo=per_geo)
+        else:
+            ranked = fetch_trends_list(TREND_GEO, max_items=per_geo)
+        if ranked: cache.put_value(key, ranked)
+        cache.flush()
+    return [tuple(x) for x in ranked]
+
+
 def fetch_top_me_news(n=0):
-    url = "https://news.google.com/rss?hl=ar&gl=IQ&ceid=IQ:ar"
-    feed = feedparser.parse(url)
-    if feed.entries:
-        idx = min(n, len(feed.entries) - 1)
-        e = feed.entries[idx]
-        return e.title, e.link
+    cache = get_feed_cache()
+    entries = cache.fetch(NEWS_RSS_URL)
+    cache.flush()
+    if entries:
+        return entries[min(n, len(entries) - 1)]
     return None, None
 
 
 # =================== Blogger API + منطق التحديث/الإنشاء ===================
-def _norm_title(s: str) -> str:
-    s = (s or "").strip().lower()
-    return re.sub(r"\s+", " ", s)
-
-
-def _fingerprint(title: str, html_content: str) -> str:
-    snippet = re.sub(r"<[^>]+>", " ", html_content or "")
-    snippet = re.sub(r"\s+", " ", snippet).strip()[:100]
-    return hashlib.sha1(
-        (_norm_title(title) + "|" + snippet).encode("utf-8")).hexdigest()
-
-
 def _find_existing_post_by_title(service, blog_id, title):
-    norm = _norm_title(title)
-    # live
-    try:
-        resp = service.posts().list(blogId=blog_id,
-                                    fetchBodies=False,
-                                    maxResults=50,
-                                    orderBy="UPDATED",
-                                    status=["live"]).execute()
-        for it in (resp.get("items") or []):
-            if _norm_title(it.get("title")) == norm: return it["id"]
-    except Exception:
-        pass
-    # drafts
+    # المنشورات الحية والمسودات معًا من الفهرس المحلي (طلب delta واحد)
+    idx = get_post_index()
     try:
-        resp = service.posts().list(blogId=blog_id,
-                                    fetchBodies=False,
-                                    maxResults=50,
-                                    orderBy="UPDATED",
-                                    status=["draft"]).execute()
-        for it in (resp.get("items") or []):
-            if _norm_title(it.get("title")) == norm: return it["id"]
+        idx.sync()
     except Exception:
         pass
-    return None
+    return idx.find_by_title(title)
 
 
-def post_to_blogger(title, html_content, labels=None):
+def post_to_blogger(title, html_content, labels=None, published=None):
     service = get_blogger_service()
     blog_id = get_blog_id(service, BLOG_URL)
     is_draft = (PUBLISH_MODE != "live")
     body = {"kind": "blogger#post", "title": title, "content": html_content}
     if labels: body["labels"] = labels[:]
+    if published: body["published"] = published  # منشور دفعة مؤرخ بوقت فتحته
 
     existing_id = _find_existing_post_by_title(service, blog_id, title)
     if existing_id:
@@ -910,6 +1096,7 @@ def post_to_blogger(title, html_content, labels=None):
                                          postId=existing_id,
                                          body=body).execute()
             print("UPDATED:", upd.get("url", upd.get("id")))
+            get_post_index().record(upd)
             return upd
         # أنشئ جديدًا بعنوان مميّز
         body[
@@ -918,11 +1105,13 @@ def post_to_blogger(title, html_content, labels=None):
                                      body=body,
                                      isDraft=is_draft).execute()
         print("CREATED (unique):", ins.get("url", ins.get("id")))
+        get_post_index().record(ins)
         return ins
 
     ins = service.posts().insert(blogId=blog_id, body=body,
                                  isDraft=is_draft).execute()
     print("CREATED:", ins.get("url", ins.get("id")))
+    get_post_index().record(ins)
     return ins
 
 
@@ -949,23 +1138,15 @@ def labels_for_category(category):
 
 
 # =================== توليد موضوع ومقال ===================
-def choose_topic_for_category(category, slot_idx):
-    rnd = random.Random(f"{date.today().isoformat()}-{category}-{slot_idx}")
-
-    if category == "tech":
-        return rnd.choice(TOPICS_TECH)
-
-    if category == "science":
-        return rnd.choice(TOPICS_SCIENCE)
+def choose_topic_for_category(category, slot_idx, today=None, now=None):
+    d = today or date.today()
+    rnd = random.Random(f"{d.isoformat()}-{category}-{slot_idx}")
 
-    if category == "social":
-        return rnd.choice(TOPICS_SOCIAL)
+    if category in ("tech", "science", "social"):
+        return get_topic_pool(category).sample(rnd, now=now)
 
     if category == "news":
-        if TREND_GEO_LIST:
-            trends = fetch_trends_region(TREND_GEO_LIST, per_geo=10)
-        else:
-            trends = fetch_trends_list(TREND_GEO, max_items=10)
+        trends = trending_topics(per_geo=10)
 
         if trends:
             idx = 0 if slot_idx == 0 else 1
@@ -981,9 +1162,11 @@ def choose_topic_for_category(category, slot_idx):
 
 
 def build_article_for(category, topic):
+    query = topic[0] if isinstance(topic, tuple) else topic
+    meta = {"category": category, "topic_key": norm_topic_key(query)}
     if isinstance(topic, tuple):  # news
         t, lnk = topic
-        article = ask_gemini(build_prompt_ar(t, kind="news", news_link=lnk))
+        article, key = ask_gemini(build_prompt_ar(t, kind="news", news_link=lnk), meta)
         article = ensure_references_clickable(article,
                                               "news",
                                               t,
@@ -992,11 +1175,11 @@ def build_article_for(category, topic):
         search_query = t
     else:
         t = topic
-        article = ask_gemini(build_prompt_ar(t, kind="general"))
+        article, key = ask_gemini(build_prompt_ar(t, kind="general"), meta)
         article = ensure_references_clickable(article, category, t)
         title = extract_title(article, t)
         search_query = t
-    return title, article, search_query
+    return title, article, search_query, key
 
 
 # ======== أدوات عنوان سليمة (خارج أي دالة أخرى) ========
@@ -1040,42 +1223,405 @@ def extract_title(article_md, fallback_topic):
             if isinstance(fallback_topic, str) else str(fallback_topic))[:90]
 
 
-def regenerate_until_unique(category, slot_idx, max_tries=3):
-    tried_keys = set()
-    used_title_set = recent_titles(TITLE_WINDOW)
-    used_topic_keys = recent_topics(TOPIC_WINDOW_D)
-    last_title, last_article, last_query = "مقال", "", ""
-    for _ in range(max_tries):
-        picked = choose_topic_for_category(category, slot_idx)
-        topic_key = norm_topic_key(
-            picked[0] if isinstance(picked, tuple) else picked)
-        if topic_key in used_topic_keys or topic_key in tried_keys:
-            tried_keys.add(topic_key)
+def topics_for_category(category):
+    return {
+        "tech": TOPICS_TECH,
+        "science": TOPICS_SCIENCE,
+        "social": TOPICS_SOCIAL
+    }.get(category, [])
+
+
+def _refresh_topic_usage():
+    """
+    يعيد تحميل آخر استخدام للمواضيع إن تغيّر history.db (mtime أو آخر id):
+    العملية الدائمة (scheduler/webhook) ترى ما نشرته الـ workflows أيضًا.
+    """
+    store = get_store()
+    stamp = store.topics_stamp()
+    with _topic_pools_lock:
+        if stamp == _topic_usage["stamp"]: return
+        usage = {}
+        for key, when in store.topic_last_used(HISTORY_BOT).items():
+            try:
+                usage[key] = datetime.fromisoformat(when).timestamp()
+            except (TypeError, ValueError):
+                continue
+        for pool in _topic_pools.values():
+            pool.update_usage(usage)
+        _topic_usage.update(stamp=stamp, usage=usage)
+
+
+def get_topic_pool(category):
+    """مجمع الفئة مع آخر استخدام لكل موضوع (يُحدَّث عند تغيّر السجل فقط)."""
+    _refresh_topic_usage()
+    with _topic_pools_lock:
+        pool = _topic_pools.get(category)
+        if pool is None:
+            pool = _topic_pools[category] = TopicPool(
+                topics_for_category(category), POLICY["allow_old_topics_after_days"],
+                _topic_usage["usage"])
+        return pool
+
+
+def plan_topic_candidates(category, slot_idx, limit=TOPIC_CANDIDATES, today=None, now=None):
+    """
+    قائمة مرتبة من مواضيع مختلفة للفتحة: اختيار اليوم المعتاد أولًا ثم بدائل
+    بترتيب ثابت لليوم (الترندات والأخبار للفئة news)، بلا أي توليد.
+    now: وقت الفتحة (epoch) لحساب التبريد، افتراضيًا الآن.
+    """
+    d = today or date.today()
+    first = choose_topic_for_category(category, slot_idx, today=d, now=now)
+    if category == "news":
+        rest = trending_topics(per_geo=10) + get_feed_cache().fetch(NEWS_RSS_URL)
+    else:
+        rnd = random.Random(f"{d.isoformat()}-{category}-{slot_idx}-plan")
+        rest = get_topic_pool(category).ranked(rnd, limit=limit, now=now)
+    out, seen = [], set()
+    for picked in [first] + rest:
+        key = norm_topic_key(picked[0] if isinstance(picked, tuple) else picked)
+        if not key or key in seen: continue
+        seen.add(key)
+        out.append(tuple(picked) if isinstance(picked, (tuple, list)) else picked)
+        if len(out) >= limit: break
+    return out
+
+
+def predict_title(picked):
+    """عنوان متوقع رخيص: الموضوع نفسه، أو طلب Gemini قصير (TITLE_PREDICTION=gemini)."""
+    text = picked[0] if isinstance(picked, tuple) else picked
+    if TITLE_PREDICTION != "gemini": return text
+    prompt = f"اقترح عنوانًا عربيًا واحدًا فقط (سطر واحد بلا شرح) لمقال عن: «{text}»"
+    for ver, model in gemini_models.candidates():
+        out = _rest_generate(ver, model, prompt, max_words=40)
+        if out:
+            line = out.strip().splitlines()[0]
+            return re.sub(r"[#*«»\"]", "", line).strip() or text
+    return text
+
+
+def select_topic(category, candidates, used_titles, exclude=()):
+    """
+    أول مرشح لم يُستخدم موضوعه ولا عنوانه المتوقع (مطابقةً أو تقريبًا)، أو None
+    إن كانت كلها مكررة (لا ندفع توليدًا كاملًا لموضوع نعرف أنه مكرر).
+    exclude: مفاتيح مواضيع إضافية محجوزة (مواضيع الدفعة الحالية).
+    """
+    used_keys = recent_topics(TOPIC_WINDOW_D) | set(exclude)
+    used_norms = {norm_topic_key(t) for t in used_titles}
+    for picked in candidates:
+        text = picked[0] if isinstance(picked, tuple) else picked
+        if norm_topic_key(text) in used_keys or is_near_duplicate(text):
             continue
-        title, article_md, search_query = build_article_for(category, picked)
-        last_title, last_article, last_query = title, article_md, search_query
-        if title not in used_title_set:
-            return title, article_md, search_query, topic_key
-        tried_keys.add(topic_key)
-    suffix = datetime.now(TZ).strftime(" — %Y/%m/%d %H:%M")
-    return f"{last_title}{suffix}", (last_article or "مقال تجريبي"), (
-        last_query or "بحث"), norm_topic_key(last_query or "بحث")
+        predicted = predict_title(picked)
+        # مع TITLE_PREDICTION=topic العنوان المتوقع هو النص نفسه: يبقى فحص العناوين
+        if norm_topic_key(predicted) in used_norms:
+            continue
+        if predicted != text and is_near_duplicate(predicted):
+            continue
+        return picked
+    print(f"⚠️ All {len(candidates)} {category} candidates were used recently; skipping the slot")
+    return None
+
+
+def unique_title(title, used_titles, when=None):
+    # بعد التوليد لا نعيد توليد المقال: نميّز العنوان المكرر حرفيًا بالتاريخ
+    if norm_topic_key(title) in {norm_topic_key(t) for t in used_titles}:
+        return f"{title}{(when or datetime.now(TZ)).strftime(' — %Y/%m/%d %H:%M')}"
+    return title
+
+
+def regenerate_until_unique(category, slot_idx):
+    """تخطيط المرشحين وفحصها قبل التوليد، ثم توليد كامل واحد فقط للفتحة."""
+    used_titles = recent_titles(TITLE_WINDOW)
+    picked = select_topic(category, plan_topic_candidates(category, slot_idx), used_titles)
+    if picked is None: return None
+    title, article_md, search_query, key = build_article_for(category, picked)
+    return (unique_title(title, used_titles), article_md, search_query,
+            norm_topic_key(search_query), key)
 
 
 # =================== المسار الرئيسي للنشر ===================
+class StageTimer:
+    """
+    يسجل بداية ومدة كل مرحلة (نسبةً لبداية التشغيل) وعدد طلبات HTTP فيها
+    لرؤية المسار الحرج؛ كل مرحلة span في tracing (هستوغرامات /metrics).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.t0 = time.monotonic()
+        self.stages = {}
+        self.trace, self._token = tracing.begin_run(name)
+
+    @contextmanager
+    def stage(self, stage):
+        start = time.monotonic()
+        job_queue.report_stage(stage)
+        with tracing.span(stage) as sp:
+            try:
+                yield
+            finally:
+                self.stages[stage] = {
+                    "start_s": round(start - self.t0, 3),
+                    "dur_s": round(time.monotonic() - start, 3),
+                    "http_calls": sp.http_calls,
+                }
+
+    async def run(self, stage, fn, *args):
+        with self.stage(stage):
+            return await asyncio.to_thread(fn, *args)
+
+    def record(self, **extra):
+        tracing.end_run(self._token)
+        rec = {
+            "run": self.name,
+            "time": datetime.now(TZ).isoformat(),
+            "total_s": round(time.monotonic() - self.t0, 3),
+            "stages": self.stages,
+            "http_calls": self.trace.http_calls,
+            "http": self.trace.http,
+            **extra
+        }
+        try:
+            with open(STAGE_TIMINGS_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+        print("⏱️ " + " | ".join(f"{k} +{v['start_s']}s {v['dur_s']}s ({v['http_calls']} http)"
+                               for k, v in self.stages.items()) +
+              f" | total {rec['total_s']}s, {rec['http_calls']} http")
+        return rec
+
+
+async def make_article_once_async(slot_idx):
+    timer = StageTimer(f"slot{slot_idx}")
+    cat = slot_category_for_today(slot_idx, date.today())
+    # بيانات منع التكرار لا تعتمد على الموضوع: تبدأ فورًا
+    titles_task = asyncio.create_task(
+        timer.run("dedupe_data", recent_titles, TITLE_WINDOW))
+    candidates = await timer.run("topic", plan_topic_candidates, cat, slot_idx)
+    used_titles = await titles_task
+    picked = await timer.run("plan", select_topic, cat, candidates, used_titles)
+    if picked is None:
+        timer.record(category=cat, skipped=True)
+        return None
+    query = picked[0] if isinstance(picked, tuple) else picked
+    topic_key = norm_topic_key(query)
+
+    # الصورة تحتاج الموضوع فقط، فتعمل بالتوازي مع Gemini
+    image_task = asyncio.create_task(timer.run("image", fetch_image, query))
+    title, article_md, search_query, key = await timer.run(
+        "generate", build_article_for, cat, picked)
+    title = unique_title(title, used_titles)
+    image = await image_task
+
+    html_content = await timer.run("html", build_post_html, title, image,
+                                   article_md)
+    labels = labels_for_category(cat)
+    result = await timer.run("publish", publish_tracked, key, title, html_content,
+                             lambda: post_to_blogger(title, html_content, labels=labels))
+    record_publish(title, topic_key)
+    timer.record(category=cat, title=title)
+    state = "مسودة" if (PUBLISH_MODE != "live") else "منشور حي"
+    print(
+        f"[{datetime.now(TZ)}] {state}: {result.get('url','(بدون رابط)')} | {cat} | {title}"
+    )
+    return result
+
+
+def publish_pending_article():
+    """مقال جاهز لم يُنشر في تشغيل سابق يأخذ الفتحة بدل توليد جديد؛ None إن لم يوجد."""
+    try:
+        art = get_article_cache().pending(HISTORY_BOT)
+    except Exception as e:
+        print(f"⚠️ Article cache: {e}")
+        return None
+    if not art: return None
+    meta = art["meta"]
+    print(f"♻️ Publishing pending article from an earlier run: {art['title']}")
+    try:
+        result = publish_tracked(
+            art["prompt_hash"], art["title"], art["html"],
+            lambda: post_to_blogger(art["title"], art["html"],
+                                    labels=labels_for_category(meta.get("category")),
+                                    published=meta.get("published")))
+    except Exception as e:
+        # الفشل مسجل في الكاش (حتى MAX_PUBLISH_ATTEMPTS)؛ الفتحة تكمل بتوليد جديد
+        print(f"❌ Pending article publish failed: {e}")
+        return None
+    record_publish(art["title"], meta.get("topic_key"))
+    print(f"[{datetime.now(TZ)}] {result.get('url','(بدون رابط)')} | {meta.get('category')} | {art['title']}")
+    return result
+
+
 def make_article_once(slot_idx):
+    pending = publish_pending_article()
+    if pending is not None:
+        return pending
+    if ASYNC_PIPELINE:
+        return asyncio.run(make_article_once_async(slot_idx))
+    timer = StageTimer(f"slot{slot_idx}")
     cat = slot_category_for_today(slot_idx, date.today())
-    title, article_md, search_query, topic_key = regenerate_until_unique(
-        cat, slot_idx)
-    image = fetch_image(search_query)
-    html_content = build_post_html(title, image, article_md)
+    with timer.stage("generate"):
+        planned = regenerate_until_unique(cat, slot_idx)
+    if planned is None:
+        timer.record(category=cat, skipped=True)
+        return None
+    title, article_md, search_query, topic_key, key = planned
+    with timer.stage("image"):
+        image = fetch_image(search_query)
+    with timer.stage("html"):
+        html_content = build_post_html(title, image, article_md)
     labels = labels_for_category(cat)
-    result = post_to_blogger(title, html_content, labels=labels)
+    with timer.stage("publish"):
+        result = publish_tracked(key, title, html_content,
+                                 lambda: post_to_blogger(title, html_content, labels=labels))
     record_publish(title, topic_key)
+    timer.record(category=cat, title=title)
     state = "مسودة" if (PUBLISH_MODE != "live") else "منشور حي"
     print(
         f"[{datetime.now(TZ)}] {state}: {result.get('url','(بدون رابط)')} | {cat} | {title}"
     )
+    return result
+
+
+# =================== وضع الدفعة (Batch) ===================
+def _slot_datetime(day, slot_idx):
+    hour, minute = map(int, POST_TIMES_LOCAL[slot_idx].split(":"))
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=TZ)
+
+
+def _pick_batch_topic(cat, slot_idx, day, used_keys, used_titles):
+    # نفس تخطيط الفتحة المفردة وفحصها قبل التوليد، مع حجز مواضيع الدفعة نفسها؛
+    # التبريد محسوب بوقت الفتحة لا بوقت التشغيل
+    now = _slot_datetime(day, slot_idx).timestamp()
+    candidates = plan_topic_candidates(cat, slot_idx, today=day, now=now)
+    if cat != "news":
+        rnd = random.Random(f"{day.isoformat()}-{cat}-{slot_idx}-batch")
+        extra = get_topic_pool(cat).sample(rnd, exclude=used_keys, now=now)
+        if extra and extra not in candidates: candidates.append(extra)
+    return select_topic(cat, candidates, used_titles, exclude=used_keys)
+
+
+def run_batch(days=None, slots=None):
+    """
+    ينتج مقالات عدة أيام/فتحات في تشغيل واحد: مزامنة واحدة للفهرس وسجل واحد
+    محمّل، توليد متوازٍ (يضبطه محدد معدل Gemini)، ثم إرسال الكل عبر Blogger batch.
+    """
+    days = days or [date.today()]
+    slots = list(range(len(POST_TIMES_LOCAL))) if slots is None else slots
+    timer = StageTimer("batch")
+    lock = threading.Lock()
+
+    # مقالات جاهزة من تشغيل سابق تُنشر أولًا (وتدخل عناوينها في السياق أدناه)
+    with timer.stage("pending"):
+        for _ in range(len(days) * len(slots)):
+            if publish_pending_article() is None: break
+
+    # ---- سياق مشترك يُحمّل مرة واحدة ----
+    with timer.stage("context"):
+        used_titles = set(recent_titles(TITLE_WINDOW))
+        used_keys = set(recent_topics(TOPIC_WINDOW_D))
+    batch_hashes = set()
+
+    jobs = []
+    for day in days:
+        for slot_idx in slots:
+            cat = slot_category_for_today(slot_idx, day)
+            picked = _pick_batch_topic(cat, slot_idx, day, used_keys, used_titles)
+            if picked is None: continue
+            query = picked[0] if isinstance(picked, tuple) else picked
+            used_keys.add(norm_topic_key(query))
+            jobs.append({"day": day, "slot": slot_idx, "cat": cat,
+                         "picked": picked})
+
+    def produce(job):
+        title, article_md, search_query, key = build_article_for(
+            job["cat"], job["picked"])
+        with lock:
+            title = unique_title(title, used_titles,
+                                 when=_slot_datetime(job["day"], job["slot"]))
+            used_titles.add(title)
+            exclude = set(batch_hashes)
+        image = fetch_image(search_query, exclude_hashes=exclude)
+        with lock:
+            batch_hashes.add(_img_hash(image["url"]))
+        job.update(title=title,
+                   topic_key=norm_topic_key(search_query),
+                   key=key,
+                   html=build_post_html(title, image, article_md))
+        return job
+
+    ready = []
+    with timer.stage("generate"), ThreadPoolExecutor(
+            max_workers=max(1, BATCH_WORKERS)) as pool:
+        for fut in as_completed([pool.submit(tracing.bind(produce), j) for j in jobs]):
+            try:
+                ready.append(fut.result())
+            except Exception as e:
+                print(f"❌ Batch generation error: {e}")
+
+    # ---- إرسال عبر Blogger batch HTTP ----
+    service = get_blogger_service()
+    blog_id = get_blog_id(service, BLOG_URL)
+    idx = get_post_index()
+    is_draft = (PUBLISH_MODE != "live")
+    results = []
+
+    def on_done(request_id, response, exception):
+        job = ready[int(request_id)]
+        if exception is not None:
+            print(f"❌ Batch {job['action']} failed ({job['day']} slot {job['slot']}): {exception}")
+            track_article("failed", job["key"], exception)
+            return
+        track_article("published", job["key"], response.get("url"))
+        idx.record(response)
+        record_publish(job["title"], job["topic_key"])
+        results.append(response)
+        print(f"{job['action'].upper()}D: {response.get('url', response.get('id'))} | {job['cat']} | {job['title']}")
+
+    with timer.stage("publish"):
+        for start in range(0, len(ready), BATCH_CHUNK):
+            batch = service.new_batch_http_request(callback=on_done)
+            for i in range(start, min(start + BATCH_CHUNK, len(ready))):
+                job = ready[i]
+                body = {
+                    "kind": "blogger#post",
+                    "title": job["title"],
+                    "content": job["html"],
+                    "labels": labels_for_category(job["cat"]),
+                }
+                existing_id = idx.find_by_title(job["title"])
+                if existing_id and not UPDATE_IF_TITLE_EXISTS:
+                    body["title"] = f"{job['title']} — {_slot_datetime(job['day'], job['slot']).strftime('%Y/%m/%d %H:%M')}"
+                    job["title"] = body["title"]
+                    existing_id = None
+                if job["day"] != date.today():
+                    # منشور مؤرخ بوقت فتحته (مجدول للمستقبل أو مؤرشف للماضي)
+                    body["published"] = _slot_datetime(
+                        job["day"], job["slot"]).isoformat()
+                # العنوان والتاريخ النهائيان مع HTML: إن لم تصل الدفعة يُنشر لاحقًا كما هو
+                track_article("rendered", job["key"], body["title"], job["html"],
+                              {"published": body.get("published")})
+                if existing_id:
+                    # UPDATE_IF_TITLE_EXISTS كما في post_to_blogger
+                    job["action"] = "update"
+                    req = service.posts().update(blogId=blog_id, postId=existing_id, body=body)
+                else:
+                    job["action"] = "create"
+                    req = service.posts().insert(blogId=blog_id, body=body, isDraft=is_draft)
+                batch.add(req, request_id=str(i))
+            try:
+                batch.execute()
+            except Exception as e:
+                # خطأ نقل في دفعة لا يُسقط الدفعات التالية
+                print(f"❌ Batch request failed (posts {start}-{min(start + BATCH_CHUNK, len(ready)) - 1}): {e}")
+    timer.record(posts=len(results), jobs=len(jobs))
+    return results
+
+
+def batch_days_from_env():
+    start = date.fromisoformat(BATCH_START) if BATCH_START else date.today()
+    return [start + timedelta(days=i) for i in range(max(1, BATCH_DAYS))]
 
 
 # =================== Webhook (اختياري) ===================
@@ -1084,36 +1630,74 @@ def health():
     return "OK", 200
 
 
+@app.get("/metrics")
+def metrics():
+    return tracing.METRICS.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
+def _publish_slot_job(slot_idx):
+    result = make_article_once(slot_idx) or {}
+    return {k: result.get(k) for k in ("id", "url", "title", "status")}
+
+
+def _authorized():
+    return not TRIGGER_TOKEN or request.args.get("token", "") == TRIGGER_TOKEN
+
+
 @app.get("/trigger")
 def trigger():
-    token = request.args.get("token", "")
+    """يضع نشر الفتحة في الطابور ويعود فورًا؛ التقدم على /jobs/<id>."""
     slot = request.args.get("slot", "0")
-    if TRIGGER_TOKEN and token != TRIGGER_TOKEN:
+    if not _authorized():
         return jsonify({"ok": False, "error": "unauthorized"}), 401
     try:
         i = int(slot)
-        if i not in (0, 1):
-            return jsonify({"ok": False, "error": "slot must be 0 or 1"}), 400
-        make_article_once(i)
-        return jsonify({"ok": True, "slot": i}), 200
-    except Exception as e:
-        return jsonify({"ok": False, "error": str(e)}), 500
+    except ValueError:
+        i = -1
+    if i not in (0, 1):
+        return jsonify({"ok": False, "error": "slot must be 0 or 1"}), 400
+    # مفتاح منع التكرار: كرون يعيد المحاولة بعد مهلة لا ينشر الفتحة مرتين
+    key = f"slot{i}:{datetime.now(TZ).date().isoformat()}"
+    job, created = job_queue.get_job_queue().submit(key, _publish_slot_job, i)
+    return jsonify({"ok": True, "slot": i, "job": job["id"], "status": job["status"],
+                    "duplicate": not created, "url": f"/jobs/{job['id']}"}), (202 if created else 200)
+
+
+@app.get("/jobs/<job_id>")
+def job_status(job_id):
+    if not _authorized():
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+    job = job_queue.get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "job not found"}), 404
+    return jsonify({"ok": job["status"] != "failed", **job}), 200
 
 
 # =================== الجدولة الداخلية ===================
-def schedule_jobs():
-    sched = BackgroundScheduler(timezone=TZ)
+def _scheduled_slot(slot_idx):
+    # نفس قفل مهام /trigger: لا تُنشر فتحتان في الوقت نفسه
+    with job_queue.RUN_LOCK:
+        return make_article_once(slot_idx)
+
+
+def schedule_jobs(sched=None):
+    """يضيف فتحات النشر؛ مع sched خارجي (scheduler.py) لا يبدؤه بنفسه."""
+    own = sched is None
+    sched = sched or BackgroundScheduler(timezone=TZ)
     for idx, t in enumerate(POST_TIMES_LOCAL):
         hour, minute = map(int, t.split(":"))
-        sched.add_job(lambda i=idx: make_article_once(i),
+        sched.add_job(lambda i=idx: _scheduled_slot(i),
                       "cron",
                       hour=hour,
                       minute=minute,
-                      id=f"post_{t}")
-    sched.start()
+                      timezone=TZ,
+                      id=f"post_{t}",
+                      name=f"main slot {idx} [{t}]")
+    if own: sched.start()
     print(
         f"الجدولة فعّالة: {POST_TIMES_LOCAL} بتوقيت بغداد. وضع النشر: {PUBLISH_MODE.upper()}"
     )
+    return sched
 
 
 # =================== التشغيل ===================
@@ -1121,13 +1705,16 @@ if __name__ == "__main__":
     if USE_EXTERNAL_CRON:
         port = int(os.getenv("PORT", "8000"))
         print(
-            f"External-cron mode ON. Webhook: /trigger?slot=0|1&token=***  Port={port}"
+            f"External-cron mode ON. Webhook: /trigger?slot=0|1&token=***  Status: /jobs/<id>  Port={port}"
         )
         app.run(host="0.0.0.0", port=port)
     else:
         if RUN_ONCE:
-            make_article_once(0)
-            make_article_once(1)
+            if BATCH_MODE:
+                run_batch(batch_days_from_env())
+            else:
+                make_article_once(0)
+                make_article_once(1)
         else:
             schedule_jobs()
             try:
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import os, re, hashlib, threading
+from array import array
+from datetime import datetime
+
+from local_cache import cache_path, load_zjson, save_zjson
+
+# =================== كشف التكرار التقريبي (MinHash / LSH) ===================
+NUM_PERM = 64
+BANDS, ROWS = 21, 3  # عتبة LSH التقريبية (1/21)^(1/3) ≈ 0.36 (أقل من عتبة القبول)
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.5"))
+SHINGLE = 3  # n-gram أحرف داخل الكلمة: يلتقط الجذر رغم السوابق واللواحق
+KINDS = ("titles", "topics")
+
+_TASHKEEL_RE = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u0640]")
+_NON_WORD_RE = re.compile(r"[^\w\u0600-\u06FF]+")
+_AR_MAP = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي"})
+_PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال", "و", "ف", "ب")
+_SUFFIXES = ("ها", "هم", "كم", "نا", "ك", "ه", "ي")
+STOPWORDS = {
+    "في", "من", "علي", "الي", "عن", "مع", "او", "ثم", "هل", "ما", "ماذا", "كيف", "لماذا", "هذا",
+    "هذه", "ذلك", "التي", "الذي", "كل", "بين", "بعد", "قبل", "حتي", "دون", "عند", "اهم", "افضل",
+    "دليل", "شامل", "طريقه", "خطوات", "the", "a", "an", "of", "to", "in", "for", "and", "or",
+    "how", "what", "why", "with", "on", "your", "best", "guide",
+}
+
+
+def normalize_ar(text):
+    s = _TASHKEEL_RE.sub("", (text or "").lower()).translate(_AR_MAP)
+    return _NON_WORD_RE.sub(" ", s).strip()
+
+
+def tokens(text):
+    out = []
+    for w in normalize_ar(text).split():
+        # تجذيع خفيف: سابقة واحدة ولاحقة واحدة مع إبقاء 3 أحرف على الأقل
+        for p in _PREFIXES:
+            if w.startswith(p) and len(w) - len(p) >= 3:
+                w = w[len(p):]
+                break
+        for x in _SUFFIXES:
+            if w.endswith(x) and len(w) - len(x) >= 3:
+                w = w[:-len(x)]
+                break
+        if w not in STOPWORDS and len(w) > 1:
+            out.append(w)
+    return out
+
+
+def shingles(text):
+    """n-gram أحرف لكل كلمة (مع حدودها) + الكلمات نفسها."""
+    out = set()
+    for w in tokens(text):
+        out.add(w)
+        w = f"_{w}_"
+        for i in range(max(1, len(w) - SHINGLE + 1)):
+            out.add(w[i:i + SHINGLE])
+    return out
+
+
+def signature(text):
+    # NUM_PERM دالة هاش مستقلة لكل مقطع من SHAKE واحد، ثم الحد الأدنى لكل عمود (في C)
+    rows = [array("I", hashlib.shake_128(s.encode("utf-8")).digest(4 * NUM_PERM))
+            for s in shingles(text)]
+    if not rows: return None
+    return list(map(min, zip(*rows)))
+
+
+def _bands(sig):
+    return [(i, tuple(sig[i * ROWS:(i + 1) * ROWS])) for i in range(BANDS)]
+
+
+def similarity(sig1, sig2):
+    return sum(x == y for x, y in zip(sig1, sig2)) / NUM_PERM
+
+
+class NearDupIndex:
+    """
+    توقيعات MinHash لكل العناوين والمواضيع السابقة لبوت ما، مع جداول LSH:
+    فحص مرشح جديد يقارن فقط بما يشاركه نطاقًا واحدًا على الأقل (أقل من ميلي ثانية).
+    يُزامَن تزايديًا من history.db ويُحفظ في الكاش.
+    """
+
+    def __init__(self, store, bot, threshold=NEAR_DUP_THRESHOLD):
+        self.store = store
+        self.bot = bot
+        self.threshold = threshold
+        self.path = cache_path(f"neardup_{bot}.json.z")
+        self._lock = threading.Lock()
+        data = load_zjson(self.path, {}) or {}
+        self._cursor = data.get("cursor", {"titles": 0, "topics": 0})
+        # عدد صفوف البوت حتى المؤشر وآخر صف [id، النص] لكل نوع
+        self._counts = data.get("counts", {"titles": 0, "topics": 0})
+        self._last = data.get("last", {"titles": None, "topics": None})
+        self._docs = []  # [text, epoch, sig]
+        self._buckets = {}
+        for doc in data.get("docs", []):
+            self._insert(*doc)
+        # .cache يُستعاد لكل run_id وقد لا يطابق history.db (مثل فهرس الحزم)
+        # (كاش قديم بلا counts لا يمكن التحقق منه فيُبنى من جديد أيضًا)
+        if any(self._cursor.values()) and ("counts" not in data or not self._matches_store()):
+            print(f"⚠️ Near-dup index for {bot} does not match history.db; rebuilding")
+            self._reset()
+
+    def _matches_store(self):
+        for kind in KINDS:
+            if self.store.history_count(kind, self.bot, self._cursor[kind]) != self._counts[kind]:
+                return False
+            last = self._last.get(kind)
+            if last and self.store.history_at(kind, last[0]) != last[1]:
+                return False
+        return True
+
+    def _reset(self):
+        self._cursor = {"titles": 0, "topics": 0}
+        self._counts = {"titles": 0, "topics": 0}
+        self._last = {"titles": None, "topics": None}
+        self._docs, self._buckets = [], {}
+        self._save()
+
+    def _save(self):
+        save_zjson(self.path, {"cursor": self._cursor, "counts": self._counts,
+                               "last": self._last, "docs": self._docs})
+
+    def _insert(self, text, t, sig):
+        i = len(self._docs)
+        self._docs.append([text, t, sig])
+        for band in _bands(sig):
+            self._buckets.setdefault(band, []).append(i)
+
+    def sync(self):
+        added = seen = 0
+        with self._lock:
+            for kind, rows in (("titles", self.store.titles_since(self.bot, self._cursor["titles"])),
+                               ("topics", self.store.topics_since(self.bot, self._cursor["topics"]))):
+                for rowid, text, when in rows:
+                    self._cursor[kind] = rowid
+                    self._counts[kind] += 1
+                    self._last[kind] = [rowid, text]
+                    seen += 1
+                    sig = signature(text)
+                    if sig is None: continue
+                    self._insert(text, _epoch(when), sig)
+                    added += 1
+            if seen:
+                self._save()
+        return added
+
+    def find(self, text, since=None):
+        """أقرب نص سابق (التشابه، النص) إن تجاوز العتبة، وإلا None. since: datetime."""
+        sig = signature(text)
+        if sig is None: return None
+        cutoff = since.timestamp() if since else 0
+        best = None
+        with self._lock:
+            seen = set()
+            for band in _bands(sig):
+                for i in self._buckets.get(band, ()):
+                    if i in seen: continue
+                    seen.add(i)
+                    doc_text, t, doc_sig = self._docs[i]
+                    if t < cutoff: continue
+                    sim = similarity(sig, doc_sig)
+                    if sim >= self.threshold and (best is None or sim > best[0]):
+                        best = (sim, doc_text)
+        return best
+
+    def is_near_dup(self, text, since=None):
+        return self.find(text, since) is not None
+
+
+def _epoch(when):
+    try:
+        return datetime.fromisoformat(when).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_near_dup_index(bot):
+    with _indexes_lock:
+        idx = _indexes.get(bot)
+        if idx is None:
+            from history_store import get_store
+            idx = _indexes[bot] = NearDupIndex(get_store(), bot)
+    try:
+        idx.sync()
+    except Exception as e:
+        print(f"⚠️ Near-dup index sync failed: {e}")
+    return idx
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import os, mmap, array, bisect, hashlib, threading
+
+from local_cache import cache_path, load_json, save_json
+from history_store import get_store
+
+# =================== فهرس الحزم المستخدمة ===================
+# الذيل غير المرتب يُدمج في الملف المرتب عند تجاوز هذا العدد
+MERGE_TAIL = int(os.getenv("PACKAGE_INDEX_MERGE_TAIL", "4096"))
+
+
+def pkg_hash(package_id: str) -> int:
+    # 64 بت: احتمال التصادم مهمل حتى مئات الآلاف من الحزم
+    d = hashlib.blake2b(package_id.strip().encode("utf-8"), digest_size=8)
+    return int.from_bytes(d.digest(), "little")
+
+
+class PackageIndex:
+    """
+    فهرس عضوية مضغوط للحزم المنشورة (8 بايت لكل حزمة) أمام جدول packages.
+    ملف مرتب يُقرأ عبر mmap مع بحث ثنائي + ذيل إضافات صغير؛ الفتح لا يحلل
+    السجل كاملًا، ويُزامَن تزايديًا من SQLite عبر آخر rowid.
+    السلبي مؤكد، والإيجابي يُتحقق منه في SQLite (مثل Bloom filter).
+    """
+
+    def __init__(self, store, bot):
+        self.store = store
+        self.bot = bot
+        self.base_path = cache_path(f"packages_{bot}.u64")
+        self.tail_path = cache_path(f"packages_{bot}.tail")
+        self.meta_path = cache_path(f"packages_{bot}.json")
+        self._lock = threading.Lock()
+        self._mm = None
+        self._base = ()
+        self._tail = set()
+        meta = load_json(self.meta_path, {}) or {}
+        self._rowid = meta.get("rowid", 0)
+        self._count = meta.get("count", 0)
+        self._last = meta.get("last")  # [rowid، الحزمة] لآخر حزمة للبوت في الفهرس
+        self._open()
+        # .cache يُستعاد لكل run_id وقد لا يطابق history.db (المتتبع في git):
+        # عدد حزم البوت حتى rowid المحفوظ وآخر حزمة يجب أن يطابقا وإلا نبني من جديد
+        if self._rowid and not self._matches_store():
+            print(f"⚠️ Package index for {bot} does not match history.db; rebuilding")
+            self._reset()
+        self.sync()
+
+    # ---------- ملفات ----------
+    def _open(self):
+        self._close()
+        if os.path.exists(self.base_path) and os.path.getsize(self.base_path) >= 8:
+            with open(self.base_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            n = len(self._mm) // 8
+            self._base = memoryview(self._mm)[:n * 8].cast("Q")
+        tail = array.array("Q")
+        if os.path.exists(self.tail_path):
+            with open(self.tail_path, "rb") as f:
+                data = f.read()
+            tail.frombytes(data[:len(data) // 8 * 8])
+        self._tail = set(tail)
+        # الملف أو الميتا مفقود (كاش جديد): نعيد البناء من البداية
+        if not self._base and not self._tail:
+            self._rowid = self._count = 0
+            self._last = None
+
+    def _matches_store(self):
+        if self.store.package_count(self.bot, self._rowid) != self._count:
+            return False
+        return not self._last or self.store.package_at(self._last[0]) == self._last[1]
+
+    def _reset(self):
+        self._close()
+        open(self.base_path, "wb").close()
+        open(self.tail_path, "wb").close()
+        self._open()  # ملفات فارغة: rowid يعود إلى 0
+
+    def _close(self):
+        if isinstance(self._base, memoryview):
+            self._base.release()
+        self._base = ()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def _in_base(self, h):
+        i = bisect.bisect_left(self._base, h)
+        return i < len(self._base) and self._base[i] == h
+
+    def _merge(self):
+        merged = array.array("Q", sorted(set(self._base) | self._tail))
+        tmp = self.base_path + ".tmp"
+        with open(tmp, "wb") as f:
+            merged.tofile(f)
+        self._close()
+        os.replace(tmp, self.base_path)
+        open(self.tail_path, "wb").close()
+        self._open()
+
+    # ---------- مزامنة ----------
+    def sync(self):
+        """يضيف الحزم الجديدة في SQLite منذ آخر rowid (O(الجديد) فقط)."""
+        with self._lock:
+            top = self.store.max_package_rowid()
+            if top < self._rowid:
+                # قاعدة أُعيد إنشاؤها: الفهرس القديم لا يُعتمد عليه
+                self._reset()
+            if top <= self._rowid:
+                return 0
+            rows = self.store.packages_since(self.bot, self._rowid)
+            new = array.array("Q")
+            for _, pkg in rows:
+                h = pkg_hash(pkg)
+                if h not in self._tail and not self._in_base(h):
+                    new.append(h)
+                    self._tail.add(h)
+            if new:
+                with open(self.tail_path, "ab") as f:
+                    new.tofile(f)
+            self._rowid = top
+            self._count += len(rows)
+            if rows: self._last = list(rows[-1])
+            if len(self._tail) > MERGE_TAIL:
+                self._merge()
+            save_json(self.meta_path, {"rowid": self._rowid, "count": self._count,
+                                       "last": self._last})
+            return len(new)
+
+    def refresh(self):
+        """
+        في بداية كل مهمة (قبل دفعة contains()): العملية الدائمة قد ترى history.db
+        يتغير من خارجها بعد الإنشاء، فنعيد فحص العدد وآخر حزمة ثم نزامن.
+        """
+        with self._lock:
+            if self._rowid and not self._matches_store():
+                print(f"⚠️ Package index for {self.bot} does not match history.db; rebuilding")
+                self._reset()
+        return self.sync()
+
+    def contains(self, package_id) -> bool:
+        if not package_id: return False
+        h = pkg_hash(package_id)
+        with self._lock:
+            hit = h in self._tail or self._in_base(h)
+        # إيجابي نادر (حزمة منشورة فعلًا): تأكيد دقيق من SQLite
+        return hit and self.store.has_package(self.bot, package_id.strip())
+
+    def add(self, package_id):
+        self.store.add_package(self.bot, package_id.strip())
+        self.sync()
+
+    def __len__(self):
+        return len(self._base) + len(self._tail)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_package_index(bot):
+    idx = _indexes.get(bot)
+    if idx is None:
+        with _indexes_lock:
+            idx = _indexes.get(bot)
+            if idx is None:
+                idx = _indexes[bot] = PackageIndex(get_store(), bot)
+    return idx
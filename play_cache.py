@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import os, time, threading
+
+from local_cache import cache_path, load_zjson, save_zjson
+
+# =================== كاش تفاصيل المتجر ===================
+CACHE_FILE = cache_path("play_details.json.z")
+MAX_ENTRIES = int(os.getenv("PLAY_CACHE_MAX_ENTRIES", "3000"))
+
+DAY = 24 * 3600
+DETAILS_TTL_S = int(os.getenv("PLAY_DETAILS_TTL_S", str(3 * DAY)))
+# المرفوض يبقى مرفوضًا أطول، وأخطاء الشبكة تُعاد محاولتها قريبًا
+REJECT_TTL = {
+    "low_score": 7 * DAY,
+    "no_icon": 7 * DAY,
+    "error": 6 * 3600,
+}
+
+
+class PlayDetailCache:
+    """
+    تفاصيل التطبيقات لكل (الحزمة، اللغة، الدولة) مضغوطة على القرص، مع تذكر
+    المرشحين المرفوضين وسبب الرفض حتى تتجاوزهم التشغيلات التالية بلا طلب شبكة.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = load_zjson(path, {}) or {}
+        self._dirty = False
+
+    @staticmethod
+    def key(pkg, lang, country):
+        return f"{pkg}|{lang}|{country}"
+
+    def _fresh(self, e):
+        ttl = REJECT_TTL.get(e.get("reason"), DETAILS_TTL_S)
+        return time.time() - e.get("t", 0) < ttl
+
+    def get(self, pkg, lang, country, min_score=None):
+        """
+        يعيد السجل الصالح: {"details": ...} أو {"reason": ...}، أو None.
+        رفض low_score بعتبة أعلى من min_score الحالية لا يُعتد به (يُعاد التقييم).
+        """
+        with self._lock:
+            e = self._entries.get(self.key(pkg, lang, country))
+            if not e or not self._fresh(e): return None
+            if (min_score is not None and e.get("reason") == "low_score"
+                    and e.get("threshold", float("inf")) > min_score):
+                return None
+            return dict(e)
+
+    def stale_details(self, pkg, lang, country):
+        # تفاصيل منتهية الصلاحية تُستخدم فقط إن فشل التحديث من المتجر
+        with self._lock:
+            e = self._entries.get(self.key(pkg, lang, country)) or {}
+            return e.get("details")
+
+    def put_details(self, pkg, lang, country, details):
+        self._put(pkg, lang, country, {"details": details})
+
+    def reject(self, pkg, lang, country, reason, threshold=None):
+        rec = {"reason": reason}
+        if threshold is not None: rec["threshold"] = threshold
+        self._put(pkg, lang, country, rec)
+
+    def _put(self, pkg, lang, country, rec):
+        with self._lock:
+            self._entries[self.key(pkg, lang, country)] = {**rec, "t": time.time()}
+            self._dirty = True
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty: return
+            now = time.time()
+            self._entries = {k: e for k, e in self._entries.items()
+                             if now - e.get("t", 0) < max(DETAILS_TTL_S, *REJECT_TTL.values())}
+            if len(self._entries) > self.max_entries:
+                newest = sorted(self._entries.items(), key=lambda kv: -kv[1].get("t", 0))
+                self._entries = dict(newest[:self.max_entries])
+            save_zjson(self.path, self._entries)
+            self._dirty = False
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_play_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PlayDetailCache()
+    return _cache
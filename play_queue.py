@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import os, time, random, threading
+from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor
+
+from google_play_scraper import search as play_search, app as play_app
+
+from local_cache import cache_path, load_json, save_json
+from play_cache import get_play_cache
+
+# =================== إعدادات الطابور ===================
+QUEUE_TARGET = int(os.getenv("PLAY_QUEUE_TARGET", "12"))  # حجم التعبئة
+QUEUE_MIN = int(os.getenv("PLAY_QUEUE_MIN", "1"))  # نعبئ عند النزول تحته
+QUEUE_TTL_S = int(os.getenv("PLAY_QUEUE_TTL_S", str(3 * 24 * 3600)))
+PLAY_WORKERS = int(os.getenv("PLAY_WORKERS", "8"))
+MAX_TRIES = 3  # مرشح فشل نشره 3 مرات يُسقط من الطابور
+
+# الحقول التي تحتاجها البوتات فقط (بدل كامل رد المتجر)
+DETAIL_KEYS = ("appId", "title", "description", "icon", "headerImage",
+               "score", "genre", "installs", "developer")
+NUMERIC_KEYS = ("score", )
+
+
+def pick_details(d):
+    # الحقل النصي الناقص يصبح "" لا None (البوتات تقطع الوصف مباشرة)
+    return {k: d.get(k) if k in NUMERIC_KEYS else (d.get(k) or "") for k in DETAIL_KEYS}
+
+
+class CandidateQueue:
+    """
+    طابور مرشحين جاهزين على القرص لبوت متجر (تطبيقات/ألعاب).
+    التعبئة دفعة واحدة: بحث متوازٍ في كل SEARCH_QUERIES ثم جلب التفاصيل
+    بالتوازي، مع فلترة التقييم والأيقونة والسجل. كل تشغيل يأخذ التالي فورًا.
+    """
+
+    def __init__(self, bot, queries, lang, country, n_hits, min_score,
+                 is_used, allow_unscored=False):
+        self.bot = bot
+        self.queries = list(queries)
+        self.lang = lang
+        self.country = country
+        self.n_hits = n_hits
+        self.min_score = min_score
+        self.allow_unscored = allow_unscored
+        self.is_used = is_used
+        self.path = cache_path(f"play_queue_{bot}.json")
+        self._lock = threading.Lock()
+
+    # ---------- تخزين ----------
+    def _load(self):
+        items = load_json(self.path, []) or []
+        now = time.time()
+        return [
+            it for it in items if now - it.get("time", 0) < QUEUE_TTL_S
+            and it.get("tries", 0) < MAX_TRIES and not self.is_used(it["appId"])
+        ]
+
+    # ---------- فلترة ----------
+    def _score_ok(self, summary):
+        score = summary.get("score")
+        if not score: return self.allow_unscored
+        return score >= self.min_score
+
+    def _search(self, query):
+        try:
+            return play_search(query,
+                               lang=self.lang,
+                               country=self.country,
+                               n_hits=self.n_hits)
+        except Exception:
+            return []
+
+    def _details(self, pkg):
+        cache = get_play_cache()
+        hit = cache.get(pkg, self.lang, self.country, min_score=self.min_score)
+        if hit is not None:
+            return hit.get("details")
+        try:
+            d = play_app(pkg, lang=self.lang, country=self.country)
+        except Exception:
+            # فشل التحديث: التفاصيل القديمة أفضل من إسقاط المرشح
+            stale = cache.stale_details(pkg, self.lang, self.country)
+            if stale is None: cache.reject(pkg, self.lang, self.country, "error")
+            return stale
+        if not d or not d.get("icon"):
+            cache.reject(pkg, self.lang, self.country, "no_icon")
+            return None
+        details = pick_details(d)
+        cache.put_details(pkg, self.lang, self.country, details)
+        return details
+
+    # ---------- تعبئة ----------
+    def refill(self, queued):
+        queries = self.queries[:]
+        random.shuffle(queries)
+        seen = {it["appId"] for it in queued}
+        cache = get_play_cache()
+        skipped = 0
+        with ThreadPoolExecutor(max_workers=PLAY_WORKERS) as pool:
+            results = list(pool.map(self._search, queries))
+            # دمج متناوب بين الاستعلامات للحفاظ على التنوع
+            pending = []
+            for row in zip_longest(*[r for r in results if r]):
+                for s in row:
+                    pkg = (s or {}).get("appId")
+                    if not pkg or pkg in seen: continue
+                    seen.add(pkg)
+                    if not self._score_ok(s):
+                        cache.reject(pkg, self.lang, self.country, "low_score",
+                                     threshold=self.min_score)
+                        continue
+                    hit = cache.get(pkg, self.lang, self.country, min_score=self.min_score)
+                    if hit and hit.get("reason"):
+                        skipped += 1
+                        continue
+                    if not self.is_used(pkg): pending.append(pkg)
+            added = []
+            need = QUEUE_TARGET - len(queued)
+            while pending and len(added) < need:
+                wave, pending = pending[:PLAY_WORKERS], pending[PLAY_WORKERS:]
+                for d in pool.map(self._details, wave):
+                    if d and len(added) < need:
+                        added.append({**d, "time": time.time(), "tries": 0})
+        cache.flush()
+        print(f"📥 {self.bot}: queued {len(added)} new candidates "
+              f"(skipped {skipped} rejected earlier)")
+        return queued + added
+
+    def next_candidate(self):
+        """يعيد تفاصيل المرشح التالي (يُحذف من الطابور تلقائيًا بعد تسجيله في السجل)."""
+        with self._lock:
+            queued = self._load()
+            if len(queued) < max(QUEUE_MIN, 1):
+                queued = self.refill(queued)
+            if not queued:
+                save_json(self.path, [])
+                return None
+            head = queued[0]
+            head["tries"] = head.get("tries", 0) + 1
+            save_json(self.path, queued)
+            return pick_details(head)
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+import os, re, time, hashlib, threading
+from datetime import datetime, timedelta, timezone
+
+from dateutil import parser as dateparser
+
+import blogger_client
+from local_cache import cache_path, load_json, save_json
+
+# =================== إعدادات الفهرس ===================
+INDEX_FILE = cache_path("post_index.json")
+# أول مزامنة: كم يومًا نرجع للخلف (startDate) لبناء الفهرس
+BACKFILL_DAYS = int(os.getenv("POST_INDEX_BACKFILL_DAYS", "180"))
+# أقل فاصل بين طلبي delta داخل نفس العملية (ثوانٍ)
+SYNC_TTL = int(os.getenv("POST_INDEX_SYNC_TTL", "120"))
+PAGE_SIZE = 50
+# أول صفحة delta صغيرة: غالبًا لا جديد إلا منشور أو اثنان منذ آخر مزامنة
+DELTA_PAGE_SIZE = int(os.getenv("POST_INDEX_DELTA_PAGE", "10"))
+STATUSES = ["live", "draft", "scheduled"]
+# بلا أجسام: روابط الصور (fetchImages) تكفي لـ img_hash
+LIST_FIELDS = "nextPageToken,items(id,title,url,status,published,updated,images)"
+
+IMG_RE = re.compile(r'<img[^>]+src=["\']([^"\']+)["\']', re.I)
+
+
+# =================== أدوات التطبيع والبصمات ===================
+def norm_title(s: str) -> str:
+    s = (s or "").strip().lower()
+    return re.sub(r"\s+", " ", s)
+
+
+def fingerprint(title: str, html_content: str) -> str:
+    snippet = re.sub(r"<[^>]+>", " ", html_content or "")
+    snippet = re.sub(r"\s+", " ", snippet).strip()[:100]
+    return hashlib.sha1(
+        (norm_title(title) + "|" + snippet).encode("utf-8")).hexdigest()
+
+
+def url_for_hash(u: str) -> str:
+    u = u or ""
+    u = u.split("#", 1)[0]
+    u = u.split("?", 1)[0]
+    if u.startswith("//"): u = "https:" + u
+    if u.startswith("http://"): u = "https://" + u[7:]
+    return u
+
+
+def image_hash(u: str) -> str:
+    return hashlib.sha1((url_for_hash(u)).encode("utf-8")).hexdigest()[:12]
+
+
+def first_image_hash(html_content: str) -> str:
+    m = IMG_RE.search(html_content or "")
+    return image_hash(m.group(1)) if m else ""
+
+
+def _parse_time(s):
+    """RFC 3339 → datetime واعٍ بالمنطقة (المقارنة النصية تخطئ مع إزاحات مختلفة)."""
+    try:
+        dt = dateparser.isoparse(s)
+    except Exception:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+# =================== الفهرس ===================
+class PostIndex:
+    """
+    فهرس محلي لمنشورات المدونة (العنوان، بصمة، hash أول صورة، الحالة، وقت التحديث).
+    يُزامَن تزايديًا: أول مرة عبر startDate، وبعدها بطلب delta مرتب حسب UPDATED
+    يتوقف عند آخر وقت تحديث معروف. كل الاستعلامات بعدها من الذاكرة.
+    """
+
+    def __init__(self, blog_url=blogger_client.BLOG_URL, path=INDEX_FILE):
+        self.blog_url = blog_url
+        self.path = path
+        self._lock = threading.Lock()
+        self._synced_mono = 0.0
+        data = load_json(path, {}) or {}
+        if data.get("blog_url") != blog_url:
+            data = {}
+        # آخر وقت تحديث رأته sync() فقط؛ منشوراتنا (record) لا تحركه وإلا ضاعت
+        # تحديثات البوتات الأخرى بينهما (مفتاح جديد: الفهارس القديمة تُبنى من جديد)
+        self.watermark = data.get("sync_watermark", "")
+        self.posts = data.get("posts", {})
+        self._by_title = {}
+        for pid, rec in self.posts.items():
+            self._by_title.setdefault(rec.get("norm_title", ""), pid)
+
+    # ---------- تخزين ----------
+    def _save(self):
+        save_json(self.path, {
+            "blog_url": self.blog_url,
+            "sync_watermark": self.watermark,
+            "posts": self.posts,
+        })
+
+    def add(self, item):
+        """يُضاف/يُحدَّث منشور من نتيجة insert/update/list دون طلب إضافي."""
+        if not item or not item.get("id"): return
+        title = item.get("title", "") or ""
+        content = item.get("content", "") or ""
+        old = self.posts.get(item["id"], {})
+        if content:
+            img_hash = first_image_hash(content)
+        elif "images" in item:
+            imgs = item.get("images") or []
+            img_hash = image_hash(imgs[0].get("url", "")) if imgs else ""
+        else:
+            img_hash = old.get("img_hash", "")
+        rec = {
+            "title": title,
+            "norm_title": norm_title(title),
+            "fingerprint": fingerprint(title, content) if content else old.get("fingerprint", ""),
+            "img_hash": img_hash,
+            "status": (item.get("status") or old.get("status") or "").lower(),
+            "url": item.get("url", old.get("url", "")),
+            "published": item.get("published", old.get("published", "")),
+            "updated": item.get("updated", old.get("updated", "")),
+        }
+        if old.get("norm_title") and self._by_title.get(old["norm_title"]) == item["id"]:
+            self._by_title.pop(old["norm_title"], None)
+        self.posts[item["id"]] = rec
+        self._by_title[rec["norm_title"]] = item["id"]
+
+    def record(self, item):
+        with self._lock:
+            self.add(item)
+            self._save()
+
+    # ---------- مزامنة ----------
+    def sync(self, force=False):
+        with self._lock:
+            if not force and time.monotonic() - self._synced_mono < SYNC_TTL:
+                return 0
+            service = blogger_client.get_service()
+            blog_id = blogger_client.get_blog_id(self.blog_url, service=service)
+            params = {
+                "blogId": blog_id,
+                "fetchBodies": False,
+                "fetchImages": True,
+                "maxResults": PAGE_SIZE,
+                "status": STATUSES,
+                "view": "ADMIN",
+                "fields": LIST_FIELDS,
+            }
+            if self.watermark:
+                params["orderBy"] = "UPDATED"
+                params["maxResults"] = DELTA_PAGE_SIZE
+                stop_at = _parse_time(self.watermark)
+            else:
+                params["orderBy"] = "PUBLISHED"
+                params["startDate"] = (datetime.now(timezone.utc) - timedelta(
+                    days=BACKFILL_DAYS)).isoformat(timespec="seconds")
+                stop_at = None
+
+            seen, page_token = 0, None
+            newest, newest_dt = self.watermark, stop_at
+            while True:
+                if page_token:
+                    params["pageToken"] = page_token
+                    # الصفحة الأولى كلها أحدث من العلامة: الباقي على دفعات كاملة
+                    params["maxResults"] = PAGE_SIZE
+                res = service.posts().list(**params).execute()
+                done = False
+                for it in (res.get("items") or []):
+                    upd = _parse_time(it.get("updated"))
+                    if stop_at and upd and upd <= stop_at:
+                        done = True
+                        break
+                    self.add(it)
+                    if upd and (newest_dt is None or upd > newest_dt):
+                        newest, newest_dt = it["updated"], upd
+                    seen += 1
+                page_token = res.get("nextPageToken")
+                if done or not page_token: break
+
+            self.watermark = newest
+            self._synced_mono = time.monotonic()
+            if seen: self._save()
+            return seen
+
+    # ---------- استعلامات ----------
+    def _newest(self, limit):
+        with self._lock:
+            recs = sorted(self.posts.values(),
+                          key=lambda r: r.get("published") or r.get("updated") or "",
+                          reverse=True)
+        return recs[:limit]
+
+    def recent_titles(self, limit):
+        return [r["title"] for r in self._newest(limit) if r.get("title")]
+
+    def recent_image_hashes(self, limit):
+        return {r["img_hash"] for r in self._newest(limit) if r.get("img_hash")}
+
+    def find_by_title(self, title):
+        return self._by_title.get(norm_title(title))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_post_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PostIndex()
+    return _index
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+import os, re, csv, json, html, sqlite3, hashlib, threading
+from datetime import datetime, timezone
+
+import bleach
+
+from local_cache import cache_path
+
+# =================== مخزن المنتجات ===================
+# مشتق من ملفات المنتجات (يُعاد بناؤه منها إن فُقد) فمكانه الكاش لا المستودع
+PRODUCTS_DB = os.getenv("PRODUCTS_DB") or cache_path("products.db")
+INGEST_BATCH = 1000
+MAX_DESC_CHARS = int(os.getenv("PRODUCT_DESC_MAX_CHARS", "300"))
+DEFAULT_CATEGORY = "منتجات مختارة"
+# وسوم مسموحة في الوصف (products.json يستخدم <br>)، وكل ما عداها يُهرَّب
+ALLOWED_TAGS = {"br", "b", "strong"}
+# يُرفع عند تغيير normalize ليُعاد استيراد الملفات غير المتغيرة
+NORMALIZE_VERSION = 2
+
+# أسماء الأعمدة الشائعة في ملفات التصدير (affiliate) -> حقولنا
+FIELD_ALIASES = {
+    "name": ("name", "title", "product_name", "product_title"),
+    "description": ("description", "desc", "short_description", "summary"),
+    "image": ("image", "image_url", "img", "image_link", "thumbnail"),
+    "link": ("link", "url", "affiliate_link", "product_url", "deeplink"),
+    "category": ("category", "category_name", "product_category"),
+}
+CARD_FIELDS = ("image", "name", "description", "link")
+
+# يُرفع عند تغيير الجداول: products.db مشتق من الملفات فيُعاد بناؤه بدل الترحيل
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    source TEXT NOT NULL,
+    link TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    image TEXT NOT NULL,
+    category TEXT NOT NULL,
+    source_rank INTEGER NOT NULL,
+    pos INTEGER NOT NULL,
+    gen INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (source, link)
+);
+CREATE INDEX IF NOT EXISTS idx_products_cat_order ON products(category, source_rank, pos);
+CREATE INDEX IF NOT EXISTS idx_products_source_gen ON products(source, gen);
+CREATE INDEX IF NOT EXISTS idx_products_link ON products(link, source_rank);
+
+CREATE TABLE IF NOT EXISTS feeds (
+    source TEXT PRIMARY KEY,
+    source_rank INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    gen INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    time TEXT NOT NULL
+);
+
+-- الرابط نفسه في عدة ملفات: يظهر مرة واحدة من المصدر الأعلى ترتيبًا
+CREATE VIEW IF NOT EXISTS catalog AS
+SELECT * FROM products p WHERE NOT EXISTS (
+    SELECT 1 FROM products q WHERE q.link = p.link AND q.source_rank < p.source_rank);
+"""
+
+_WS_RE = re.compile(r"\s+")
+_PARTIAL_TAG_RE = re.compile(r"<[^>]*$")
+
+
+def product_hash(p):
+    raw = json.dumps([p.get(k) for k in CARD_FIELDS], ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _pick(rec, field):
+    for k in FIELD_ALIASES[field]:
+        v = rec.get(k)
+        if v not in (None, ""): return str(v)
+    return ""
+
+
+def _clean_text(s, limit=None, tags=()):
+    s = _WS_RE.sub(" ", html.unescape(s or "")).strip()
+    if limit and len(s) > limit:
+        s = _PARTIAL_TAG_RE.sub("", s[:limit].rsplit(" ", 1)[0]) + "…"
+    # القيم تُحقن كما هي في HTML البطاقة: الوسوم المسموحة فقط تبقى
+    if tags:
+        return bleach.clean(s, tags=tags, attributes={}, strip=False)
+    return html.escape(s, quote=True)
+
+
+def _clean_url(s):
+    s = (s or "").strip()
+    if not s.lower().startswith(("http://", "https://")): return ""
+    return s.replace('"', "%22").replace(" ", "%20")
+
+
+def normalize(rec):
+    """سجل خام من الملف -> منتج صالح للبطاقة، أو None إن نقصه اسم/رابط/صورة."""
+    if not isinstance(rec, dict): return None
+    rec = {re.sub(r"[\s\-]+", "_", str(k).strip().lower()): v for k, v in rec.items() if k}
+    p = {
+        "name": _clean_text(_pick(rec, "name"), 120),  # يُستخدم أيضًا في alt=""
+        "description": _clean_text(_pick(rec, "description"), MAX_DESC_CHARS, ALLOWED_TAGS),
+        "image": _clean_url(_pick(rec, "image")),
+        "link": _clean_url(_pick(rec, "link")),
+        "category": _clean_text(_pick(rec, "category"), 40) or DEFAULT_CATEGORY,
+    }
+    if not (p["name"] and p["image"] and p["link"]): return None
+    return p
+
+
+def iter_feed(path):
+    """يقرأ الملف سجلًا بسجل: JSON Lines أو CSV (أو مصفوفة JSON صغيرة مثل products.json)."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if ext in (".jsonl", ".ndjson"):
+            for line in f:
+                line = line.strip()
+                if not line: continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+        elif ext in (".csv", ".tsv"):
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+            except csv.Error:
+                dialect = csv.excel_tab if ext == ".tsv" else csv.excel
+            yield from csv.DictReader(f, dialect=dialect)
+        else:
+            data = json.load(f)
+            yield from (data if isinstance(data, list) else data.get("products", []))
+
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ProductStore:
+    """
+    كتالوج المنتجات على SQLite مفهرس بالفئة والترتيب (ترتيب المصدر ثم الموضع داخله)،
+    ومفتاحه (المصدر، الرابط). كل ملف مصدر يُستورد كلقطة كاملة: ما اختفى منه يُحذف.
+    """
+
+    def __init__(self, path=PRODUCTS_DB):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as c:
+            if c.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                c.executescript("DROP VIEW IF EXISTS catalog; DROP TABLE IF EXISTS products; "
+                                "DROP TABLE IF EXISTS feeds;")
+                c.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            c.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- استيراد ----------
+    def ingest(self, path, source=None, force=False, rank=None):
+        """
+        rank: ترتيب المصدر في الإعداد (منتجاته تُعرض قبل المصادر التالية)؛
+        None يبقي الترتيب المحفوظ أو يضع المصدر الجديد في الآخر.
+        """
+        source = source or os.path.basename(path)
+        digest = f"{file_digest(path)}-v{NORMALIZE_VERSION}"
+        c = self._conn()
+        row = c.execute("SELECT digest, gen, source_rank FROM feeds WHERE source=?",
+                        (source, )).fetchone()
+        if rank is None:
+            rank = row[2] if row else c.execute(
+                "SELECT COALESCE(MAX(source_rank), -1) + 1 FROM feeds").fetchone()[0]
+        if row and row[0] == digest and not force:
+            if row[2] != rank:  # الملف نفسه لكن ترتيبه في الإعداد تغيّر
+                with c:
+                    c.execute("UPDATE feeds SET source_rank=? WHERE source=?", (rank, source))
+                    c.execute("UPDATE products SET source_rank=? WHERE source=?", (rank, source))
+            return None  # الملف لم يتغير منذ آخر استيراد
+        gen = (row[1] if row else 0) + 1
+        # الموضع داخل المصدر فقط: الترتيب لا يعتمد على تاريخ الاستيراد
+        pos = 0
+        stats = {"read": 0, "kept": 0, "invalid": 0, "dupes": 0}
+        seen = set()  # هاش 8 بايت للرابط بدل الرابط كاملًا
+        batch = []
+        with c:
+            for rec in iter_feed(path):
+                stats["read"] += 1
+                p = normalize(rec)
+                if p is None:
+                    stats["invalid"] += 1
+                    continue
+                lk = hashlib.blake2b(p["link"].encode("utf-8"), digest_size=8).digest()
+                if lk in seen:
+                    stats["dupes"] += 1
+                    continue
+                seen.add(lk)
+                batch.append((source, p["link"], p["name"], p["description"], p["image"],
+                              p["category"], rank, pos, gen, product_hash(p)))
+                pos += 1
+                stats["kept"] += 1
+                if len(batch) >= INGEST_BATCH:
+                    self._upsert(c, batch)
+                    batch = []
+            self._upsert(c, batch)
+            stats["removed"] = c.execute("DELETE FROM products WHERE source=? AND gen<?",
+                                         (source, gen)).rowcount
+            c.execute("INSERT OR REPLACE INTO feeds(source, source_rank, digest, gen, rows, time) "
+                      "VALUES (?,?,?,?,?,?)",
+                      (source, rank, digest, gen, stats["kept"],
+                       datetime.now(timezone.utc).isoformat(timespec="seconds")))
+        return stats
+
+    def retain(self, sources):
+        """يحذف منتجات المصادر التي لم تعد في الإعداد؛ يعيد عدد المحذوف."""
+        c = self._conn()
+        keep = list(sources)
+        marks = ",".join("?" * len(keep)) or "NULL"
+        with c:
+            removed = c.execute(f"DELETE FROM products WHERE source NOT IN ({marks})",
+                                keep).rowcount
+            c.execute(f"DELETE FROM feeds WHERE source NOT IN ({marks})", keep)
+        return removed
+
+    @staticmethod
+    def _upsert(c, batch):
+        if not batch: return
+        c.executemany(
+            """INSERT INTO products(source, link, name, description, image, category,
+                                   source_rank, pos, gen, hash)
+               VALUES (?,?,?,?,?,?,?,?,?,?)
+               ON CONFLICT(source, link) DO UPDATE SET name=excluded.name,
+                   description=excluded.description, image=excluded.image,
+                   category=excluded.category, source_rank=excluded.source_rank,
+                   pos=excluded.pos, gen=excluded.gen, hash=excluded.hash""", batch)
+
+    # ---------- قراءة ----------
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM catalog").fetchone()[0]
+
+    def categories(self):
+        """[(الفئة، العدد)] بترتيب أول ظهور في الملفات (بترتيب المصادر)."""
+        return self._conn().execute(
+            "SELECT category, COUNT(*) FROM catalog GROUP BY category "
+            "ORDER BY MIN(source_rank * 4294967296 + pos)").fetchall()  # pos < 2^32
+
+    def hashes(self, category, offset, limit):
+        rows = self._conn().execute(
+            "SELECT hash FROM catalog WHERE category=? ORDER BY source_rank, pos "
+            "LIMIT ? OFFSET ?", (category, limit, offset))
+        return [r[0] for r in rows]
+
+    def page(self, category, offset, limit):
+        rows = self._conn().execute(
+            "SELECT name, description, image, link FROM catalog WHERE category=? "
+            "ORDER BY source_rank, pos LIMIT ? OFFSET ?", (category, limit, offset))
+        for name, desc, image, link in rows:
+            yield {"name": name, "description": desc, "image": image, "link": link}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_product_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ProductStore()
+    return _store
+
+
+if __name__ == "__main__":
+    import sys
+    for feed in sys.argv[1:]:
+        res = get_product_store().ingest(feed, force=True)
+        print(f"📦 {feed}: {res}")
+    print(f"🛒 Products in store: {get_product_store().count()}")
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import os, time, threading
+from email.utils import parsedate_to_datetime
+
+try:
+    import fcntl  # قفل بين العمليات (Linux / GitHub Actions)
+except ImportError:  # Windows: قفل داخل العملية فقط
+    fcntl = None
+
+from local_cache import cache_path, load_json, save_json
+
+# =================== حدود الاستدعاء (طلب/دقيقة) ===================
+SAFE_CALLS_PER_MIN = float(os.getenv("SAFE_CALLS_PER_MIN", "3"))
+
+DEFAULT_LIMITS = {
+    "gemini": SAFE_CALLS_PER_MIN,
+    "pexels": 3.0,  # 200 طلب/ساعة
+    "pixabay": 60.0,  # 100 طلب/دقيقة
+    "unsplash": 0.8,  # 50 طلب/ساعة (وضع demo)
+    "wikipedia": 60.0,
+}
+# عدد الطلبات المسموح بها دفعة واحدة؛ 1 = توزيع متساوٍ بلا تجاوز للحد
+DEFAULT_BURST = float(os.getenv("RATE_LIMIT_BURST", "1"))
+
+STATE_FILE = cache_path("rate_limits.json")
+LOCK_FILE = cache_path("rate_limits.lock")
+
+# رؤوس الحصة لدى المزودين (Remaining / Reset)
+_REMAINING_HEADERS = ("X-RateLimit-Remaining", "X-Ratelimit-Remaining")
+_RESET_HEADERS = ("X-RateLimit-Reset", "X-Ratelimit-Reset")
+
+_thread_lock = threading.Lock()
+
+
+class _FileLock:
+
+    def __enter__(self):
+        _thread_lock.acquire()
+        self._f = None
+        if fcntl:
+            self._f = open(LOCK_FILE, "a")
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._f:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+            self._f.close()
+        _thread_lock.release()
+
+
+def _retry_after_seconds(value):
+    if not value: return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _reset_seconds(value):
+    # بعض المزودين يرسل ثوانٍ متبقية، وبعضهم توقيت epoch
+    try:
+        v = float(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, v - time.time()) if v > 10**9 else v
+
+
+def _gemini_retry_delay(response):
+    # Gemini يضع مدة الانتظار في جسم الخطأ: details[].retryDelay = "31s"
+    try:
+        for d in response.json().get("error", {}).get("details", []):
+            if "retryDelay" in d:
+                return float(str(d["retryDelay"]).rstrip("s"))
+    except Exception:
+        pass
+    return None
+
+
+class RateLimiter:
+    """
+    Token bucket مشترك بين الخيوط والعمليات (حالته في ملف داخل الكاش).
+    acquire() ينتظر حتى يتوفر رمز؛ observe() يقرأ 429/Retry-After ورؤوس الحصة
+    فيوقف الاستدعاءات التالية مسبقًا بدل اكتشاف الحد بعد تجاوزه.
+    """
+
+    def __init__(self, name, per_min, burst=DEFAULT_BURST):
+        self.name = name
+        self.rate = max(per_min, 0.001) / 60.0
+        self.burst = max(1.0, burst)
+
+    def _state(self, all_state, now):
+        st = all_state.get(self.name) or {
+            "tokens": self.burst,
+            "ts": now,
+            "blocked_until": 0
+        }
+        st["tokens"] = min(self.burst,
+                           st["tokens"] + (now - st["ts"]) * self.rate)
+        st["ts"] = now
+        return st
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with _FileLock():
+                now = time.time()
+                all_state = load_json(STATE_FILE, {}) or {}
+                st = self._state(all_state, now)
+                if now < st["blocked_until"]:
+                    wait = st["blocked_until"] - now
+                elif st["tokens"] >= 1:
+                    st["tokens"] -= 1
+                    all_state[self.name] = st
+                    save_json(STATE_FILE, all_state)
+                    return True
+                else:
+                    wait = (1 - st["tokens"]) / self.rate
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0: return False
+                wait = min(wait, left)
+            time.sleep(wait)
+
+    def block_for(self, seconds):
+        if not seconds: return
+        with _FileLock():
+            now = time.time()
+            all_state = load_json(STATE_FILE, {}) or {}
+            st = self._state(all_state, now)
+            st["blocked_until"] = max(st["blocked_until"], now + seconds)
+            st["tokens"] = min(st["tokens"], 0)
+            all_state[self.name] = st
+            save_json(STATE_FILE, all_state)
+
+    def observe(self, response):
+        if response is None: return
+        h = response.headers or {}
+        wait = _retry_after_seconds(h.get("Retry-After"))
+        if wait is None and response.status_code == 429:
+            wait = _gemini_retry_delay(response)
+        if wait is None and response.status_code == 429:
+            wait = 60.0 / max(self.rate * 60.0, 1.0)
+        remaining = next((h[k] for k in _REMAINING_HEADERS if k in h), None)
+        if remaining is not None and str(remaining).strip() == "0":
+            reset = next((h[k] for k in _RESET_HEADERS if k in h), None)
+            wait = max(wait or 0, _reset_seconds(reset) or 60.0)
+        if wait:
+            print(f"⏳ {self.name}: rate limited, pausing {wait:.0f}s")
+            self.block_for(wait)
+
+
+_limiters = {}
+
+
+def get_limiter(name):
+    lim = _limiters.get(name)
+    if lim is None:
+        per_min = float(
+            os.getenv(f"RATE_LIMIT_{name.upper()}",
+                      str(DEFAULT_LIMITS.get(name, 30.0))))
+        lim = _limiters.setdefault(name, RateLimiter(name, per_min))
+    return lim
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+عملية واحدة دائمة لكل البوتات بدل تشغيل بارد لكل workflow: الاستيراد وعملاء
+Blogger/OAuth والكاشات تُنشأ مرة واحدة وتبقى دافئة بين المهام.
+
+    python scheduler.py              # تشغيل دائم
+    python scheduler.py --list       # عرض المهام وموعدها التالي
+    python scheduler.py --run apps   # تشغيل بوت واحد الآن ثم الخروج
+
+مواعيد كل بوت بصيغة crontab (بتوقيت UTC مثل GitHub Actions) ويمكن فصل عدة
+مواعيد بـ ";" أو تعطيل البوت بـ off:
+    CRON_APPS="0 6,10,14,18 * * *"   CRON_STORE=off
+"""
+import os, sys, time, argparse, importlib
+from datetime import timezone
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.triggers.cron import CronTrigger
+
+import tracing
+import job_queue
+
+# =================== المواعيد ===================
+CRON_TZ = os.getenv("CRON_TZ", "UTC")
+# البوتات تكتب في نفس history.db: عامل واحد = نفس ضمان concurrency في الـ workflows
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "1"))
+MISFIRE_GRACE_S = int(os.getenv("SCHEDULER_MISFIRE_GRACE_S", "900"))
+SCHEDULE_MAIN = os.getenv("SCHEDULE_MAIN", "1") == "1"
+
+# الاسم -> (الوحدة، الدالة، المواعيد الافتراضية من ملفات .github/workflows)
+BOTS = {
+    "apps": ("apps_bot", "run", "0 6,10,14,18 * * *"),
+    "gaming": ("gaming_bot", "run", "0 16 * * *"),
+    "tech": ("tech_solutions_bot", "run", "30 */8 * * *"),
+    "store": ("store_bot", "update_store_page", "0 10 * * *"),
+}
+
+
+def cron_specs(name, default):
+    raw = os.getenv(f"CRON_{name.upper()}", default).strip()
+    if raw.lower() in ("", "off", "0", "none"): return []
+    return [s.strip() for s in raw.split(";") if s.strip()]
+
+
+def bot_job(name, fn):
+
+    def job():
+        t = time.monotonic()
+        print(f"⏰ [{name}] starting")
+        try:
+            # لا تتداخل مع مهام /trigger (طابور job_queue له عماله الخاصة)
+            with job_queue.RUN_LOCK, tracing.span(f"bot_{name}"):
+                fn()
+        except Exception as e:
+            print(f"❌ [{name}] job failed: {e}")
+        else:
+            print(f"✅ [{name}] done in {time.monotonic() - t:.1f}s")
+
+    return job
+
+
+def load_bots(names=None):
+    """يستورد وحدات البوتات مرة واحدة (أخطاء الإعداد تظهر عند الإقلاع لا وقت المهمة)."""
+    jobs = {}
+    for name, (module, func, default) in BOTS.items():
+        if names and name not in names: continue
+        fn = getattr(importlib.import_module(module), func)
+        jobs[name] = (bot_job(name, fn), default)
+    return jobs
+
+
+def build_scheduler():
+    import main as main_mod
+    sched = BackgroundScheduler(
+        timezone=main_mod.TZ,
+        executors={"default": ThreadPoolExecutor(max(1, SCHEDULER_WORKERS))},
+        job_defaults={"coalesce": True, "max_instances": 1,
+                      "misfire_grace_time": MISFIRE_GRACE_S},
+    )
+    if SCHEDULE_MAIN:
+        main_mod.schedule_jobs(sched)
+    tz = timezone.utc if CRON_TZ.upper() == "UTC" else CRON_TZ
+    for name, (job, default) in load_bots().items():
+        for i, spec in enumerate(cron_specs(name, default)):
+            sched.add_job(job, CronTrigger.from_crontab(spec, timezone=tz),
+                          id=f"{name}_{i}", name=f"{name} [{spec}]")
+    return sched
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run all bots from one warm process")
+    ap.add_argument("--run", help="run one bot now and exit: " + ",".join(BOTS))
+    ap.add_argument("--list", action="store_true", help="print jobs and next run times")
+    args = ap.parse_args()
+    tracing.install()
+
+    if args.run:
+        if args.run not in BOTS:
+            sys.exit(f"unknown bot: {args.run}")
+        job, _ = load_bots([args.run])[args.run]
+        return job()
+
+    sched = build_scheduler()
+    sched.start(paused=args.list)
+    for job in sched.get_jobs():
+        print(f"🗓️ {job.id:<12} {job.name:<40} next: {job.next_run_time}")
+    if args.list:
+        return sched.shutdown(wait=False)
+
+    port = os.getenv("PORT")
+    try:
+        if port:
+            # /metrics و/trigger و/jobs من نفس العملية
+            import main as main_mod
+            main_mod.app.run(host="0.0.0.0", port=int(port))
+        else:
+            while True:
+                time.sleep(30)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sched.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 import os
-import json
+import re
+import hashlib
 import datetime
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+import blogger_client
+from local_cache import cache_path, load_json, save_json
+from product_store import get_product_store
 
 # =================== إعدادات النظام ===================
 BLOG_URL = os.environ["BLOG_URL"]
@@ -12,174 +14,345 @@ CLIENT_SECRET = os.environ["CLIENT_SECRET"]
 REFRESH_TOKEN = os.environ["REFRESH_TOKEN"]
 
 PRODUCTS_FILE = "products.json"
+# ملفات تصدير إضافية (JSON Lines / CSV) مفصولة بفواصل؛ تُستورد تدفقيًا في products.db
+PRODUCT_FEED = os.getenv("PRODUCT_FEED", "")
 AD_LINK_GENERAL = "https://otieu.com/4/10485502"
+# آخر نسخة دُفعت للصفحة (هاش كل بطاقة + هاش الصفحة) لتجنب تحديث بلا تغيير
+STORE_STATE_FILE = cache_path("store_page.json")
+STORE_FORCE = os.getenv("STORE_FORCE", "0") == "1"
+# تقسيم الكتالوج: عدد المنتجات في كل صفحة فرعية، والبطاقات الأولى تُحمّل فورًا
+STORE_PAGE_SIZE = int(os.getenv("STORE_PAGE_SIZE", "60"))
+EAGER_CARDS = 6
 
 # =================== الدوال ===================
 
 def get_service():
-    creds = Credentials(None, refresh_token=REFRESH_TOKEN, client_id=CLIENT_ID, client_secret=CLIENT_SECRET, token_uri="https://oauth2.googleapis.com/token")
-    return build("blogger", "v3", credentials=creds)
+    return blogger_client.get_service()
 
 def load_products():
-    if not os.path.exists(PRODUCTS_FILE): return []
-    with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def generate_full_catalog_html(products):
-    # تصميم المتجر "النظيف جداً" لمنع تداخل الإعلانات
-    html_content = """
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Cairo:wght@400;700;900&display=swap');
-        
-        .store-bg { 
-            font-family: 'Cairo', sans-serif; 
-            direction: rtl; 
-            background: #ffffff; 
-            padding: 5px; 
-        }
-        
-        .grid-container {
-            display: grid;
-            grid-template-columns: repeat(3, 1fr);
-            gap: 15px;
-            max-width: 1200px;
-            margin: 0 auto;
-        }
-
-        .item-card {
-            background: #ffffff;
-            border: 1px solid #f1f1f1;
-            border-radius: 10px;
-            padding: 10px;
-            display: flex;
-            flex-direction: column;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.03);
-            height: 100%;
-            box-sizing: border-box;
-            position: relative;
-        }
-
-        .item-img {
-            width: 100%;
-            height: 160px;
-            object-fit: contain;
-            margin-bottom: 10px;
-        }
-
-        .item-name {
-            font-size: 14px;
-            font-weight: 700;
-            color: #333;
-            margin: 5px 0;
-            line-height: 1.4;
-            min-height: 40px;
-        }
-
-        .item-desc {
-            font-size: 11px;
-            color: #666;
-            line-height: 1.5;
-            margin-bottom: 15px;
-            flex-grow: 1;
-        }
-
-        /* منع التداخل عبر عزل منطقة الأزرار */
-        .btn-section {
-            margin-top: auto;
-            border-top: 1px solid #f9f9f9;
-            padding-top: 10px;
-        }
-
-        .main-buy-btn {
-            display: block;
-            background: #ff4757;
-            color: #ffffff !important;
-            text-decoration: none;
-            padding: 10px;
-            border-radius: 5px;
-            font-weight: 700;
-            font-size: 13px;
-            text-align: center;
-            margin-bottom: 8px;
-        }
-
-        .secondary-btns {
-            display: flex;
-            gap: 4px;
-        }
-
-        .mini-btn {
-            flex: 1;
-            font-size: 10px;
-            padding: 6px 2px;
-            border-radius: 4px;
-            color: #fff !important;
-            text-decoration: none;
-            text-align: center;
-            font-weight: 600;
-        }
-        .green { background: #27ae60; }
-        .blue { background: #2980b9; }
-
-        @media (max-width: 900px) {
-            .grid-container { grid-template-columns: repeat(2, 1fr); }
-        }
-        @media (max-width: 500px) {
-            .grid-container { grid-template-columns: 1fr; }
-        }
-    </style>
+    """يستورد الملفات التي تغيّرت فقط ويعيد مخزن المنتجات (لا يُحمّل الكتالوج في الذاكرة)."""
+    store = get_product_store()
+    feeds = [f.strip() for f in PRODUCT_FEED.split(",") if f.strip()]
+    if os.path.exists(PRODUCTS_FILE): feeds.insert(0, PRODUCTS_FILE)
+    sources = []
+    for feed in feeds:
+        if not os.path.exists(feed):
+            print(f"⚠️ Product feed not found: {feed}")
+            continue
+        # ترتيب الملفات في الإعداد = ترتيب منتجاتها في المتجر
+        stats = store.ingest(feed, rank=len(sources))
+        sources.append(os.path.basename(feed))
+        if stats: print(f"📦 Ingested {feed}: {stats}")
+    removed = store.retain(sources)
+    if removed: print(f"🧹 Removed {removed} products from feeds no longer configured")
+    return store
+
+# تصميم المتجر "النظيف جداً" لمنع تداخل الإعلانات
+STORE_CSS = """
+<style>
+    @import url('https://fonts.googleapis.com/css2?family=Cairo:wght@400;700;900&display=swap');
     
-    <div class="store-bg">
-        <div style="text-align:center; padding-bottom: 20px;">
-            <h2 style="color:#333;">🛒 قائمة المنتجات المختارة</h2>
-        </div>
-        
-        <div class="grid-container">
-    """
+    .store-bg { 
+        font-family: 'Cairo', sans-serif; 
+        direction: rtl; 
+        background: #ffffff; 
+        padding: 5px; 
+    }
     
-    for p in products:
-        card = f"""
-        <div class="item-card">
-            <img src="{p['image']}" class="item-img" alt="{p['name']}">
-            <div class="item-name">{p['name']}</div>
-            <div class="item-desc">{p['description']}</div>
-            
-            <div class="btn-section">
-                <a href="{p['link']}" target="_blank" class="main-buy-btn">🛒 اشتر الآن</a>
-                <div class="secondary-btns">
-                    <a href="{AD_LINK_GENERAL}" target="_blank" class="mini-btn green">🎁 هدية المتجر</a>
-                    <a href="{AD_LINK_GENERAL}" target="_blank" class="mini-btn blue">💎 عروض اليوم</a>
-                </div>
-            </div>
-        </div>
-        """
-        html_content += card
+    .grid-container {
+        display: grid;
+        grid-template-columns: repeat(3, 1fr);
+        gap: 15px;
+        max-width: 1200px;
+        margin: 0 auto;
+    }
 
-    html_content += """
-        </div>
-        <div style="text-align:center; margin-top:40px; color:#ccc; font-size:10px;">
-            Loading Store © 2026
+    .item-card {
+        background: #ffffff;
+        border: 1px solid #f1f1f1;
+        border-radius: 10px;
+        padding: 10px;
+        display: flex;
+        flex-direction: column;
+        box-shadow: 0 2px 5px rgba(0,0,0,0.03);
+        height: 100%;
+        box-sizing: border-box;
+        position: relative;
+    }
+
+    .item-img {
+        width: 100%;
+        height: 160px;
+        object-fit: contain;
+        margin-bottom: 10px;
+    }
+
+    .item-name {
+        font-size: 14px;
+        font-weight: 700;
+        color: #333;
+        margin: 5px 0;
+        line-height: 1.4;
+        min-height: 40px;
+    }
+
+    .item-desc {
+        font-size: 11px;
+        color: #666;
+        line-height: 1.5;
+        margin-bottom: 15px;
+        flex-grow: 1;
+    }
+
+    /* منع التداخل عبر عزل منطقة الأزرار */
+    .btn-section {
+        margin-top: auto;
+        border-top: 1px solid #f9f9f9;
+        padding-top: 10px;
+    }
+
+    .main-buy-btn {
+        display: block;
+        background: #ff4757;
+        color: #ffffff !important;
+        text-decoration: none;
+        padding: 10px;
+        border-radius: 5px;
+        font-weight: 700;
+        font-size: 13px;
+        text-align: center;
+        margin-bottom: 8px;
+    }
+
+    .secondary-btns {
+        display: flex;
+        gap: 4px;
+    }
+
+    .mini-btn {
+        flex: 1;
+        font-size: 10px;
+        padding: 6px 2px;
+        border-radius: 4px;
+        color: #fff !important;
+        text-decoration: none;
+        text-align: center;
+        font-weight: 600;
+    }
+    .green { background: #27ae60; }
+    .blue { background: #2980b9; }
+
+    @media (max-width: 900px) {
+        .grid-container { grid-template-columns: repeat(2, 1fr); }
+    }
+    @media (max-width: 500px) {
+        .grid-container { grid-template-columns: 1fr; }
+    }
+
+    .store-nav { text-align: center; margin-bottom: 15px; font-size: 13px; }
+    .store-nav a, .shard-link {
+        display: inline-block;
+        margin: 4px;
+        padding: 8px 14px;
+        border: 1px solid #f1f1f1;
+        border-radius: 6px;
+        color: #333 !important;
+        text-decoration: none;
+    }
+</style>
+"""
+
+# القالب الفعلي للصفحات (يحتوي {title} و{nav}؛ الأقواس في CSS خارجه)
+STORE_OPEN = """
+<div class="store-bg">
+    <div style="text-align:center; padding-bottom: 20px;">
+        <h2 style="color:#333;">{title}</h2>
+    </div>
+    {nav}
+    <div class="grid-container">
+"""
+STORE_TITLE = "🛒 قائمة المنتجات المختارة"
+
+CARD_TEMPLATE = """
+    <div class="item-card">
+        <img src="{p[image]}" class="item-img" alt="{p[name]}"{lazy}>
+        <div class="item-name">{p[name]}</div>
+        <div class="item-desc">{p[description]}</div>
+        
+        <div class="btn-section">
+            <a href="{p[link]}" target="_blank" class="main-buy-btn">🛒 اشتر الآن</a>
+            <div class="secondary-btns">
+                <a href="{ad}" target="_blank" class="mini-btn green">🎁 هدية المتجر</a>
+                <a href="{ad}" target="_blank" class="mini-btn blue">💎 عروض اليوم</a>
+            </div>
         </div>
     </div>
     """
-    return html_content
+
+STORE_FOOT = """
+    </div>
+    <div style="text-align:center; margin-top:40px; color:#ccc; font-size:10px;">
+        Loading Store © 2026
+    </div>
+</div>
+"""
+
+INDEX_LINK = """<a class="shard-link" href="{url}">{title} ({count})</a>"""
+SHARD_NAV = """<div class="store-nav"><a href="{url}">🏠 كل الأقسام</a></div>"""
+
+
+def minify_css(css):
+    # الـ CSS يتكرر في كل صفحة فرعية؛ ضغط المسافات يقلل حجمها
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{}:;,])\s*", r"\1", css).strip()
+
+STORE_HEAD = minify_css(STORE_CSS)
+
+def render_card(p, lazy=False):
+    attrs = ' loading="lazy" decoding="async"' if lazy else ""
+    return CARD_TEMPLATE.format(p=p, ad=AD_LINK_GENERAL, lazy=attrs)
+
+def page_hash(parts):
+    # القالب نفسه جزء من الهاش: تعديل التصميم يفرض إعادة الدفع
+    h = hashlib.blake2b(digest_size=16)
+    for part in (STORE_HEAD, STORE_OPEN, CARD_TEMPLATE, STORE_FOOT, AD_LINK_GENERAL, *parts):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def generate_full_catalog_html(products, title=STORE_TITLE, nav=""):
+    # تجميع بـ join (زمن خطي) بدل += داخل الحلقة؛ الصور تحت أول صفين كسولة
+    return "".join([
+        STORE_HEAD,
+        STORE_OPEN.format(title=title, nav=nav),
+        *(render_card(p, lazy=i >= EAGER_CARDS) for i, p in enumerate(products)),
+        STORE_FOOT,
+    ])
+
+def shard_products(store, size=STORE_PAGE_SIZE):
+    """يقسم الكتالوج حسب الفئة ثم إلى صفحات بحجم size؛ كل صفحة تحمل هاشات بطاقاتها فقط."""
+    shards = []
+    for cat, total in store.categories():
+        for i in range(0, total, size):
+            n = i // size + 1
+            shards.append({
+                "key": f"{cat}|{n}",
+                "title": f"🛒 {cat}" + (f" - صفحة {n}" if total > size else ""),
+                "category": cat,
+                "offset": i,
+                "count": min(size, total - i),
+                "hashes": store.hashes(cat, i, size),
+            })
+    return shards
+
+def shard_items(store, sh):
+    # المنتجات تُقرأ من القاعدة عند الدفع فقط
+    return store.page(sh["category"], sh["offset"], sh["count"])
+
+def render_index(shards, pushed):
+    # صفحة الفهرس خفيفة: روابط فقط بلا صور
+    links = [INDEX_LINK.format(url=pushed[sh["key"]]["url"], title=sh["title"],
+                               count=sh["count"]) for sh in shards]
+    return "".join([STORE_HEAD, STORE_OPEN.format(title=STORE_TITLE, nav=""),
+                    '</div><div class="store-nav">', "".join(links), STORE_FOOT])
+
+def find_store_page(service, blog_id, state):
+    # معرّف الصفحة محفوظ؛ نسرد الصفحات فقط عند أول تشغيل أو بعد فقدانه
+    if state.get("page_id") and state.get("url") and state.get("blog_id") == blog_id:
+        return {"id": state["page_id"], "url": state["url"]}
+    pages = service.pages().list(blogId=blog_id, fields="items(id,title,url)").execute()
+    return next((p for p in pages.get('items', []) if "store" in p['url'].lower() or "متجر" in p['title']), None)
+
+def push_page(service, blog_id, page_id, content, title=None):
+    """يحدّث صفحة موجودة (patch)، أو ينشئها إن أُعطي عنوان ولم تعد موجودة."""
+    if page_id:
+        body = {"content": content, **({"title": title} if title else {})}
+        try:
+            return service.pages().patch(blogId=blog_id, pageId=page_id, body=body,
+                                         fields="id,url").execute()
+        except Exception as e:
+            if not title or getattr(getattr(e, "resp", None), "status", None) != 404: raise
+    return service.pages().insert(blogId=blog_id, body={"title": title, "content": content},
+                                  isDraft=False, fields="id,url").execute()
+
+def push_shards(service, blog_id, store, shards, index_url, state):
+    """يدفع الصفحات الفرعية التي تغيّر هاشها فقط، ويحذف صفحات لم تعد في الكتالوج."""
+    old = state.get("shards") or {}
+    nav = SHARD_NAV.format(url=index_url)
+    pushed, n = {}, 0
+    for sh in shards:
+        h = page_hash([sh["title"], index_url, *sh["hashes"]])
+        prev = old.get(sh["key"]) or {}
+        if prev.get("hash") == h and not STORE_FORCE:
+            pushed[sh["key"]] = prev
+            continue
+        content = generate_full_catalog_html(shard_items(store, sh), title=sh["title"], nav=nav)
+        res = push_page(service, blog_id, prev.get("page_id"), content, title=sh["title"])
+        pushed[sh["key"]] = {"page_id": res["id"], "url": res.get("url", ""), "hash": h}
+        n += 1
+        # حفظ بعد كل صفحة: تشغيل انقطع لا يعيد إنشاء صفحات موجودة
+        state["shards"] = {**old, **pushed}
+        save_json(STORE_STATE_FILE, state)
+    for key, prev in old.items():
+        if key in pushed: continue
+        try:
+            service.pages().delete(blogId=blog_id, pageId=prev["page_id"]).execute()
+        except Exception as e:
+            print(f"⚠️ Could not delete old store page {key}: {e}")
+    return pushed, n
 
 def update_store_page():
     print("🛒 Fixing Store Overlap...")
-    service = get_service()
-    products = load_products()
-    
+    store = load_products()
+    state = load_json(STORE_STATE_FILE, {}) or {}
+
+    shards = shard_products(store)
+    paged = len(shards) > 1
+    digest = page_hash([f"paged:{STORE_PAGE_SIZE}" if paged else "single",
+                        *(h for sh in shards for h in (sh["key"], *sh["hashes"]))])
+    if digest == state.get("hash") and not STORE_FORCE:
+        print("✅ Store unchanged since last push, skipping update.")
+        return
+
+    print(f"🧩 {sum(sh['count'] for sh in shards)} products in {len(shards)} page(s)")
+
     try:
-        blog = service.blogs().getByUrl(url=BLOG_URL).execute()
-        blog_id = blog["id"]
-        pages = service.pages().list(blogId=blog_id).execute()
-        
-        target = next((p for p in pages['items'] if "store" in p['url'].lower() or "متجر" in p['title']), None)
-        
-        if target:
-            body = {"title": target['title'], "content": generate_full_catalog_html(products)}
-            service.pages().update(blogId=blog_id, pageId=target['id'], body=body).execute()
-            print("🚀 Fixed! The products are now isolated from ads.")
+        service = get_service()
+        blog_id = blogger_client.get_blog_id(BLOG_URL, service=service)
+        if state.get("blog_id") != blog_id: state = {}
+        target = find_store_page(service, blog_id, state)
+        if not target:
+            print("⚠️ Store page not found.")
+            return
+
+        # الصفحة الرئيسية: الكتالوج كاملًا، أو فهرس روابط عند التقسيم
+        pushed, n = push_shards(service, blog_id, store, shards if paged else [], target['url'], state)
+        if paged:
+            content = render_index(shards, pushed)
+        else:
+            content = generate_full_catalog_html(shard_items(store, shards[0]) if shards else [])
+        main_hash = page_hash([content])
+        if main_hash != state.get("main_hash") or STORE_FORCE:
+            try:
+                res = push_page(service, blog_id, target['id'], content)
+            except Exception:
+                # الصفحة المحفوظة حُذفت أو تغيّرت: نبحث عنها من جديد مرة واحدة
+                if not state.get("page_id"): raise
+                target = find_store_page(service, blog_id, {})
+                if not target: return
+                res = push_page(service, blog_id, target['id'], content)
+            target = {"id": res.get("id", target['id']), "url": res.get("url") or target['url']}
+            n += 1
+        save_json(STORE_STATE_FILE, {
+            "blog_id": blog_id,
+            "page_id": target['id'],
+            "url": target['url'],
+            "hash": digest,
+            "main_hash": main_hash,
+            "shards": pushed,
+            "time": datetime.datetime.now().isoformat(),
+        })
+        print(f"🚀 Fixed! The products are now isolated from ads. ({n} page(s) pushed)")
     except Exception as e:
         print(f"❌ Error: {e}")
 
@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 import os
 import random
-import json
 import requests
 import markdown as md
 import backoff
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+import blogger_client
+import gemini_models
+from rate_limiter import get_limiter
+from history_store import get_store
+from near_dup import get_near_dup_index
+from article_cache import generate_cached, publish_tracked, publish_pending
 
 # =================== إعدادات النظام ===================
 GEMINI_API_KEY = os.environ["GEMINI_API_KEY"]
@@ -18,8 +21,8 @@ REFRESH_TOKEN = os.environ["REFRESH_TOKEN"]
 # 🔗 رابط الإعلان
 DIRECT_LINK = "https://otieu.com/4/10481709"
 
-HISTORY_FILE = "history_tech_solutions.json"
-GEMINI_API_ROOT = "https://generativelanguage.googleapis.com"
+HISTORY_BOT = "tech_solutions"  # history.db (history_store.py)
+GEMINI_API_ROOT = os.getenv("GEMINI_API_ROOT", "https://generativelanguage.googleapis.com")
 LABELS = ["شروحات_تقنية", "صيانة", "Technology", "دليل_شامل"]
 
 # =================== مجالات التفكير ===================
@@ -35,32 +38,16 @@ NICHES = [
 ]
 
 # =================== إدارة الذاكرة ===================
-def load_history():
-    if not os.path.exists(HISTORY_FILE): return []
-    try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except: return []
+def load_history(limit=15):
+    return get_store().recent_topics(HISTORY_BOT, limit)
 
 def save_history(topic):
-    history = load_history()
-    history.append(topic)
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    get_store().add_topic(HISTORY_BOT, None, topic)
 
 # =================== المحرك الذهبي ===================
 def get_working_model():
-    url = f"{GEMINI_API_ROOT}/v1beta/models?key={GEMINI_API_KEY}"
-    try:
-        r = requests.get(url, timeout=30)
-        if r.status_code != 200: return "gemini-pro"
-        data = r.json()
-        for model in data.get('models', []):
-            name = model['name'].replace('models/', '')
-            if 'generateContent' in model.get('supportedGenerationMethods', []):
-                return name
-        return "gemini-1.5-flash"
-    except: return "gemini-pro"
+    # الموديل المحفوظ في الكاش المشترك، دون سرد /models في كل توليد
+    return gemini_models.get_working_model(fallback="gemini-pro")
 
 def _rest_generate(prompt):
     model_name = get_working_model()
@@ -74,7 +61,11 @@ def _rest_generate(prompt):
     ]
     
     try:
+        limiter = get_limiter("gemini")
+        limiter.acquire()
         r = requests.post(url, json={"contents": [{"parts": [{"text": prompt}]}], "safetySettings": safety_settings}, timeout=60)
+        limiter.observe(r)
+        gemini_models.report_status("v1beta", model_name, r.status_code)
         if r.status_code == 200: 
             return r.json()["candidates"][0]["content"]["parts"][0]["text"]
         else:
@@ -87,8 +78,7 @@ def _rest_generate(prompt):
 # =================== العقل المدبر ===================
 @backoff.on_exception(backoff.expo, Exception, max_tries=3)
 def invent_topic():
-    history = load_history()
-    recent = history[-15:] if len(history) > 15 else history
+    recent = load_history(15)
     niche = random.choice(NICHES)
     
     prompt = f"""
@@ -133,7 +123,9 @@ def write_tech_article(topic):
     ## الخاتمة
     (خاتمة قصيرة)
     """
-    return _rest_generate(prompt)
+    # (المقال، مفتاح كاش المقالات)
+    return generate_cached(prompt, lambda: _rest_generate(prompt), HISTORY_BOT,
+                           model=get_working_model(), meta={"topic": topic})
 
 # =================== التصميم البسيط (Simple Layout) ===================
 def build_styled_html(title, markdown_content):
@@ -272,19 +264,20 @@ def build_styled_html(title, markdown_content):
     return styled_template
 
 def post_to_blogger(title, content):
-    creds = Credentials(None, refresh_token=REFRESH_TOKEN, client_id=CLIENT_ID, client_secret=CLIENT_SECRET, token_uri="https://oauth2.googleapis.com/token")
-    service = build("blogger", "v3", credentials=creds)
-    try:
-        blog_id = service.blogs().getByUrl(url=BLOG_URL).execute()["id"]
-    except:
-        blog_id = BLOG_ID 
+    service = blogger_client.get_service()
+    blog_id = blogger_client.get_blog_id(BLOG_URL, service=service)
 
     body = {"kind": "blogger#post", "title": title, "content": content, "labels": LABELS}
     return service.posts().insert(blogId=blog_id, body=body, isDraft=False).execute()
 
 # =================== التشغيل ===================
-if __name__ == "__main__":
+def _pending_published(art, res):
+    if art["meta"].get("topic"): save_history(art["meta"]["topic"])
+
+def run():
     print("🚀 Starting Tech Solutions Bot (Clean Layout)...")
+    # مقال مولّد فشل نشره في تشغيل سابق يُنشر أولًا بلا توليد جديد
+    if publish_pending(HISTORY_BOT, post_to_blogger, _pending_published): return
     
     raw_topic = None
     for i in range(3):
@@ -293,19 +286,24 @@ if __name__ == "__main__":
         if temp_topic:
             clean_topic = temp_topic.strip().replace('"', '').replace('*', '')
             if len(clean_topic) > 10 and len(clean_topic) < 100: 
+                hit = get_near_dup_index(HISTORY_BOT).find(clean_topic)
+                if hit:
+                    print(f"♻️ Near-duplicate of an old topic ({hit[0]:.2f}): {hit[1]}")
+                    continue
                 raw_topic = clean_topic
                 break
     
     if raw_topic:
         print(f"💡 Topic Selected: {raw_topic}")
-        article_md = write_tech_article(raw_topic)
+        article_md, key = write_tech_article(raw_topic)
         
         if article_md:
             print("📝 Content Generated. Styling...")
             final_html = build_styled_html(raw_topic, article_md)
             
             try:
-                res = post_to_blogger(raw_topic, final_html)
+                res = publish_tracked(key, raw_topic, final_html,
+                                      lambda: post_to_blogger(raw_topic, final_html))
                 print(f"🎉 PUBLISHED! URL: {res.get('url')}")
                 save_history(raw_topic)
             except Exception as e:
@@ -314,3 +312,7 @@ if __name__ == "__main__":
             print("❌ Content generation failed.")
     else:
         print("❌ Failed to invent a valid topic.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+import os, sys, tempfile
+
+# الوحدات مسطحة في جذر المستودع وتقرأ إعداداتها عند الاستيراد:
+# نضبط البيئة (مجلد كاش وقاعدة تاريخ مؤقتين، مفاتيح وهمية) قبل أي import
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ["BOT_CACHE_DIR"] = os.path.join(_tmp, "cache")
+os.environ["HISTORY_DB"] = os.path.join(_tmp, "history.db")
+os.environ["PRODUCTS_DB"] = os.path.join(_tmp, "products.db")
+os.environ.setdefault("TRACING", "0")
+for _k in ("GEMINI_API_KEY", "BLOG_URL", "CLIENT_ID", "CLIENT_SECRET", "REFRESH_TOKEN"):
+    os.environ.setdefault(_k, "test")
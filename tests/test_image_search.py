@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import main
+from image_cache import get_image_cache
+
+
+class _Resp:
+    def __init__(self, status, data=None):
+        self.status_code, self.ok, self.headers = status, status == 200, {}
+        self._data = data or {}
+
+    def json(self): return self._data
+
+
+class _Limiter:
+    def __init__(self, ok=True): self.ok = ok
+    def acquire(self, timeout=None): return self.ok
+    def observe(self, r): pass
+
+
+@pytest.fixture
+def wiki(monkeypatch):
+    state = {"limiter": _Limiter(), "resp": _Resp(200), "calls": 0}
+
+    def fake_get(url, **kw):
+        state["calls"] += 1
+        return state["resp"]
+
+    monkeypatch.setattr(main, "get_limiter", lambda name: state["limiter"])
+    monkeypatch.setattr(main.requests, "get", fake_get)
+    return state
+
+
+def _cached(topic, lang="en"):
+    return get_image_cache().get(f"wiki_{lang}", topic)
+
+
+def test_non_200_is_not_cached(wiki):
+    wiki["resp"] = _Resp(503)
+    assert main.fetch_wiki_image("outage topic", "en") == []
+    assert _cached("outage topic") is None
+
+
+def test_limiter_timeout_is_not_cached(wiki):
+    wiki["limiter"] = _Limiter(ok=False)
+    assert main.fetch_wiki_image("busy topic", "en") == []
+    assert wiki["calls"] == 0
+    assert _cached("busy topic") is None
+
+
+def test_page_without_image_is_cached_empty(wiki):
+    wiki["resp"] = _Resp(200, {"query": {"pages": {"1": {"title": "x"}}}})
+    assert main.fetch_wiki_image("bare topic", "en") == []
+    assert _cached("bare topic") == []
+    main.fetch_wiki_image("bare topic", "en")
+    assert wiki["calls"] == 1
+
+
+def test_found_image_is_cached(wiki):
+    src = "https://upload.example/a.jpg"
+    wiki["resp"] = _Resp(200, {"query": {"pages": {"1": {"original": {"source": src}}}}})
+    assert main.fetch_wiki_image("good topic", "en")[0]["url"] == src
+    assert _cached("good topic")[0]["url"] == src
+
+
+def test_search_exception_is_not_cached():
+    def boom(topic): raise ConnectionError("reset")
+    assert main._cached_search("unsplash", "flaky topic", boom) == []
+    assert get_image_cache().get("unsplash", "flaky topic") is None
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import threading, time
+
+import job_queue
+from job_queue import JobQueue
+
+
+def _wait(queue, job_id, status, timeout=5):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        job = queue.get(job_id)
+        if job["status"] == status: return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} is {queue.get(job_id)['status']}, not {status}")
+
+
+def test_submit_dedupes_by_key_until_failure(tmp_path):
+    queue = JobQueue(path=str(tmp_path / "jobs.json"))
+    job, created = queue.submit("slot0:2026-01-01", lambda: 1)
+    again, created_again = queue.submit("slot0:2026-01-01", lambda: 2)
+    assert created and not created_again and again["id"] == job["id"]
+    assert _wait(queue, job["id"], "done")["result"] == 1
+
+    def boom(): raise RuntimeError("quota")
+    failed, _ = queue.submit("slot1:2026-01-01", boom)
+    _wait(queue, failed["id"], "failed")
+    retry, created = queue.submit("slot1:2026-01-01", lambda: 3)
+    assert created and retry["id"] != failed["id"]
+
+
+def test_dedupe_survives_restart(tmp_path):
+    path = str(tmp_path / "jobs.json")
+    queue = JobQueue(path=path)
+    job, _ = queue.submit("slot0:2026-01-02", lambda: 1)
+    _wait(queue, job["id"], "done")
+    again, created = JobQueue(path=path).submit("slot0:2026-01-02", lambda: 2)
+    assert not created and again["id"] == job["id"]
+
+
+def test_jobs_wait_for_a_running_scheduled_job(tmp_path):
+    queue = JobQueue(path=str(tmp_path / "jobs.json"))
+    held, release = threading.Event(), threading.Event()
+
+    def scheduled():  # مثل bot_job في scheduler.py
+        with job_queue.RUN_LOCK:
+            held.set()
+            release.wait(5)
+
+    t = threading.Thread(target=scheduled)
+    t.start()
+    held.wait(5)
+    job, _ = queue.submit("slot0:2026-01-03", lambda: 1)
+    time.sleep(0.1)
+    assert queue.get(job["id"])["status"] == "queued"
+    release.set()
+    t.join()
+    _wait(queue, job["id"], "done")
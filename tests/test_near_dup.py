@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from history_store import HistoryStore
+from near_dup import NearDupIndex
+
+
+def _store(tmp_path):
+    return HistoryStore(str(tmp_path / "history.db"))
+
+
+def test_index_syncs_new_titles_incrementally(tmp_path):
+    store = _store(tmp_path)
+    store.add_title("nd_inc", "أفضل طرق تعلم البرمجة للمبتدئين")
+    idx = NearDupIndex(store, "nd_inc")
+    idx.sync()
+    assert idx.is_near_dup("افضل طريقة لتعلم البرمجة للمبتدئين")
+
+    store.add_title("nd_inc", "Quantum computing explained")
+    assert idx.sync() == 1
+    assert idx.is_near_dup("quantum computing explained simply")
+
+
+def test_stale_cursor_is_rebuilt_from_history(tmp_path):
+    store = _store(tmp_path)
+    store.add_title("nd_stale", "Electric cars battery life")
+    store.add_title("nd_stale", "Mars rover discoveries")
+    NearDupIndex(store, "nd_stale").sync()
+
+    # history.db آخر بنفس المعرفات (run_id مختلف): الكاش يشير لنصوص غير موجودة
+    with store._conn() as c:
+        c.execute("UPDATE titles SET title='Deep sea volcano research' "
+                  "WHERE bot='nd_stale' AND title='Mars rover discoveries'")
+    idx = NearDupIndex(store, "nd_stale")
+    idx.sync()
+    assert not idx.is_near_dup("Mars rover discoveries")
+    assert idx.is_near_dup("deep sea volcano research")
+    assert idx.is_near_dup("electric cars battery life")
+
+
+def test_missing_rows_trigger_rebuild(tmp_path):
+    store = _store(tmp_path)
+    store.add_title("nd_del", "Solar panels at home")
+    store.add_title("nd_del", "Home composting basics")
+    NearDupIndex(store, "nd_del").sync()
+    with store._conn() as c:
+        c.execute("DELETE FROM titles WHERE bot='nd_del' AND title='Solar panels at home'")
+    idx = NearDupIndex(store, "nd_del")
+    idx.sync()
+    assert not idx.is_near_dup("solar panels at home")
+    assert idx.is_near_dup("home composting basics")
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from history_store import HistoryStore
+from package_index import PackageIndex
+
+
+def test_refresh_rebuilds_when_history_db_changes_underneath(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    store.add_package("pi_refresh", "com.old.one")
+    store.add_package("pi_refresh", "com.old.two")
+    idx = PackageIndex(store, "pi_refresh")
+    assert idx.contains("com.old.two")
+
+    # history.db آخر بنفس العدد ونفس rowid (سحب git في العملية الدائمة)
+    with store._conn() as c:
+        rows = c.execute("SELECT rowid FROM packages WHERE bot='pi_refresh' "
+                         "ORDER BY rowid").fetchall()
+        for (rowid, ), pkg in zip(rows, ("com.new.one", "com.new.two")):
+            c.execute("UPDATE packages SET package_id=? WHERE rowid=?", (pkg, rowid))
+    assert not idx.contains("com.new.one")  # الفهرس القديم لا يراها
+
+    idx.refresh()
+    assert idx.contains("com.new.one") and idx.contains("com.new.two")
+    assert not idx.contains("com.old.one")
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+from play_cache import PlayDetailCache
+
+
+def test_low_score_rejection_is_reevaluated_under_lower_threshold(tmp_path):
+    cache = PlayDetailCache(path=str(tmp_path / "play.json.z"))
+    cache.reject("com.meh", "en", "us", "low_score", threshold=4.0)
+    assert cache.get("com.meh", "en", "us", min_score=4.0)["reason"] == "low_score"
+    assert cache.get("com.meh", "en", "us", min_score=4.5)["reason"] == "low_score"
+    assert cache.get("com.meh", "en", "us", min_score=3.5) is None
+
+
+def test_other_rejections_ignore_threshold(tmp_path):
+    cache = PlayDetailCache(path=str(tmp_path / "play.json.z"))
+    cache.reject("com.noicon", "en", "us", "no_icon")
+    assert cache.get("com.noicon", "en", "us", min_score=1.0)["reason"] == "no_icon"
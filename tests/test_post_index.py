@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import blogger_client
+import post_index
+
+
+class _Req:
+    def __init__(self, res): self.res = res
+    def execute(self): return self.res
+
+
+class FakePosts:
+    """يحاكي posts().list مرتبًا حسب UPDATED مع صفحات maxResults/pageToken."""
+
+    def __init__(self):
+        self.items, self.calls = [], []
+
+    def list(self, **kw):
+        self.calls.append(dict(kw))
+        items = sorted(self.items, key=lambda p: post_index._parse_time(p["updated"]),
+                       reverse=True)
+        size, off = kw["maxResults"], int(kw.get("pageToken") or 0)
+        res = {"items": items[off:off + size]}
+        if off + size < len(items): res["nextPageToken"] = str(off + size)
+        return _Req(res)
+
+
+class FakeService:
+    def __init__(self): self.fake = FakePosts()
+    def posts(self): return self.fake
+
+
+def _index(tmp_path, monkeypatch):
+    svc = FakeService()
+    monkeypatch.setattr(blogger_client, "get_service", lambda: svc)
+    monkeypatch.setattr(blogger_client, "get_blog_id", lambda *a, **k: "1")
+    return post_index.PostIndex(blog_url="b", path=str(tmp_path / "idx.json")), svc.fake
+
+
+def _post(pid, updated, title=None):
+    return {"id": pid, "title": title or f"post {pid}", "updated": updated,
+            "images": [{"url": f"https://img/{pid}.png"}]}
+
+
+def test_watermark_compares_instants_across_offsets(tmp_path, monkeypatch):
+    idx, fake = _index(tmp_path, monkeypatch)
+    # 10:00+03:00 = 07:00Z أقدم من 08:00Z رغم أن النص أكبر
+    fake.items = [_post("1", "2026-01-01T08:00:00Z"),
+                  _post("2", "2026-01-01T10:00:00+03:00")]
+    assert idx.sync(force=True) == 2
+    assert idx.watermark == "2026-01-01T08:00:00Z"
+
+    fake.items.append(_post("3", "2026-01-01T08:30:00Z"))
+    assert idx.sync(force=True) == 1
+    assert idx.find_by_title("post 3") == "3"
+    assert idx.watermark == "2026-01-01T08:30:00Z"
+
+
+def test_delta_starts_small_and_pages_only_while_newer(tmp_path, monkeypatch):
+    idx, fake = _index(tmp_path, monkeypatch)
+    fake.items = [_post(str(i), f"2026-01-01T00:{i:02d}:00Z") for i in range(3)]
+    idx.sync(force=True)
+    assert fake.calls[0]["fetchBodies"] is False
+
+    fake.calls.clear()
+    assert idx.sync(force=True) == 0
+    assert len(fake.calls) == 1
+    assert fake.calls[0]["maxResults"] == post_index.DELTA_PAGE_SIZE
+
+    n = post_index.DELTA_PAGE_SIZE + 5
+    fake.items += [_post(f"n{i}", f"2026-01-02T00:{i:02d}:00Z") for i in range(n)]
+    fake.calls.clear()
+    assert idx.sync(force=True) == n
+    assert [c["maxResults"] for c in fake.calls] == [post_index.DELTA_PAGE_SIZE,
+                                                     post_index.PAGE_SIZE]
+
+
+def test_record_does_not_move_watermark(tmp_path, monkeypatch):
+    idx, fake = _index(tmp_path, monkeypatch)
+    fake.items = [_post("1", "2026-01-01T00:00:00Z")]
+    idx.sync(force=True)
+    fake.items.append(_post("2", "2026-01-02T00:00:00Z", "other bot"))
+    idx.record(_post("3", "2026-01-03T00:00:00Z", "mine"))
+    fake.items.append(_post("3", "2026-01-03T00:00:00Z", "mine"))
+    idx.sync(force=True)
+    assert idx.find_by_title("other bot") == "2"
+    assert post_index.image_hash("https://img/2.png") in idx.recent_image_hashes(5)
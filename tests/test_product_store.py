@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import json, sqlite3
+
+from product_store import ProductStore
+
+
+def _feed(path, links, category="Gadgets"):
+    with open(path, "w", encoding="utf-8") as f:
+        for link in links:
+            f.write(json.dumps({"name": link, "image": "https://img/x.png",
+                                "link": f"https://shop/{link}", "category": category}) + "\n")
+    return str(path)
+
+
+def _links(store, category="Gadgets"):
+    return [p["link"].rsplit("/", 1)[1] for p in store.page(category, 0, 100)]
+
+
+def test_order_follows_source_rank_not_import_history(tmp_path):
+    store = ProductStore(str(tmp_path / "p.db"))
+    a = _feed(tmp_path / "a.jsonl", ["a1", "a2"])
+    b = _feed(tmp_path / "b.jsonl", ["b1", "b2"])
+    store.ingest(b, rank=1)
+    store.ingest(a, rank=0)
+    assert _links(store) == ["a1", "a2", "b1", "b2"]
+
+    # إعادة استيراد a بعد تغييره لا ترسله إلى آخر الكتالوج
+    _feed(tmp_path / "a.jsonl", ["a0", "a1", "a2"])
+    store.ingest(a, rank=0)
+    assert _links(store) == ["a0", "a1", "a2", "b1", "b2"]
+
+    # تبديل ترتيب الملفات في الإعداد دون تغيير محتواها
+    assert store.ingest(b, rank=0) is None
+    assert store.ingest(a, rank=1) is None
+    assert _links(store) == ["b1", "b2", "a0", "a1", "a2"]
+
+
+def test_shared_link_shows_once_and_survives_other_feed_snapshot(tmp_path):
+    store = ProductStore(str(tmp_path / "p.db"))
+    a = _feed(tmp_path / "a.jsonl", ["shared", "a1"])
+    b = _feed(tmp_path / "b.jsonl", ["b1", "shared"])
+    store.ingest(a, rank=0)
+    store.ingest(b, rank=1)
+    assert _links(store) == ["shared", "a1", "b1"]
+    assert store.count() == 3
+
+    # a يُسقط الرابط المشترك: يبقى من b بدل أن يختفي من الكتالوج
+    _feed(tmp_path / "a.jsonl", ["a1"])
+    store.ingest(a, rank=0)
+    assert _links(store) == ["a1", "b1", "shared"]
+
+
+def test_retain_drops_unconfigured_sources(tmp_path):
+    store = ProductStore(str(tmp_path / "p.db"))
+    store.ingest(_feed(tmp_path / "a.jsonl", ["a1"]), rank=0)
+    store.ingest(_feed(tmp_path / "old.jsonl", ["o1"], category="Old"), rank=1)
+    assert store.retain(["a.jsonl"]) == 1
+    assert _links(store) == ["a1"]
+    assert [c for c, _ in store.categories()] == ["Gadgets"]
+
+
+def test_old_schema_is_rebuilt(tmp_path):
+    path = str(tmp_path / "p.db")
+    with sqlite3.connect(path) as c:
+        c.execute("CREATE TABLE products (link TEXT PRIMARY KEY, name TEXT)")
+        c.execute("INSERT INTO products VALUES ('https://shop/x', 'x')")
+    store = ProductStore(path)
+    assert store.count() == 0
+    store.ingest(_feed(tmp_path / "a.jsonl", ["a1"]), rank=0)
+    assert _links(store) == ["a1"]
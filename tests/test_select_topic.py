@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import main
+
+
+@pytest.fixture
+def fresh_history(monkeypatch):
+    monkeypatch.setattr(main, "recent_topics", lambda days=None: set())
+    monkeypatch.setattr(main, "is_near_duplicate", lambda text, days=None: False)
+    monkeypatch.setattr(main, "TITLE_PREDICTION", "topic")
+
+
+def test_topic_matching_a_used_title_is_skipped(fresh_history):
+    picked = main.select_topic("science", ["Black holes explained", "Coral reef bleaching"],
+                               used_titles=["black holes  explained"])
+    assert picked == "Coral reef bleaching"
+
+
+def test_all_candidates_used_as_titles_skips_slot(fresh_history):
+    assert main.select_topic("science", ["Black holes explained"],
+                             used_titles=["Black holes explained"]) is None
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import time, bisect, random, threading
+
+from history_store import norm_key
+
+# =================== مجمع المواضيع ===================
+DAY = 24 * 3600
+
+
+class TopicPool:
+    """
+    قائمة مواضيع بمفاتيح مطبّعة محسوبة مرة واحدة وآخر استخدام لكل مفتاح.
+    السحب من المواضيع التي انتهت فترة تبريدها فقط، بوزن يزيد مع مدة عدم الاستخدام
+    (غير المستخدم أبدًا بأعلى وزن)، فلا تكرار ولا إعادة محاولة ولا مسح للسجل.
+    """
+
+    def __init__(self, topics, cooldown_days, last_used=None):
+        self.cooldown_s = cooldown_days * DAY
+        self.items = []  # [(key, topic)]
+        self.keys = set()
+        for t in topics:
+            k = norm_key(t)
+            if k and k not in self.keys:
+                self.keys.add(k)
+                self.items.append((k, t))
+        self.last_used = {k: v for k, v in (last_used or {}).items() if k in self.keys}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def _weight(self, key, now):
+        t = self.last_used.get(key)
+        if t is None: return 2.0 * self.cooldown_s / DAY + 1  # لم يُستخدم أبدًا
+        age = now - t
+        if age < self.cooldown_s: return 0.0
+        return min(age, 2.0 * self.cooldown_s) / DAY
+
+    def ranked(self, rnd=None, limit=None, exclude=(), now=None):
+        """
+        ترتيب عشوائي موزون بلا إرجاع (Efraimidis–Spirakis): أول عنصر هو السحب.
+        إن نفدت المواضيع المتاحة نكمل بالأقدم استخدامًا.
+        """
+        rnd = rnd or random
+        now = now or time.time()
+        with self._lock:
+            scored, cooling = [], []
+            for k, t in self.items:
+                if k in exclude: continue
+                w = self._weight(k, now)
+                if w > 0:
+                    scored.append((rnd.random() ** (1.0 / w), t))
+                else:
+                    cooling.append((self.last_used.get(k, 0), t))
+        scored.sort(reverse=True)
+        cooling.sort()
+        out = [t for _, t in scored] + [t for _, t in cooling]
+        return out[:limit] if limit else out
+
+    def sample(self, rnd=None, exclude=(), now=None):
+        """سحب واحد: تراكمي + bisect على المتاح فقط."""
+        rnd = rnd or random
+        now = now or time.time()
+        with self._lock:
+            acc, cum, topics = 0.0, [], []
+            for k, t in self.items:
+                if k in exclude: continue
+                w = self._weight(k, now)
+                if w <= 0: continue
+                acc += w
+                cum.append(acc)
+                topics.append(t)
+        if topics:
+            return topics[bisect.bisect_right(cum, rnd.random() * acc)]
+        rest = self.ranked(rnd, limit=1, exclude=exclude, now=now)
+        return rest[0] if rest else None
+
+    def update_usage(self, last_used):
+        """يدمج آخر استخدام محمّل من السجل (الأحدث يبقى)."""
+        with self._lock:
+            for k, t in last_used.items():
+                if k in self.keys and t > self.last_used.get(k, 0):
+                    self.last_used[k] = t
+
+    def mark_used(self, key, when=None):
+        if key not in self.keys: return
+        with self._lock:
+            self.last_used[key] = when or time.time()
+
+    def is_cooling(self, key, now=None):
+        t = self.last_used.get(key)
+        return t is not None and (now or time.time()) - t < self.cooldown_s
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+import os, time, threading, contextvars
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# =================== التتبع والمقاييس ===================
+TRACING = os.getenv("TRACING", "1") == "1"
+
+# حدود الهستوغرام (ثوانٍ) من طلب HTTP سريع حتى توليد Gemini كامل
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_run = contextvars.ContextVar("trace_run", default=None)
+_span = contextvars.ContextVar("trace_span", default=None)
+_lock = threading.Lock()
+
+
+class _Histogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.n = 0
+
+    def observe(self, v):
+        i = next((i for i, b in enumerate(BUCKETS) if v <= b), len(BUCKETS))
+        self.counts[i] += 1
+        self.sum += v
+        self.n += 1
+
+
+class Metrics:
+    """سجل مقاييس داخل العملية بصيغة Prometheus (يُعرض على /metrics)."""
+
+    def __init__(self):
+        self.stages = {}  # (stage, status) -> _Histogram
+        self.http = {}  # host -> _Histogram
+        self.http_total = {}  # (host, status) -> count
+        self.runs = {}  # (run, status) -> count
+
+    def observe_stage(self, stage, seconds, status="ok"):
+        with _lock:
+            self.stages.setdefault((stage, status), _Histogram()).observe(seconds)
+
+    def observe_http(self, host, status, seconds):
+        with _lock:
+            self.http.setdefault(host, _Histogram()).observe(seconds)
+            key = (host, str(status))
+            self.http_total[key] = self.http_total.get(key, 0) + 1
+
+    def count_run(self, name, status="ok"):
+        with _lock:
+            self.runs[(name, status)] = self.runs.get((name, status), 0) + 1
+
+    @staticmethod
+    def _hist_lines(metric, labels, h):
+        out, acc = [], 0
+        for b, c in zip(BUCKETS, h.counts):
+            acc += c
+            out.append(f'{metric}_bucket{{{labels},le="{b}"}} {acc}')
+        out.append(f'{metric}_bucket{{{labels},le="+Inf"}} {h.n}')
+        out.append(f"{metric}_sum{{{labels}}} {h.sum:.6f}")
+        out.append(f"{metric}_count{{{labels}}} {h.n}")
+        return out
+
+    def render(self):
+        with _lock:
+            lines = ["# HELP bot_stage_seconds Duration of publish pipeline stages.",
+                     "# TYPE bot_stage_seconds histogram"]
+            for (stage, status), h in sorted(self.stages.items()):
+                lines += self._hist_lines("bot_stage_seconds", f'stage="{stage}",status="{status}"', h)
+            lines += ["# HELP bot_http_request_seconds Outbound HTTP latency by host.",
+                      "# TYPE bot_http_request_seconds histogram"]
+            for host, h in sorted(self.http.items()):
+                lines += self._hist_lines("bot_http_request_seconds", f'host="{host}"', h)
+            lines += ["# HELP bot_http_requests_total Outbound HTTP requests by host and status.",
+                      "# TYPE bot_http_requests_total counter"]
+            for (host, status), n in sorted(self.http_total.items()):
+                lines.append(f'bot_http_requests_total{{host="{host}",status="{status}"}} {n}')
+            lines += ["# HELP bot_runs_total Finished publish runs.", "# TYPE bot_runs_total counter"]
+            for (name, status), n in sorted(self.runs.items()):
+                lines.append(f'bot_runs_total{{run="{name}",status="{status}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+class Run:
+    """تشغيل واحد (مثل فتحة نشر): يجمع طلبات HTTP حسب المضيف."""
+
+    def __init__(self, name):
+        self.name = name
+        self.t0 = time.monotonic()
+        self.http = {}
+
+    def add_http(self, host, status, seconds):
+        with _lock:
+            h = self.http.setdefault(host, {"count": 0, "errors": 0, "total_s": 0.0})
+            h["count"] += 1
+            h["total_s"] = round(h["total_s"] + seconds, 3)
+            if not status or status >= 400: h["errors"] += 1
+
+    @property
+    def http_calls(self):
+        return sum(h["count"] for h in self.http.values())
+
+
+class Span:
+    __slots__ = ("name", "parent", "http_calls")
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.http_calls = 0
+
+
+def begin_run(name):
+    """يبدأ تشغيلًا في السياق الحالي؛ يعيد (run, token) لتمريره إلى end_run."""
+    run = Run(name)
+    return run, _run.set(run)
+
+
+def end_run(token, status="ok"):
+    run = _run.get()
+    try:
+        _run.reset(token)
+    except ValueError:
+        pass  # سياق مختلف (خيط آخر): لا شيء نعيده
+    if run is not None: METRICS.count_run(run.name, status)
+    return run
+
+
+@contextmanager
+def span(name):
+    """مرحلة مقيسة؛ تتداخل عبر contextvars (تنتقل تلقائيًا إلى asyncio.to_thread)."""
+    sp = Span(name, _span.get())
+    token = _span.set(sp)
+    t = time.monotonic()
+    status = "ok"
+    try:
+        yield sp
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _span.reset(token)
+        METRICS.observe_stage(name, time.monotonic() - t, status)
+
+
+def bind(fn):
+    """للـ ThreadPoolExecutor: ينقل المرحلة الحالية إلى خيط العامل (نسخة سياق لكل استدعاء)."""
+    ctx = contextvars.copy_context()
+    return lambda *a, **kw: ctx.run(fn, *a, **kw)
+
+
+def record_http(url, status, seconds):
+    host = urlsplit(url).netloc or "?"
+    METRICS.observe_http(host, status, seconds)
+    sp = _span.get()
+    with _lock:
+        while sp is not None:
+            sp.http_calls += 1
+            sp = sp.parent
+    run = _run.get()
+    if run is not None: run.add_http(host, status, seconds)
+
+
+_installed = False
+
+
+def install():
+    """يلف requests وhttplib2 (googleapiclient) مرة واحدة لقياس كل طلب خارجي."""
+    global _installed
+    if _installed or not TRACING: return
+    _installed = True
+    import requests
+    orig_request = requests.Session.request
+
+    def request(self, method, url, *args, **kwargs):
+        t, status = time.monotonic(), 0
+        try:
+            resp = orig_request(self, method, url, *args, **kwargs)
+            status = resp.status_code
+            return resp
+        finally:
+            record_http(url, status, time.monotonic() - t)
+
+    requests.Session.request = request
+
+    try:
+        import httplib2
+    except ImportError:
+        return
+    orig_http = httplib2.Http.request
+
+    def http_request(self, uri, *args, **kwargs):
+        t, status = time.monotonic(), 0
+        try:
+            resp, content = orig_http(self, uri, *args, **kwargs)
+            status = resp.status
+            return resp, content
+        finally:
+            record_http(uri, status, time.monotonic() - t)
+
+    httplib2.Http.request = http_request